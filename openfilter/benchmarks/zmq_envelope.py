@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""Per message envelope encode + decode cost of JSON vs compact binary envelopes, e.g.:
+
+    python benchmarks/zmq_envelope.py
+    python benchmarks/zmq_envelope.py --topics 32
+
+Simulates one message with a number of small data-only topics plus one image topic, as ZMQSender and ZMQReceiver do.
+"""
+
+import argparse
+from json import dumps as json_dumps, loads as json_loads
+from timeit import timeit
+
+from openfilter.filter_runtime.zeromq import ZMQEnvelope
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--topics', type=int, default=8, help='number of data-only topics, default %(default)s')
+    parser.add_argument('--number', type=int, default=10000, help='number of messages, default %(default)s')
+    opts = parser.parse_args()
+
+    topics = ['main', *(f'topic{i}' for i in range(opts.topics)), '_metrics']
+    xtras  = [{'img': [1080, 1920, 'BGR', 'jpg']}, *(None for _ in range(opts.topics)), None]
+
+    def json_msg():
+        env = {'sid': 'benchmark', 'mid': 12345, 'topics': list(topics)}
+
+        for xtra in xtras:
+            env['xtra'] = xtra
+
+            json_loads(json_dumps(env, separators=(',', ':')).encode())
+
+    def binary_msg(cache=[b'', None, None]):
+        env  = {'sid': 'benchmark', 'mid': 12345, 'topics': list(topics)}
+        envb = ZMQEnvelope('benchmark', env['topics'])
+
+        for xtra in xtras:
+            env['xtra'] = xtra
+
+            ZMQEnvelope.loads(envb.dumps(env), cache)
+
+    tjson = timeit(json_msg, number=opts.number) / opts.number * 1_000_000
+    tbin  = timeit(binary_msg, number=opts.number) / opts.number * 1_000_000
+
+    print(f'{len(topics)} topics per message: json {tjson:.1f} us, binary {tbin:.1f} us, speedup {tjson / tbin:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
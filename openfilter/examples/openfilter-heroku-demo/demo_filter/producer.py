@@ -59,6 +59,10 @@ class FrameProcessor(Filter):
         
         # Dictionary to hold our output frames with different topics
         output_frames = {}
+
+        # Only produce the topics somebody downstream subscribes to (None means all of them)
+        subscribed = self.subscribed_topics
+        wanted = lambda topic: subscribed is None or topic in subscribed
         
         # Process main frame (possibly resized)
         bgr_image = input_frame.rw_bgr.image
@@ -73,7 +77,7 @@ class FrameProcessor(Filter):
         )
         
         # Add blurred version
-        if self.config.apply_blur:
+        if self.config.apply_blur and wanted("blurred"):
             blurred_image = cv2.GaussianBlur(bgr_image, (15, 15), 0)
             output_frames["blurred"] = Frame(
                 blurred_image, 
@@ -82,7 +86,7 @@ class FrameProcessor(Filter):
             )
         
         # Add edge detection
-        if self.config.apply_edge_detection:
+        if self.config.apply_edge_detection and wanted("edges"):
             gray_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
             edges_image = cv2.Canny(gray_image, 100, 200)
             # Convert back to BGR for compatibility
@@ -94,7 +98,7 @@ class FrameProcessor(Filter):
             )
         
         # Add timestamp overlay
-        if self.config.apply_overlay:
+        if self.config.apply_overlay and wanted("overlay"):
             overlay_image = bgr_image.copy()
             timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
             text = f"Frame: {self.frame_count} | Time: {timestamp}"
@@ -17,6 +17,7 @@ SHORTERHAND = {
     'mqttout':      'MQTTOut',
     'mqtt_out':     'MQTTOut',
     'recorder':     'Recorder',
+    'relay':        'Relay',
     'rest':         'REST',
     'util':         'Util',
     'video':        'Video',
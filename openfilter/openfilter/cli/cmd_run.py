@@ -25,7 +25,7 @@ def cmd_run(args):
     opts   = args[:idx]
     parser = argparse.ArgumentParser(prog=f'{SCRIPT} run', formatter_class=argparse.RawTextHelpFormatter,
         usage=f"""
-usage: {SCRIPT} run [-h] [--ipc] [-s] [-f] [-p {{all,clean,error,none}}] [-o {{all,clean,error,none}}] [--dry] FILTER [FILTER ...]
+usage: {SCRIPT} run [-h] [--ipc] [-s] [-t] [-f] [-p {{all,clean,error,none}}] [-o {{all,clean,error,none}}] [--dry] FILTER [FILTER ...]
         """.strip(),
         description="""
 Run one or more Filters.
@@ -43,6 +43,9 @@ examples:
       autochain filters:
     {SCRIPT} run - VideoIn --sources file://video.mp4 - Webvis
 
+  Run both in one process as threads, frames passed by reference:
+    {SCRIPT} run --threads - VideoIn --sources file://video.mp4 - Webvis
+
   Connect via ids:
     {SCRIPT} run - VideoIn --id myvideo --sources file://video.mp4 - webvis --sources myvideo
       autogenerated id:
@@ -61,6 +64,10 @@ notes:
         action = 'store_true',
         help   = 'run a single Filter in same process',
     )
+    parser.add_argument('-t', '--threads',
+        action = 'store_true',
+        help   = 'run all Filters as threads in this process, new connections are inproc://',
+    )
     parser.add_argument('-f', '--fork',
         action = 'store_true',
         help   = "run Filters using 'fork' method instead of 'spawn', doesn't work with CUDA",
@@ -88,7 +95,7 @@ notes:
 
     # parse filters
 
-    filters = parse_filters(args[:idx:-1], opts.ipc)
+    filters = parse_filters(args[:idx:-1], opts.ipc, opts.threads)
 
     # run
 
@@ -108,4 +115,4 @@ notes:
             prop_exit=opts.prop_exit, obey_exit=opts.obey_exit)
     else:
         Filter.run_multi([(cls, dict_without(config, '__env_compose')) for cls, config, _ in filters],
-            prop_exit=opts.prop_exit, obey_exit=opts.obey_exit)
+            prop_exit=opts.prop_exit, obey_exit=opts.obey_exit, threads=opts.threads)
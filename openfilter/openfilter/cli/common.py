@@ -21,6 +21,7 @@ SHORTHAND = {
     "Filter": "openfilter.filter_runtime.filter.Filter",
     "MQTTOut": "openfilter.filter_runtime.filters.mqtt_out.MQTTOut",
     "Recorder": "openfilter.filter_runtime.filters.recorder.Recorder",
+    "Relay": "openfilter.filter_runtime.filters.relay.Relay",
     "REST": "openfilter.filter_runtime.filters.rest.REST",
     "Util": "openfilter.filter_runtime.filters.util.Util",
     "Video": "openfilter.filter_runtime.filters.video.Video",
@@ -101,7 +102,7 @@ def filter_can_do_filter_outputs(filter_cls):
 
 
 def parse_filters(
-    args: list[str], ipc: bool = False
+    args: list[str], ipc: bool = False, inproc: bool = False
 ) -> List[Tuple[Type, dict, str]]:  # -> [(filter class, config, referenced name), ...]  - [(filter_example.example.Example, {...}, 'Example')]
     """Parse command args to list of filter classes and configs."""
 
@@ -337,7 +338,11 @@ def parse_filters(
                 )
 
             else:
-                if ipc:
+                if inproc:
+                    source_by_id[id] = new_source = f"inproc://{id_config.id}"
+                    id_config.outputs = new_source
+
+                elif ipc:
                     source_by_id[id] = new_source = f"ipc://{id_config.id}"
                     id_config.outputs = new_source
 
@@ -0,0 +1,124 @@
+"""Opt-in pool of image buffers for Frame conversions, copies and resizes so that a steady stream of same size images
+does not allocate (and free) a new full size array for every one of them. Buffers are keyed by shape and dtype and are
+handed out as the arrays themselves, one is free for reuse once nothing references it anymore (no Frame, view or
+anything else), which is simply when its reference count drops back to only the pool's, so nothing needs to give them
+back explicitly. Jpg decode can not use it as cv2.imdecode() does not take a destination. Only the most recently used
+shapes are kept so that variable size work (crops, resizes to changing sizes) does not grow it without end.
+
+Hits and misses go out with the metrics as 'pool_hit_count' and 'pool_miss_count'.
+
+Environment variables:
+    BUFFER_POOL: Maximum number of buffers kept per shape, 0 (default) for no pooling. Should be at least the number of
+        images of a shape alive at once (in flight in queues and across threads) or there will be misses.
+
+    BUFFER_POOL_SHAPES: Maximum number of different shapes (and dtypes) kept, the least recently used one is dropped
+        when a new one would go over this, default 8.
+"""
+
+import os
+from sys import getrefcount
+from threading import Lock
+
+import cv2
+import numpy as np
+
+__all__ = ['BufferPool', 'set_buffer_pool', 'get_buffer_pool', 'pool_empty', 'pool_copy', 'pool_cvt_color',
+    'pool_resize']
+
+BUFFER_POOL        = int(os.getenv('BUFFER_POOL') or 0)
+BUFFER_POOL_SHAPES = int(os.getenv('BUFFER_POOL_SHAPES') or 8)
+
+GRAY_CODES         = frozenset((cv2.COLOR_RGB2GRAY, cv2.COLOR_BGR2GRAY))
+YUV_CODES          = frozenset((cv2.COLOR_YUV2RGB_NV12, cv2.COLOR_YUV2BGR_NV12, cv2.COLOR_YUV2RGB_I420, cv2.COLOR_YUV2BGR_I420))
+
+
+class BufferPool:
+    def __init__(self, size: int, shapes: int = BUFFER_POOL_SHAPES):
+        self.size       = size
+        self.shapes     = shapes
+        self.bufs       = {}  # {(shape, dtype): [ndarray, ...], ...} in order of last use, oldest first
+        self.lock       = Lock()
+        self.hit_count  = 0
+        self.miss_count = 0
+        probe           = [np.empty(0)]
+        self.free_refs  = getrefcount(probe[0])  # refs to a buffer held only by us, as seen by the same check in get()
+
+    def get(self, shape: tuple[int, ...], dtype: np.dtype = np.uint8) -> np.ndarray:
+        """A writable array of `shape` and `dtype` with undefined contents, a free one from the pool if there is one."""
+
+        with self.lock:
+            if (bufs := (pbufs := self.bufs).pop(key := (shape, np.dtype(dtype)), None)) is None:
+                bufs = []
+
+                if len(pbufs) >= self.shapes:
+                    del pbufs[next(iter(pbufs))]  # least recently used, buffers still in use are simply not ours anymore
+
+            pbufs[key] = bufs  # now most recently used
+            free_refs  = self.free_refs
+
+            for i in range(len(bufs)):
+                if getrefcount(bufs[i]) == free_refs:
+                    buf                  = bufs[i]
+                    buf.flags.writeable  = True  # Frames make their images readonly, we own it so can undo that
+                    self.hit_count      += 1
+
+                    return buf
+
+            self.miss_count += 1
+            buf              = np.empty(shape, dtype)
+
+            if len(bufs) < self.size:
+                bufs.append(buf)
+
+            return buf
+
+    def clear(self):
+        with self.lock:
+            self.bufs = {}
+
+
+def set_buffer_pool(size: int | None, shapes: int = BUFFER_POOL_SHAPES):
+    """Turn on pooling with up to `size` buffers per shape for up to `shapes` shapes or off with 0 or None, replaces any
+    previous pool."""
+
+    global buffer_pool
+
+    buffer_pool = BufferPool(size, shapes) if size else None
+
+
+def get_buffer_pool() -> BufferPool | None:
+    return buffer_pool
+
+
+def pool_empty(shape: tuple[int, ...], dtype: np.dtype = np.uint8) -> np.ndarray:
+    return np.empty(shape, dtype) if (pool := buffer_pool) is None else pool.get(shape, dtype)
+
+
+def pool_copy(image: np.ndarray) -> np.ndarray:
+    if (pool := buffer_pool) is None:
+        return image.copy()
+
+    np.copyto(buf := pool.get(image.shape, image.dtype), image)
+
+    return buf
+
+
+def pool_cvt_color(image: np.ndarray, code: int) -> np.ndarray:
+    if (pool := buffer_pool) is None:
+        return cv2.cvtColor(image, code)
+
+    shape = image.shape[:2] if code in GRAY_CODES else (image.shape[0] * 2 // 3, image.shape[1], 3) \
+        if code in YUV_CODES else (*image.shape[:2], 3)
+
+    return cv2.cvtColor(image, code, dst=pool.get(shape))
+
+
+def pool_resize(image: np.ndarray, dsize: tuple[int, int], interpolation: int = cv2.INTER_LINEAR) -> np.ndarray:
+    if (pool := buffer_pool) is None:
+        return cv2.resize(image, dsize, interpolation=interpolation)
+
+    return cv2.resize(image, dsize, dst=pool.get((dsize[1], dsize[0], *image.shape[2:]), image.dtype),
+        interpolation=interpolation)
+
+
+buffer_pool = BufferPool(BUFFER_POOL) if BUFFER_POOL else None
@@ -4,6 +4,7 @@ import os
 import re
 import sys
 import threading
+from math import ceil
 from multiprocessing import synchronize
 from time import time
 from typing import Any, Callable, Literal
@@ -72,6 +73,12 @@ if STOP_EXIT not in PROP_EXIT_FLAGS:
     raise ValueError(f'invalid STOP_EXIT {STOP_EXIT!r}, can only be one of: {", ".join(PROP_EXIT_FLAGS)}')
 
 
+def ms_until(t: float) -> int | None:
+    """Milliseconds from now until time `t` (rounded up so as not to come back just before), None if `t` is inf."""
+
+    return None if t == float('inf') else max(0, ceil((t - time()) * 1000))
+
+
 class FilterConfig(adict):  # types are informative to you as in the end they're all just adicts, maybe in future do something with them (defaults, coercion and/or validation)
     id:                  str
 
@@ -79,13 +86,22 @@ class FilterConfig(adict):  # types are informative to you as in the end they're
     sources_balance:     bool | None
     sources_timeout:     int | None
     sources_low_latency: bool | None
+    sources_window:      int | None
+    sources_reorder:     int | None
+    sources_compress:    bool | str | list[str] | None
+    sources_prefetch:    int | None
+    sources_decode:      bool | None
 
     outputs:             str | list[str] | None
     outputs_balance:     bool | None
     outputs_timeout:     int | None
     outputs_required:    str | None
     outputs_metrics:     str | bool | None
+    outputs_metrics_agg: float | None
     outputs_jpg:         bool | None
+    outputs_codec:       str | dict[str, str] | None
+    outputs_delta:       bool | int | None
+    outputs_thread:      bool | None
 
     exit_after:          float | str | None  # '[[[days:]hrs:]mins:]secs[.subsecs]' or '@date/time/datetime'
 
@@ -95,6 +111,7 @@ class FilterConfig(adict):  # types are informative to you as in the end they're
     extra_metrics:       dict[str, JSONType] | list[tuple[str, JSONType]] | None
     mq_log:              str | bool | None
     mq_msgid_sync:       bool | None
+    mq_threads:          int | None
 
     def clean(self):  # -> Self:
         """Return a clean instance of this config without any hidden items starting with '_'."""
@@ -111,9 +128,10 @@ class Filter:
             Unique string identifier for this filter. If this is not provided then it will be randomly generated.
 
         sources:
-            Sources for this filter, they can be either other filters ('tcp://', 'ipc://') or filter specific URIs like
-            'file://', 'rtsp://', 'http://', etc... When thet are other filters they are handled here and take the
-            following form (there can be multiple delimited by commas, whitespace is ignored):
+            Sources for this filter, they can be either other filters ('tcp://', 'ipc://', 'shm://', 'inproc://') or
+            filter specific URIs like 'file://', 'rtsp://', 'http://', etc... When thet are other filters they are
+            handled here and take the following form (there can be multiple delimited by commas, whitespace is
+            ignored):
 
                 "tcp://127.0.0.1" - All topics are received (not including "_metrics" if present).
                 "tcp://127.0.0.1;" - Only the 'main' topic is received.
@@ -123,6 +141,17 @@ class Filter:
                 "tcp://127.0.0.1;that>other" - The 'that' topic is received as 'other'.
                 "tcp://127.0.0.1;*" - ALL topics are received, including '_metrics'.
 
+            Delivery options can be appended to ask the upstream filter for a variant of its frames made just for this
+            source (see mq.py), each variant is only made once upstream no matter how many receivers want it:
+
+                "tcp://127.0.0.1;main!noimage" - Frames without images, for sinks which only use the data.
+                "tcp://127.0.0.1!maxsize=640x360" - Images downscaled to fit in 640x360.
+                "tcp://127.0.0.1!jpg" - Images jpg encoded ('!no-jpg' for raw) whatever `outputs_jpg` is upstream.
+                "tcp://127.0.0.1!codec=png" - Images in any codec of imgcodec.py, e.g. 'jpg:70', 'webp', 'raw+lz4'.
+                "tcp://127.0.0.1;*!crops" - Frame.crop()s of Frames in the same message come as boxes, not images.
+                "tcp://127.0.0.1;main!where=meta.plates" - Only frames whose `data['meta']['plates']` is not empty.
+                "tcp://127.0.0.1!where=meta.score>=0.5 & meta.kind=car" - Only frames matching all the conditions.
+
         sources_balance:
             Source(s) are load balanced (previously split across multiple identical pipelines) so join them again here
             into one stream. This filter will act as if the multiple upstream `sources` are one single filter running
@@ -139,12 +168,55 @@ class Filter:
             the moment of the request (like video), this will increase the amount of time that has passed between frame
             generation and when you get it (higher latency). Global env var default ZMQ_LOW_LATENCY.
 
+        sources_window:
+            Credit window, how many messages each upstream filter may send ahead of this filter's requests. The default
+            of 1 allows one message in flight, which caps throughput at about one frame per round trip on high latency
+            links between hosts. A higher value keeps more frames in flight, they are still processed in order. Global
+            env var default ZMQ_WINDOW.
+
+        sources_reorder:
+            With `sources_balance`, how many complete messages may be held back waiting for an earlier one from a slower
+            upstream pipeline so that messages come out in order. If the earlier message still has not arrived after
+            this many (or after ZMQ_REORDER_TIMEOUT) then it is skipped. Default is four times the number of sources, 0
+            turns reordering off and out of order messages are discarded.
+
+        sources_compress:
+            Ask 'tcp://' sources to compress the data part of messages (Frame.data) when it is large, for bandwidth
+            limited links between hosts. True for any available codec, or a codec or list of them to choose from in
+            order of preference ('zstd' and 'lz4' need the optional `compress` packages, 'zlib' is always available).
+            Never done on 'ipc://' or 'shm://'. Global env var default ZMQ_COMPRESS.
+
+        sources_prefetch:
+            Number of messages to receive and convert to Frames ahead of time in a background thread while process()
+            runs on the current ones. Hides transport and conversion time behind processing for slow filters. Message
+            ids between sources and outputs are not synchronized in this mode. Default 0 (off).
+
+        sources_decode:
+            Decode jpg images before process() gets them, in the background thread with `sources_prefetch` and in
+            parallel across topics with `mq_threads`.
+
         outputs:
             Where other filters will connect to get their data, e.g. "tcp://127.0.0.1", "tcp://*:5552", "ipc://name".
             NOT the destination filters themselves! Repeat, this is a bind point where this filter will listen for
             connections, not where it should connect to send data. This field is also commonly overloaded by specific
             output filters like video or messaging queue outputs.
 
+            A "shm://name" output is like "ipc://name" but passes images to filters on the same host through shared
+            memory instead of the socket, downstream filters can connect to it as either "shm://name" or "ipc://name".
+
+            An "inproc://name" output is for filters running as threads in the same process (Runner `threads`). If all
+            outputs are "inproc://" then Frames are passed to downstream by reference with readonly images, nothing is
+            serialized or encoded.
+
+            A "router+" prefixed output ("router+tcp://*:5552", "router+ipc://name", "router+shm://name") sends each
+            frame to only one of the filters connected to it, whichever is free, so any number of worker replicas can
+            connect to the same output as "router+tcp://host:5552" to split the work. Downstream must use the same
+            prefix. Workers are joined again downstream with `sources_balance` as for `outputs_balance`.
+
+            Delivery options can be appended to an output to set how everything sent from it goes out, same as those
+            of `sources` except for 'where' (which is only for sources), e.g. "tcp://*:5552!codec=webp:60" for a remote
+            link next to a local "ipc://name" output getting the same frames raw.
+
         outputs_balance:
             Balance sending frames across all outputs. Not normal operation, meant for a load balancing topology. Must
             be paired with `sources_balance` downstream.
@@ -162,6 +234,26 @@ class Filter:
             process() as such, None uses env var default which is normally to pass them on as they are returned from
             process(). Global env var default ZMQ_LOW_LATENCY. Gloval env var default OUTPUTS_JPG.
 
+        outputs_codec:
+            Image codec for outputs as 'name' or 'name:param', e.g. 'jpg:70', 'png', 'webp:60', 'raw+zstd' (see
+            imgcodec.py), or a dict of {'topic': 'codec'} with optional '*' default for other topics. Overrides
+            `outputs_jpg` for the topics it applies to. Global env var default OUTPUTS_CODEC.
+
+        outputs_delta:
+            Send images as periodic keyframes and in between only the tiles which changed since, for static cameras on
+            remote links. True for a keyframe every 100 images or the number of images per keyframe. Receivers need no
+            config for this. Does not apply to 'inproc://' outputs by reference. Global env var default OUTPUTS_DELTA.
+
+        outputs_metrics_agg:
+            Aggregate outgoing metrics over this many seconds and send them once per interval (with min, max and
+            percentiles) instead of with every frame, for many filters at high fps. '??' listeners on a dedicated
+            metrics output still get them pushed. Global env var default OUTPUTS_METRICS_AGG.
+
+        outputs_thread:
+            Send outputs from a background thread which does the metrics, encoding (jpg) and actual send while the next
+            process() runs. If process() returns a callable then it will be called from that thread. With this the
+            `outputs_timeout` only applies to handing frames to the thread.
+
         exit_after:
             Exit after this amount of time in seconds or as a formatted string '[[[days[d]:]hrs:]mins:]secs[.subsecs]'.
             If the `exit_after` string starts with '@' then this sets an actual clock date/time to exit at (in local
@@ -190,6 +282,11 @@ class Filter:
             is provided in case of advanced use with circular filter topologies. If you don't know what this means then
             don't touch this. Global env var default MQ_MSGID_SYNC. EXPERIMENTAL!
 
+        mq_threads:
+            Size of a thread pool which jpg encodes all the output topics in parallel (and decodes source topics with
+            `sources_decode`) instead of one after another, for filters with many image topics like multiple cameras.
+            Default 0 (off). Global env var default MQ_THREADS.
+
     Environment variables:
         LOG_LEVEL:
             'critical', 'error', 'warning', 'info' or 'debug'.
@@ -251,6 +348,10 @@ class Filter:
             If true then send metrics as '_metrics' on all zeromq outputs. If false then don't send. If string then is
             address of dedicated sender for metrics (will not be sent on normal senders).
 
+        OUTPUTS_METRICS_AGG:
+            Number of seconds to aggregate outgoing metrics over (average, min, max and percentiles of each) and send
+            them once per interval instead of with every frame. Default 0 for every frame.
+
         OUTPUTS_METRICS_PUSH:
             If 'true'ish then will always send metrics on dedicated metrics output regardless of if something is
             officially connected or not. Default true to support doubly ephemeral '??' listeners which are most likely
@@ -263,6 +364,10 @@ class Filter:
             Whether to sync expected message IDs between outgoing and incoming zeromq message queues. Advanced thing,
             don't touch unless u know what u doing.
 
+        MQ_ZERO_COPY:
+            If 'true'ish (default) then raw images are sent and received without intermediate copies where possible
+            (readonly images are sent from their own buffers, received images are readonly views of message buffers).
+
     From metrics.py:
         GPU_METRICS:
             Set to 'false'ish to turn off GPU metrics.
@@ -273,6 +378,15 @@ class Filter:
         CPU_METRICS_INTERVAL:
             Default number of seconds between poll of CPU and memory metrics.
 
+    From bufpool.py:
+        BUFFER_POOL:
+            Maximum number of image buffers kept per shape for reuse by Frame conversions, copies and resizes, 0
+            (default) for none. Hits and misses go out in metrics as 'pool_hit_count' and 'pool_miss_count'.
+
+        BUFFER_POOL_SHAPES:
+            Maximum number of different image shapes the buffer pool keeps buffers for, least recently used dropped
+            first, default 8.
+
     From dlcache.py:
         JFROG_API_KEY:
             The JFrog API key, will be deprecated by evil JFrog people at end of September 2024, use JFROG_TOKEN
@@ -284,7 +398,7 @@ class Filter:
         DLCACHE_PATH:
             Path to root of cache where to download 'jfrog://' items to. Default 'cache'.
 
-    From zeromq.py (don't mess with these except DEBUG_ZEROMQ, ZMQ_CONN_TIMEOUT, ZMQ_LOW_LATENCY and ZMQ_WARN_*):
+    From zeromq.py (don't mess with these except DEBUG_ZEROMQ, ZMQ_CONN_TIMEOUT, ZMQ_LOW_LATENCY, ZMQ_WINDOW and ZMQ_WARN_*):
         DEBUG_ZEROMQ:
             If 'true'ish and logging is set to 'debug' then will log each message sent and received (not the full
             contents, just basic info).
@@ -302,7 +416,8 @@ class Filter:
 
         ZMQ_POLL_TIMEOUT:
             Length to wait in milliseconds each poll for a message to come in in milliseconds. Requests for more frames
-            are sent at this interval as well.
+            are sent at this interval as well. Stopping, `exit_after` and the sources / outputs timeouts do not depend
+            on it, waits end right when those happen.
 
         ZMQ_CONN_TIMEOUT:
             Length of time in milliseconds without receiving anything from a downstream connection in order to consider
@@ -327,11 +442,50 @@ class Filter:
             If 'true'ish then favor lower latency over higher throughput. Will only help in some cases with the right
             properties. Really on things immediately downstream of VideoIn.
 
+        ZMQ_WINDOW:
+            Default credit window of sources, how many messages an upstream filter may publish ahead of requests. Large
+            windows of large messages may need a higher ZMQ_PUB_HWM on the upstream side.
+
+        ZMQ_BALANCE_ALPHA:
+            Weight of each new sample in the moving average of the service time of balanced downstream clients.
+
+        ZMQ_BALANCE_SLACK:
+            Milliseconds of difference in expected completion time under which balanced downstream clients are
+            considered equally loaded and are served round-robin (as is anything within 50% of the least).
+
+        ZMQ_REORDER_TIMEOUT:
+            Milliseconds that `sources_balance` holds completed messages waiting for a missing earlier one.
+
+        ZMQ_COMPRESS:
+            Default `sources_compress`, 'false' (default), 'true' or a comma separated list of codecs like 'zstd,zlib'.
+
+        ZMQ_COMPRESS_MIN:
+            Minimum size in bytes of a data part to be compressed (on the upstream side), smaller are sent as is.
+
+        ZMQ_STATS_INTERVAL:
+            Milliseconds over which the bandwidth of each link is measured for the 'in_*' / 'out_*' link metrics.
+
         ZMQ_WARN_NEWER:
             Warn on newer messages than expected.
 
         ZMQ_WARN_OLDER:
             Warn on older messages than expected.
+
+        ZMQ_SHM_PATH:
+            Directory for 'shm://' shared memory slot files, default '/dev/shm' if present, otherwise tmp dir.
+
+        ZMQ_SHM_SLOTS:
+            Number of shared memory slots in the ring of each 'shm://' sender. Default 16.
+
+        ZMQ_SHM_MIN_SIZE:
+            Minimum size in bytes of a message part to be sent through shared memory, smaller are sent inline.
+
+        ZMQ_INPROC_SLOTS:
+            Number of most recent messages each 'inproc://' output keeps alive for its receivers. Default 16.
+
+        ZMQ_ENVELOPE:
+            'binary' (default) to negotiate compact binary message envelopes with downstream filters, 'json' to always
+            send JSON envelopes (for outside programs reading the outputs directly).
     """
 
     config:  FilterConfig
@@ -345,6 +499,13 @@ class Filter:
     def metrics(self) -> dict[str, JSONType]:
         return self.mq.metrics
 
+    @property
+    def subscribed_topics(self) -> set[str] | None:
+        """Output topics that downstream is subscribed to as of the last send, None if all of them or not known (yet).
+        Topics not in here are dropped on send without encoding, so process() can skip producing them."""
+
+        return self.mq.subscribed_topics
+
     class Exit(SystemExit): pass
     class PropagateError(Exception): pass
     class YesLoopException(Exception): pass  # not to raise, just to exist as an Exception to allow other Exceptions to propagate
@@ -386,7 +547,8 @@ class Filter:
 
     def start_logging(self, config: dict[str, Any]):
         self.logger = Logger(config.get('id'), utc=LOG_UTC, log_path=config.get('log_path'),
-            metrics_interval=config.get('metrics_interval'))
+            metrics_interval=config.get('metrics_interval'),
+            own_thread=threading.current_thread() is not threading.main_thread())
 
     def stop_logging(self):
         self.logger.close()
@@ -404,6 +566,13 @@ class Filter:
 
         raise exc or Filter.Exit
 
+    def count_drop(self, reason: str, topic: str | None = None, count: int = 1):
+        """Report frames dropped by the filter (skipped, discarded or otherwise never passed on) so that they show up in
+        the metrics as 'drop_{topic}_{reason}_count' (or 'drop_{reason}_count' without topic) and in the total
+        'drop_count'. Can be called from any thread once the filter is set up."""
+
+        self.mq.count_drop(reason, topic, count)
+
     @staticmethod
     def download_cached_files(config: FilterConfig):
         """Downloads or updates files specified in the config as "jfrog://...", or other download sources, and replaces
@@ -532,28 +701,43 @@ class Filter:
         else:
             return {'main': frames} if isinstance(frames, Frame) else frames
 
+    def mq_recv(self, timeout: int | None = None) -> dict[str, Frame] | None:
+        """What loop_once() receives with, a subclass may receive something other than Frames (like raw messages)."""
+
+        return self.mq.recv(timeout)
+
+    def mq_send(self, frames: dict[str, Frame] | Callable[[], dict[str, Frame] | None] | None,
+            timeout: int | None = None) -> bool:
+        """What loop_once() sends with, see mq_recv()."""
+
+        return self.mq.send(frames, timeout)
+
     def loop_once(self) -> None:
-        """Loop twice."""
+        """Loop twice. Waits are only ever cut short by a stop (which wakes up the mq) or a real deadline."""
 
-        sources_timeout = self.sources_timeout
-        outputs_timeout = self.outputs_timeout
+        t_exit = float('inf') if (exit_after_t := self.exit_after_t) is None else exit_after_t
+        t_srcs = time() + self.sources_timeout / 1000
 
-        while (frames := self.mq.recv(min(POLL_TIMEOUT_MS, sources_timeout))) is None:
+        while (frames := self.mq_recv(ms_until(min(t_srcs, t_exit)))) is None:
             if self.stop_evt.is_set():
                 self.exit()
 
-            if (sources_timeout := sources_timeout - POLL_TIMEOUT_MS) <= 0:
+            if (t := time()) >= t_exit:
+                self.exit('exit_after')
+
+            if t >= t_srcs:
                 frames = {}
 
                 break
 
         frames = self.process_frames(frames)
+        t_outs = time() + self.outputs_timeout / 1000
 
-        while not self.mq.send(frames, min(POLL_TIMEOUT_MS, outputs_timeout)):
+        while not self.mq_send(frames, ms_until(t_outs)):
             if self.stop_evt.is_set():
                 self.exit()
 
-            if (outputs_timeout := outputs_timeout - POLL_TIMEOUT_MS) <= 0:
+            if time() >= t_outs:
                 break
 
         if (exit_after_t := self.exit_after_t) is not None and time() >= exit_after_t:
@@ -586,9 +770,9 @@ class Filter:
                 logger.error(exc)
 
         if (sources := config.sources) and not all(is_mq_addr(bad_src := source) for source in sources):
-            raise ValueError(f'invalid source {bad_src!r}, only tcp:// or ipc:// sources allowed')
+            raise ValueError(f'invalid source {bad_src!r}, only tcp://, ipc://, shm:// or inproc:// (optionally router+) sources allowed')
         if (outputs := config.outputs) and not all(is_mq_addr(bad_out := output) for output in outputs):
-            raise ValueError(f'invalid output {bad_out!r}, only tcp:// or ipc:// outputs allowed')
+            raise ValueError(f'invalid output {bad_out!r}, only tcp://, ipc://, shm:// or inproc:// (optionally router+) outputs allowed')
 
         self.logger.set_fixed_metrics(**(config.extra_metrics or {}),
             dim_environment            = ENVIRONMENT if (env := config.environment) is None else env,
@@ -615,19 +799,33 @@ class Filter:
 
         self.sources_timeout = float('inf') if (to := config.sources_timeout) is None else int(to)
         self.outputs_timeout = float('inf') if (to := config.outputs_timeout) is None else int(to)
-        srcs_n_topics        = None if sources is None else [self.parse_topics(s) for s in sources]
+        srcs_n_topics        = None if sources is None else \
+            [(*self.parse_topics(src), opts) for src, opts in map(self.parse_options, sources)]
+        outs_n_opts          = None if outputs is None else \
+            [(out, opts) if opts else out for out, opts in map(self.parse_options, outputs)]
 
-        self.mq = MQ(srcs_n_topics, outputs, config.id,
+        self.mq = MQ(srcs_n_topics, outs_n_opts, config.id,
             srcs_balance  = bool(config.sources_balance),
             srcs_low_lat  = None if (_ := config.sources_low_latency) is None else bool(_),
+            srcs_window   = None if (_ := config.sources_window) is None else int(_),
+            srcs_reorder  = None if (_ := config.sources_reorder) is None else int(_),
+            srcs_compress = config.sources_compress,
+            srcs_prefetch = int(config.sources_prefetch or 0),
+            srcs_decode   = bool(config.sources_decode),
             outs_balance  = bool(config.outputs_balance),
             outs_required = config.outputs_required,
             outs_jpg      = config.outputs_jpg,
+            outs_codec    = config.outputs_codec,
+            outs_delta    = config.outputs_delta,
             outs_metrics  = config.outputs_metrics,
+            outs_thread   = bool(config.outputs_thread),
             metrics_cb    = self.logger.write_metrics if self.logger.enabled else None,
+            metrics_agg   = None if (_ := config.outputs_metrics_agg) is None else float(_),
             on_exit_msg   = on_exit_msg,
             mq_log        = config.mq_log,
             mq_msgid_sync = config.mq_msgid_sync,
+            mq_threads    = None if (_ := config.mq_threads) is None else int(_),
+            stop_evt      = self.stop_evt,
         )
 
     def fini(self):
@@ -701,6 +899,9 @@ class Filter:
             possible to pass on an already encoded jpg downstream if you don't touch the image or only touch it as
             readonly.
 
+            * Topics which nobody downstream subscribes to are not sent. Check `self.subscribed_topics` to skip the work
+            of producing them in the first place.
+
             * Empty Frames with no image or data WILL be propagated downstream as such. Empty `frames` will likewise
             be received downstream and sent on to process(). If you want nothing at all sent downstream then return None
             from your process().
@@ -752,11 +953,18 @@ class Filter:
         elif stop_evt is None:
             stop_evt = threading.Event()
 
+        in_thread = threading.current_thread() is not threading.main_thread()
+        emitter   = Filter.set_open_lineage() if in_thread else cls.emitter  # filters in threads each get their own
+
         try:
             if config is None:
                 config = cls.get_config()
                
             if '__env_run' in config:
+                if in_thread:
+                    raise ValueError(f"can not set run environment variables for {cls.__name__} running in a thread, "
+                        "they would change the environment of every filter in the process")
+
                 logger.warning(f"setting run environment variables for {cls.__name__} here may not take effect, "
                     "consider setting them outside the process or running the filter with the Runner in 'spawn' mode")
 
@@ -764,13 +972,14 @@ class Filter:
 
                 config = dict_without(config, '__env_run')
 
-            filter = cls(config, stop_evt, obey_exit)  # will call .start_logging()
+            filter         = cls(config, stop_evt, obey_exit)  # will call .start_logging()
+            filter.emitter = emitter
            
             try:
                 loop_exc  = Filter.YesLoopException if (LOOP_EXC if loop_exc is None else loop_exc) else Exception
                 prop_exit = PROP_EXIT_FLAGS[PROP_EXIT if prop_exit is None else prop_exit]
                 
-                cls.emitter.filter_name = filter.__class__.__name__
+                emitter.filter_name = filter.__class__.__name__
 
                 filter.init(filter.config)
 
@@ -801,24 +1010,24 @@ class Filter:
                     filter.fini()
 
             except Exception as exc:
-                cls.emitter.stop_lineage_heart_beat()
-                cls.emitter.emit_stop()
+                emitter.stop_lineage_heart_beat()
+                emitter.emit_stop()
                 logger.error(exc)
 
                 raise
 
             except Filter.Exit:
-                cls.emitter.stop_lineage_heart_beat()
-                cls.emitter.emit_stop()
+                emitter.stop_lineage_heart_beat()
+                emitter.emit_stop()
                 pass
 
             finally:
                 filter.stop_logging()  # the very lastest standalone thing we do to make sure we log everything including errors in filter.fini()
-                cls.emitter.stop_lineage_heart_beat()
-                cls.emitter.emit_stop()
+                emitter.stop_lineage_heart_beat()
+                emitter.emit_stop()
         finally:
-            cls.emitter.stop_lineage_heart_beat()
-            cls.emitter.emit_stop()
+            emitter.stop_lineage_heart_beat()
+            emitter.emit_stop()
             stop_evt.set()
 
     @staticmethod
@@ -834,10 +1043,11 @@ class Filter:
         exit_time: float | None = None,
         step_wait: float = 0.05,
         daemon:    bool | None = None,
+        threads:   bool | list[bool] = False,
         step_call: Callable[[], None] | None = None,
     ) -> list[int]:
-        """Run multiple filters in their own processes. They will be run until one or all of them exit cleanly or one of
-        them errors out (depending on options). See Runner class for args.
+        """Run multiple filters in their own processes (or threads). They will be run until one or all of them exit
+        cleanly or one of them errors out (depending on options). See Runner class for args.
 
         Non-Runner args:
             step_call: An optional function to be called after each check step, is possible but unlikely that will never
@@ -850,7 +1060,7 @@ class Filter:
         step_call = step_call or (lambda: None)
         runner    = Filter.Runner(filters, loop_exc=loop_exc, prop_exit=prop_exit, obey_exit=obey_exit,
             stop_exit=stop_exit, stop_evt=stop_evt, sig_stop=sig_stop, exit_time=exit_time, step_wait=step_wait,
-            daemon=daemon)
+            daemon=daemon, threads=threads)
 
         while not (retcodes := runner.step()):
             step_call()
@@ -858,6 +1068,31 @@ class Filter:
         return retcodes
 
     class Runner:
+        class Thread(threading.Thread):
+            """Filter run in a thread of this process with the same interface as the multiprocessing.Process it
+            replaces. `exitcode` is 0 on clean exit, 1 on exception. Can not be terminated."""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+
+                self.exitcode = None
+
+            def run(self):
+                try:
+                    super().run()
+
+                except SystemExit as exc:
+                    self.exitcode = exc.code if isinstance(exc.code, int) else 1
+
+                except BaseException:  # already logged by Filter.run()
+                    self.exitcode = 1
+
+                else:
+                    self.exitcode = 0
+
+            def terminate(self):
+                logger.warning(f'can not terminate filter thread {self.name}')
+
         def __init__(self,
             filters:   list[tuple['Filter', dict[str, Any]]],
             *,
@@ -870,10 +1105,11 @@ class Filter:
             exit_time: float | None = None,
             step_wait: float = 0.05,
             daemon:    bool | None = None,
+            threads:   bool | list[bool] = False,
             start:     bool = True,
         ) -> list[int]:
-            """Run multiple filters in their own processes. They will be run until one or all of them exit cleanly
-            (depending on options) or one of them errors out. The simple loop is:
+            """Run multiple filters in their own processes (or threads). They will be run until one or all of them exit
+            cleanly (depending on options) or one of them errors out. The simple loop is:
 
                 runner = Runner(...)
                 while not (retcodes := runner.step()):
@@ -922,6 +1158,12 @@ class Filter:
 
                 daemon: Value to set for child processes.
 
+                threads: Run the filters as threads of this process instead of child processes, True for all of them or
+                    a list of bools, one per filter. Filters in threads connected by 'inproc://' pass Frames by
+                    reference without serialization. They share the GIL so this suits light filters or ones which
+                    spend their time in native code which releases it. Threads can not be killed on `exit_time`.
+                    Each filter in a thread gets its own lineage emitter and log files, and can not have '__env_run'.
+
                 start: Whether to automatically start the processes running.
 
             Returns:
@@ -938,10 +1180,27 @@ class Filter:
             self.exit_time  = exit_time
             self.step_wait  = step_wait
             self.retcodes   = None
-            self.proc_stops = [mp.Event() for _ in range(len(filters))]
-            self.procs      = [mp.Process(target=filter.run, args=(dict_without(config, '__env_run'),), daemon=daemon,
-                kwargs=dict(loop_exc=loop_exc, prop_exit=prop_exit, obey_exit=obey_exit, stop_evt=proc_stop_evt))
-                for proc_stop_evt, (filter, config) in zip(self.proc_stops, filters)]
+            self.threads    = threads = [threads] * len(filters) if isinstance(threads, bool) else list(threads)
+
+            if len(threads) != len(filters):
+                raise ValueError(f'threads must be a bool or one per filter, got {len(threads)} for {len(filters)} filters')
+
+            for thread, (filter, config) in zip(threads, filters):
+                if thread and '__env_run' in config:
+                    raise ValueError(f"can not set run environment variables for {filter.__name__} running as a "
+                        "thread, they would change the environment of every filter in the process")
+
+            self.proc_stops = [threading.Event() if thread else mp.Event() for thread in threads]
+            self.procs      = [
+                Filter.Runner.Thread(target=filter.run, args=(dict_without(config, '__env_run'),),
+                    name=config.get('id') or filter.__name__, daemon=True if daemon is None else daemon,
+                    kwargs=dict(loop_exc=loop_exc, prop_exit=prop_exit, obey_exit=obey_exit, stop_evt=proc_stop_evt,
+                    sig_stop=False))
+                if thread else
+                mp.Process(target=filter.run, args=(dict_without(config, '__env_run'),), daemon=daemon,
+                    kwargs=dict(loop_exc=loop_exc, prop_exit=prop_exit, obey_exit=obey_exit, stop_evt=proc_stop_evt))
+                for thread, proc_stop_evt, (filter, config) in zip(threads, self.proc_stops, filters)
+            ]
             self.stop_      = lambda s: (logger.info(s), self.stop_evt.set())
 
             if start:
@@ -1010,7 +1269,8 @@ class Filter:
                         logger.critical(f'TIMEOUT, terminating all subprocesses, but not self!')
 
                     for proc in procs:  # kill them anyway just to be reeeally sure, sometimes they come back... (because they haven't started yet)
-                        proc.terminate()  # terminate() instead of kill() so that child SignalStopper can kill all ITS children as well
+                        if not isinstance(proc, Filter.Runner.Thread) or proc.is_alive():
+                            proc.terminate()  # terminate() instead of kill() so that child SignalStopper can kill all ITS children as well
 
                 DaemonicTimer(exit_time, timeout).start()
 
@@ -100,6 +100,8 @@ class MQTTOut(Filter):
 
             "topic/data/sub/more" - Map "topic" Frame.data['sub']['more'] to "base_topic/more".
 
+            If only data is mapped then add '!noimage' to the sources so that upstream doesn't even send the images.
+
         broker_host:
             If specifying via `mappings`, you can specify the broker host here.
 
@@ -59,7 +59,8 @@ class Recorder(Filter):
     Notes:
         * The "+" is optional for including ('+/meta' is same as '/meta'), the "-" is not.
 
-        * Only data is recorded, not images.
+        * Only data is recorded, not images. Add '!noimage' to the sources so that upstream doesn't even send them,
+        e.g. 'tcp://localhost:5550!noimage'.
     """
 
     FILTER_TYPE = 'Output'
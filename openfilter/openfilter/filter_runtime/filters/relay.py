@@ -0,0 +1,67 @@
+import logging
+
+from openfilter.filter_runtime.filter import Filter, FilterConfig
+
+__all__ = ['RelayConfig', 'Relay']
+
+logger = logging.getLogger(__name__)
+
+
+class RelayConfig(FilterConfig):
+    pass
+
+
+class Relay(Filter):
+    """Republish everything that comes in on `sources` to `outputs` exactly as it was received. Messages are never
+    converted to Frames so jpg images are not decoded or encoded again, raw images are not copied and the data is not
+    parsed and serialized again. Meant to take the cost of fan-out to many subscribers (and the effect of slow ones) off
+    of a busy upstream filter like a VideoIn, possibly from another host. The upstream filter then only has to serve
+    this one relay.
+
+    config:
+        sources:
+            Where to get messages from, normally just one. Can be ephemeral '?' to never hold up upstream, in which
+            case messages will be skipped if downstream of the relay is slower. Topic selection and mapping work as
+            usual, no topics means all of them (except hidden '_' ones like '_metrics').
+
+        outputs:
+            Where to republish to, any number of addresses with any number of clients each.
+
+    Notes:
+        * `sources_prefetch`, `sources_decode`, `outputs_thread` and `mq_threads` are ignored as there is no conversion
+        work to overlap. `outputs_jpg` does not apply as images go out in whatever form they came in.
+
+        * Message ids pass through as usual so downstream stays in sync with upstream, balanced markings as well.
+
+        * Data compression on 'tcp://' is negotiated separately on each side of the relay.
+    """
+
+    FILTER_TYPE = 'System'
+
+    @classmethod
+    def normalize_config(cls, config):
+        config = RelayConfig(super().normalize_config(config))
+
+        if not config.sources:
+            raise ValueError('must specify at least one source')
+        if not config.outputs:
+            raise ValueError('must specify at least one output')
+
+        return config
+
+    def init(self, config):
+        super().init(FilterConfig(config, sources_prefetch=None, sources_decode=None, outputs_thread=None,
+            mq_threads=None))
+
+    def process_frames(self, frames):  # messages pass straight through, process() is never called
+        return frames
+
+    def mq_recv(self, timeout=None):
+        return self.mq.recv_raw(timeout)
+
+    def mq_send(self, frames, timeout=None):
+        return self.mq.send_raw(frames, timeout)
+
+
+if __name__ == '__main__':
+    Relay.run()
@@ -226,6 +226,8 @@ class REST(Filter):
                     except Full:
                         logger.warning(f'queue full, discarding message')
 
+                        self.count_drop('queue_full', topic)
+
                 return func
 
             func = closure(topic, fields)
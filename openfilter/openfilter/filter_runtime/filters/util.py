@@ -6,6 +6,7 @@ from time import sleep, time
 
 import cv2
 
+from openfilter.filter_runtime.bufpool import pool_resize
 from openfilter.filter_runtime.filter import FilterConfig, Filter, Frame
 from openfilter.filter_runtime.metrics import Metrics
 from openfilter.filter_runtime.mq import MQ
@@ -295,7 +296,7 @@ class Util(Filter):
             h = max(h, height)
 
         if w != frame.width or h != frame.height:
-            frame = Frame(cv2.resize(frame.image, (w, h), interpolation=interp), frame)
+            frame = Frame(pool_resize(frame.image, (w, h), interp), frame)
 
         return frame
 
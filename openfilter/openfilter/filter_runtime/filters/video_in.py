@@ -3,7 +3,7 @@ import os
 import re
 from threading import Condition, Event, Thread
 from time import time_ns, sleep
-from typing import Any
+from typing import Any, Callable
 from urllib.parse import urlparse
 
 import cv2
@@ -127,6 +127,7 @@ class VideoReader:
         resize:  str | None = None,
         region:  str | None = None,
         expiration: int | None = None,
+        on_drop: Callable[[str], None] | None = None,
     ):
         """Read a single video file, network stream or webcam until the end.
 
@@ -151,6 +152,9 @@ class VideoReader:
                 interpolation, default is 'near'est neighbor.
 
             resize: Straight resize always, can not be specified together with `maxsize`, it is one or the other.
+
+            on_drop: Called with the reason for each frame which is read but skipped, 'maxfps' for skipped to stay
+                under `maxfps` and 'realtime' for overwritten by a newer one before it was picked up.
         """
 
         from vidgear.gears import VideoGear
@@ -161,6 +165,7 @@ class VideoReader:
         self.VideoGear     = VideoGear
         self.source        = hide_uri_users_and_pwds(source)
         self.cond          = cond
+        self.on_drop       = (lambda r: None) if on_drop is None else on_drop
         self.loop          = 0 if loop is True else 1 if loop is False else loop
         self.maxfps        = maxfps = VIDEO_IN_MAXFPS if maxfps is None else maxfps
         self.maxsize       = None if (s := VIDEO_IN_MAXSIZE if maxsize is None else maxsize) is None else parse_size(s)
@@ -289,6 +294,8 @@ class VideoReader:
 
             if (ns_per_maxfps := self.ns_per_maxfps) is not None:  # skip frames until we reach maxfps, keep remainder, if more than one frame over then discard extra time
                 if (tdiff := t - (tmaxfps := self.tmaxfps)) < ns_per_maxfps:
+                    self.on_drop('maxfps')
+
                     return False
 
                 self.tmaxfps = tmaxfps + (tdiff // ns_per_maxfps) * ns_per_maxfps
@@ -393,6 +400,9 @@ class VideoReader:
                 elif not self.as_bgr:
                     image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
+            if image is not None and self.deque:  # deque holds one, unread frame is overwritten to stay realtime
+                self.on_drop('realtime')
+
             self.deque.append((image, tframe))
 
             if cond is not None:
@@ -727,8 +737,8 @@ class VideoIn(Filter):
 
         for source in config.sources:
             vsources.append(source.source)
-            topics.append(source.topic or 'main')
-            optionss.append(source.options or {})
+            topics.append(topic := source.topic or 'main')
+            optionss.append({**(source.options or {}), 'on_drop': lambda reason, topic=topic: self.count_drop(reason, topic)})
 
         default_options  = {'bgr': config.bgr, 'sync': config.sync, 'loop': config.loop, 'maxfps': config.maxfps,
             'maxsize': config.maxsize, 'resize': config.resize}
@@ -1,7 +1,7 @@
 import logging
 import os
 from queue import Queue
-from threading import Thread
+from threading import Lock, Thread
 
 from openfilter.filter_runtime.filter import FilterConfig, Filter
 from openfilter.filter_runtime.utils import dict_without, split_commas_maybe
@@ -60,8 +60,16 @@ class Webvis(Filter):
             queue = self.streams.get(topic) or self.streams.setdefault(topic, Queue(QUEUE_LEN))
 
             def gen():
-                while True:
-                    yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + queue.get().bgr.jpg + b'\r\n')
+                with self.lock:
+                    self.viewers[topic] = self.viewers.get(topic, 0) + 1
+
+                try:
+                    while True:
+                        yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + queue.get().bgr.jpg + b'\r\n')
+
+                finally:
+                    with self.lock:
+                        self.viewers[topic] -= 1
 
             return StreamingResponse(gen(), media_type='multipart/x-mixed-replace; boundary=frame')
         
@@ -71,7 +79,10 @@ class Webvis(Filter):
             import time
             def gen():
                 while True:
-                    yield f"data: {self.current_data}\n\n"
+                    with self.lock:
+                        current_data = self.current_data
+
+                    yield f"data: {current_data}\n\n"
                     time.sleep(1)
 
             return StreamingResponse(gen(), media_type='text/event-stream')
@@ -124,7 +135,10 @@ class Webvis(Filter):
         return config
 
     def setup(self, config):
-        self.streams = {}  # {'topic': Queue, ...}
+        self.streams      = {}  # {'topic': Queue, ...}
+        self.viewers      = {}  # {'topic': number of clients streaming it, ...}
+        self.current_data = {}
+        self.lock         = Lock()  # viewers and current_data, changed and read from both the server and filter threads
 
         Thread(target=self.serve, args=(config.host, config.port), daemon=True).start()
 
@@ -133,7 +147,16 @@ class Webvis(Filter):
             if frame.has_image:
                 if (queue := self.streams.get(topic) or self.streams.setdefault(topic, Queue(QUEUE_LEN))).empty():
                     queue.put(frame)
-                    self.current_data = frame.data
+
+                    with self.lock:
+                        self.current_data = frame.data
+
+                else:
+                    with self.lock:
+                        watched = bool(self.viewers.get(topic))
+
+                    if watched:  # nobody watching is not a drop
+                        self.count_drop('busy', topic)
 
 
 if __name__ == '__main__':
@@ -2,19 +2,37 @@
 minimize format conversions and redundant jpg encoding. So that for example if a jpg encoded image comes from the
 network, and it is only read, that the jpg data is available on the way out without having to reencode.
 
+Same for `data`, which can be given as the JSON it came in as and is only parsed on first access. Until somebody gets
+it from .data (and so might modify it) .json is those original bytes, so a filter which doesn't touch the data of a
+Frame passes it on without it ever being serialized again. Reading it with .ro_data parses but doesn't count as a
+modification.
+
 WARNING! Grayscale hasn't gotten all the love it probably deserves.
+
+YUV 4:2:0 images as video decoders give them and encoders want them can be kept as they are in the 'NV12' (Y plane
+then interleaved UV) and 'I420' (Y, U, V planes) formats. Their image is the planar (height * 3 / 2, width) array, so
+`shape` is that while `height` and `width` are those of the picture. They convert to RGB / BGR on first use of .rgb /
+.bgr and .gray is just the Y plane. They go between filters raw as they are (half the size of BGR), encoded (jpg etc...)
+they go as BGR.
 """
 
+import re
+from json import loads as json_loads, dumps as json_dumps
 from typing import Any, Literal, Union
 
 import cv2
 import numpy as np
 from numpy import ndarray
 
+from .bufpool import pool_copy, pool_cvt_color, pool_resize
+
 __all__ = ['ShapeAndFormat', 'Frame']
 
 ShapeAndFormat = tuple[tuple[int, int, int] | tuple[int, int], str]
 
+JSON_EMPTY     = re.compile(rb'\s*\{\s*\}\s*')  # fullmatch, gives up at the first thing after '{'
+JSON_START     = re.compile(rb'\s*\{')
+
 
 class Frame:
     """Frame with attached data dictionary. Automatic handling and caching and passthrough of jpg encoded image. Also
@@ -22,6 +40,7 @@ class Frame:
 
     Create:
         Frame(image: ndarray | None, data: dict | None, format: str | None)  - if data is None then set to empty {}
+        Frame(image: ndarray | None, data: bytes,       format: str | None)  - data as JSON, parsed on first access
         Frame(image: ndarray | None, data: Frame,       format: str | None)  - data copied from Frame, also format if not provided
         Frame(image: Frame,          data: dict | None, format: str | None)  - if data is None then copied from Frame, image (including cached jpg) copied from Frame
         Frame(image: dict)                                                   - data-only frame, leave the others None as they have no effect
@@ -31,10 +50,22 @@ class Frame:
     Notes:
         * Use 'frame.rw_rgb' in place of "frame.rw.rgb' or 'frame.rgb.rw', it will always give the most efficient
         conversion from whatever you start with. Obiously same for '.ro' and '.bgr'.
+
+        * Use 'frame.crop(x, y, w, h)' for regions of interest, these are views of the image and not copies. If the
+        uncropped Frame goes out in the same message then MQ can send crops as just their boxes in it, see mq.py.
+
+        * Use 'frame.ro_data' to only read the data, 'frame.data' is assumed to be modified so its JSON is no longer
+        passed through as it came and has to be serialized again on the way out.
+
+        * Use 'frame.decoded(scale=1/4)' or 'frame.decoded(gray=True)' if you only need a smaller or grayscale image, a
+        jpg-only Frame is then decoded directly at that size / to gray which is several times faster than decoding the
+        whole thing and then resizing / converting.
     """
 
     image:     np.ndarray | None  # be aware can be readonly, in order to guarantee writable .image use 'frame.rw.image'
     data:      dict[str, Any]
+    ro_data:   dict[str, Any]  # for reading only, don't modify
+    json:      bytes
 
     shapef:    ShapeAndFormat | None
     shape:     tuple[int, int, int] | tuple[int, int] | None
@@ -47,12 +78,14 @@ class Frame:
     has_jpg:   bool | None
     has_raw:   bool | None
     has_image: bool
+    has_data:  bool
 
     is_rw:     bool | None
     is_ro:     bool | None
     is_rgb:    bool | None
     is_bgr:    bool | None
     is_gray:   bool | None
+    is_yuv:    bool | None
 
     rw:        'Frame'
     ro:        'Frame'
@@ -65,38 +98,62 @@ class Frame:
     ro_rgb:    'Frame'
     ro_bgr:    'Frame'
 
+    parent:    Union['Frame', None]  # the Frame this is a crop() of, if it is one
+    box:       tuple[int, int, int, int] | None  # (x, y, width, height) of the crop() in parent
+
     fullstr:   str
 
     __image:   np.ndarray | Literal[False] | None
-    __data:    dict[str, Any]
+    __data:    list  # [dict | None, JSON bytes | None] shared by Frames made from this one, one or both parts present
     __jpg:     bytes | bytearray | Literal[False] | None
     __shapef:  ShapeAndFormat | None
+    __parent:  Union['Frame', None]
+    __box:     tuple[int, int, int, int] | None
 
 
-    FORMATS          = ('RGB', 'BGR', 'GRAY')
+    FORMATS          = ('RGB', 'BGR', 'GRAY', 'NV12', 'I420')
     FORMATS_AND_NONE = FORMATS + (None,)
+    YUV_FORMATS      = ('NV12', 'I420')
+    YUV_CVT          = {  # {(YUV format, to format): cvtColor code}
+        ('NV12', 'RGB'): cv2.COLOR_YUV2RGB_NV12, ('NV12', 'BGR'): cv2.COLOR_YUV2BGR_NV12,
+        ('I420', 'RGB'): cv2.COLOR_YUV2RGB_I420, ('I420', 'BGR'): cv2.COLOR_YUV2BGR_I420,
+    }
+    DECODE_REDUCED   = {  # {(scale denominator, gray): imdecode flag}
+        (1, False): cv2.IMREAD_COLOR,           (1, True): cv2.IMREAD_GRAYSCALE,
+        (2, False): cv2.IMREAD_REDUCED_COLOR_2, (2, True): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+        (4, False): cv2.IMREAD_REDUCED_COLOR_4, (4, True): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+        (8, False): cv2.IMREAD_REDUCED_COLOR_8, (8, True): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    }
 
     def __init__(self,
         image:  Union[np.ndarray, 'Frame', dict, None] = None,
         data:   Union[dict, 'Frame', None] = None,
         format: Union[str, 'Frame', None] = None,
     ):
+        self.__parent = self.__box = None
+
         if isinstance(image, dict):
             self.__image = self.__jpg = self.__shapef = None
-            self.__data  = image
+            self.__data  = [image, None]
 
         elif isinstance(image, Frame):
             self.__image  = image.__image
-            self.__data   = image.__data if data is None else data.__data if isinstance(data, Frame) else data
+            self.__data   = image.__data if data is None else data.__data if isinstance(data, Frame) else Frame.data_part(data)
             self.__jpg    = image.__jpg
             self.__shapef = shapef if (shapef := image.__shapef) is None or \
                 (format := Frame.validate_format_or_Frame(format)) is None else (shapef[0], format)
+            self.__parent = image.__parent
+            self.__box    = image.__box
+
+            if shapef is not None and format is not None and format != shapef[1] and \
+                    (format in Frame.YUV_FORMATS or shapef[1] in Frame.YUV_FORMATS):
+                raise ValueError(f'can not relabel a {shapef[1]} image as {format}, convert it')
 
         else:  # isinstance(image, (ndarray, NoneType))
             self.__image = image
 
             if not isinstance(data, Frame):
-                self.__data = {} if data is None else data
+                self.__data = Frame.data_part(data)
 
             else:
                 self.__data = data.__data
@@ -111,31 +168,38 @@ class Frame:
                 self.__jpg = False  # False means jpg of valid image not created yet because None means no image at all
 
                 if (lshape := len(shape := image.shape)) == 2:
-                    self.__shapef = (shape, 'GRAY')
+                    if (format := Frame.validate_format_or_Frame(format)) not in Frame.YUV_FORMATS:
+                        self.__shapef = (shape, 'GRAY')
+                    elif shape[0] % 3 or shape[1] % 2:  # (height * 3 / 2, width) with even height and width
+                        raise ValueError(f'invalid {format} image shape {shape}')
+                    else:
+                        self.__shapef = (shape, format)
                 elif lshape != 3 or shape[2] != 3:
                     raise ValueError('invalid image')
                 elif (format := Frame.validate_format_or_Frame(format)) is None:
                     raise ValueError('must specify format here')
+                elif format in Frame.YUV_FORMATS:
+                    raise ValueError(f'{format} image must be planar (height * 3 / 2, width), not {shape}')
                 else:
                     self.__shapef = (shape, format)
 
     def __eq__(self, other):
         return not (
             not isinstance(other, Frame) or
-            other.__data != self.__data or
+            other.ro_data != self.ro_data or
             (is_None := other.__image is None) ^ (self.__image is None) or
             (not is_None and not np.array_equal(other.image, self.image))
         )
 
     def __reduce__(self):
-        return (Frame.unreduce, (image := self.__image, self.__data, self.__jpg, self.__shapef,
+        return (Frame.unreduce, (image := self.__image, self.ro_data, self.__jpg, self.__shapef,
             image.flags.writeable if isinstance(image, ndarray) else None))
 
     @staticmethod
     def unreduce(image, data, jpg, shapef, writeable):
         frame          = Frame()
         frame.__image  = image
-        frame.__data   = data
+        frame.__data   = [data, None]
         frame.__jpg    = jpg
         frame.__shapef = shapef
 
@@ -147,6 +211,33 @@ class Frame:
 
         return frame
 
+    @staticmethod
+    def json_is_object(json: bytes) -> bool:
+        """Cheap check that `json` looks like a JSON object, only its ends are looked at and it is not parsed."""
+
+        return JSON_START.match(json) is not None and json.rstrip()[-1:] == b'}'
+
+    @staticmethod
+    def json_loads(json: bytes) -> dict:
+        """Parse data JSON which came from elsewhere, with an error that says so."""
+
+        try:
+            data = json_loads(json)
+        except ValueError as exc:  # JSONDecodeError or UnicodeDecodeError
+            raise ValueError(f'invalid Frame data JSON as received from upstream: {exc}') from None
+
+        if not isinstance(data, dict):
+            raise ValueError('invalid Frame data JSON as received from upstream: not an object')
+
+        return data
+
+    @staticmethod
+    def data_part(data: dict | bytes | bytearray | memoryview | None) -> list:
+        """The internal [dict, JSON] of data given as a dict or as JSON (not parsed here)."""
+
+        return [{}, None] if data is None else [None, bytes(data)] if isinstance(data, (bytes, bytearray, memoryview)) \
+            else [data, None]
+
     @staticmethod
     def validate_format_or_Frame(format: Union[str, 'Frame', None]) -> str:
         """Allows None as a format, keep this in mind if you only want an ACTUAL format and check for it yourself."""
@@ -204,9 +295,10 @@ class Frame:
         if not isinstance(blob, (bytes, bytearray)):
             blob = bytearray(memoryview(blob))
 
-        Frame.validate_format(format)
+        if Frame.validate_format(format) in Frame.YUV_FORMATS:
+            raise ValueError(f'an encoded image can not be {format}')
 
-        frame       = Frame(data)
+        frame       = Frame(None, data)
         frame.__jpg = blob if (is_jpg := blob[:2] == b'\xff\xd8') else False
 
         if (have_dims := height is not None and width is not None) and is_jpg:
@@ -227,13 +319,20 @@ class Frame:
 
     from_jpg = from_blob
 
+    @staticmethod
+    def image_shape(height: int, width: int, format: str) -> tuple[int, int, int] | tuple[int, int]:
+        """The shape of the image array of a `height` x `width` picture in `format`."""
+
+        return (height, width) if format == 'GRAY' else (height * 3 // 2, width) if format in Frame.YUV_FORMATS else \
+            (height, width, 3)
+
     def copy(self) -> 'Frame':
         """Make a copy of a self, shallow copy of data, image copy of writable image, no copy if image is readonly."""
 
-        copy = Frame(self, self.__data.copy())
+        copy = Frame(self, self.ro_data.copy())
 
         if isinstance(image := self.__image, ndarray) and image.flags.writeable:
-            copy.__image = image.copy()
+            copy.__image = pool_copy(image)
 
         return copy
 
@@ -251,7 +350,39 @@ class Frame:
 
     @property
     def data(self):
-        return self.__data
+        """The data to read or modify, parsed from JSON if needed. After this the original JSON is not used anymore."""
+
+        if (data := (part := self.__data)[0]) is None:
+            part[0] = data = Frame.json_loads(part[1])
+
+        part[1] = None
+
+        return data
+
+    @property
+    def ro_data(self):
+        """The data for reading only, parsed from JSON if needed. Keeps the original JSON for .json so must not be
+        modified."""
+
+        if (data := (part := self.__data)[0]) is None:
+            part[0] = data = Frame.json_loads(part[1])
+
+        return data
+
+    @property
+    def json(self):
+        """The data as compact JSON, the original bytes it came as if the data has not been gotten from .data since."""
+
+        if (json := (part := self.__data)[1]) is None:
+            json = json_dumps(part[0], separators=(',', ':')).encode()
+
+        return json
+
+    @property
+    def has_data(self):
+        """Whether the data is not empty, without parsing it."""
+
+        return bool(data) if (data := (part := self.__data)[0]) is not None else JSON_EMPTY.fullmatch(part[1]) is None
 
     @property
     def shapef(self):
@@ -267,7 +398,8 @@ class Frame:
 
     @property
     def height(self):
-        return None if (shapef := self.__shapef) is None else shapef[0][0]
+        return None if (shapef := self.__shapef) is None else \
+            shapef[0][0] if shapef[1] not in Frame.YUV_FORMATS else shapef[0][0] * 2 // 3
 
     @property
     def width(self):
@@ -284,7 +416,7 @@ class Frame:
 
         if (jpg := self.__jpg) is False:
             image    = self.__image
-            res, buf = cv2.imencode('.jpg', image)
+            res, buf = cv2.imencode('.jpg', image if self.__shapef[1] not in Frame.YUV_FORMATS else self.bgr.image)
 
             if not res:
                 raise RuntimeError('jpg encoding failed')
@@ -335,6 +467,10 @@ class Frame:
     def is_gray(self):
         return None if (shapef := self.__shapef) is None else shapef[1] == 'GRAY'
 
+    @property
+    def is_yuv(self):
+        return None if (shapef := self.__shapef) is None else shapef[1] in Frame.YUV_FORMATS
+
     @property
     def rw(self):
         """If already writable return self. If jpg-only image then decode and return a NEW Frame with a NEW writable
@@ -343,7 +479,7 @@ class Frame:
         if (image := self.__image) is None or (image is not False and image.flags.writeable):
             return self
 
-        return Frame(self.image.copy(), self, self.__shapef[1])
+        return Frame(pool_copy(self.image), self, self.__shapef[1])
 
     @property
     def ro(self):
@@ -353,7 +489,7 @@ class Frame:
         if (image := self.__image) is None or image is False or not image.flags.writeable:
             return self
 
-        new                   = Frame(image := self.image.copy(), self, self.__shapef[1])
+        new                   = Frame(image := pool_copy(self.image), self, self.__shapef[1])
         image.flags.writeable = False
 
         return new
@@ -363,16 +499,18 @@ class Frame:
         """Return self if already RGB (rw or ro) else convert and return converted Frame with same writability. Decodes
         a non-RGB jpg-only Frame to an actual image then converts."""
 
-        if ((shapef := self.__shapef) and shapef[1]) in ('RGB', None):
+        if ((shapef := self.__shapef) and (format := shapef[1])) in ('RGB', None):
             return self
 
+        code = Frame.YUV_CVT.get((format, 'RGB'), cv2.COLOR_RGB2BGR)
+
         if (image := self.image).flags.writeable:
-            new = Frame(cv2.cvtColor(image, cv2.COLOR_RGB2BGR), self, 'RGB')
+            new = Frame(pool_cvt_color(image, code), self, 'RGB')
         elif (new := getattr(self, '_Frame__ro_rgb', None)) is not None:
             return new
 
         else:
-            self.__ro_rgb = new   = Frame(image := cv2.cvtColor(image, cv2.COLOR_RGB2BGR), self, 'RGB')
+            self.__ro_rgb = new   = Frame(image := pool_cvt_color(image, code), self, 'RGB')
             image.flags.writeable = False
 
         return new
@@ -382,16 +520,18 @@ class Frame:
         """Return self if already BGR (rw or ro) else convert and return converted Frame with same writability. Decodes
         a non-BGR jpg-only Frame to an actual image then converts."""
 
-        if ((shapef := self.__shapef) and shapef[1]) in ('BGR', None):
+        if ((shapef := self.__shapef) and (format := shapef[1])) in ('BGR', None):
             return self
 
+        code = Frame.YUV_CVT.get((format, 'BGR'), cv2.COLOR_RGB2BGR)
+
         if (image := self.image).flags.writeable:
-            new = Frame(cv2.cvtColor(image, cv2.COLOR_RGB2BGR), self, 'BGR')
+            new = Frame(pool_cvt_color(image, code), self, 'BGR')
         elif (new := getattr(self, '_Frame__ro_bgr', None)) is not None:
             return new
 
         else:
-            self.__ro_bgr = new   = Frame(image := cv2.cvtColor(image, cv2.COLOR_RGB2BGR), self, 'BGR')
+            self.__ro_bgr = new   = Frame(image := pool_cvt_color(image, code), self, 'BGR')
             image.flags.writeable = False
 
         return new
@@ -399,18 +539,24 @@ class Frame:
     @property
     def gray(self):
         """Return self if already GRAY (rw or ro) else convert and return converted Frame with same writability. Decodes
-        a non-GRAY jpg-only Frame to an actual image then converts."""
+        a non-GRAY jpg-only Frame to an actual image then converts. For YUV this is the Y plane, a view if readonly."""
 
         if ((shapef := self.__shapef) and (format := shapef[1])) in ('GRAY', None):
             return self
 
         if (image := self.image).flags.writeable:
-            new = Frame(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY if format == 'RGB' else cv2.COLOR_BGR2GRAY), self, 'GRAY')
+            if format in Frame.YUV_FORMATS:
+                return Frame(pool_copy(image[:shapef[0][0] * 2 // 3]), self, 'GRAY')
+
+            new = Frame(pool_cvt_color(image, cv2.COLOR_RGB2GRAY if format == 'RGB' else cv2.COLOR_BGR2GRAY), self, 'GRAY')
         elif (new := getattr(self, '_Frame__ro_gray', None)) is not None:
             return new
 
+        elif format in Frame.YUV_FORMATS:
+            self.__ro_gray = new  = Frame(image[:shapef[0][0] * 2 // 3], self, 'GRAY')  # readonly view of Y plane
+
         else:
-            self.__ro_gray = new  = Frame(image := cv2.cvtColor(image, cv2.COLOR_RGB2GRAY if format == 'RGB' else cv2.COLOR_BGR2GRAY), self, 'GRAY')
+            self.__ro_gray = new  = Frame(image := pool_cvt_color(image, cv2.COLOR_RGB2GRAY if format == 'RGB' else cv2.COLOR_BGR2GRAY), self, 'GRAY')
             image.flags.writeable = False
 
         return new
@@ -422,9 +568,9 @@ class Frame:
         if (shapef := self.__shapef) is None:
             return self
         if shapef[1] == 'RGB':
-            return self if (image := self.image).flags.writeable else Frame(image.copy(), self, 'RGB')
+            return self if (image := self.image).flags.writeable else Frame(pool_copy(image), self, 'RGB')
 
-        return Frame(cv2.cvtColor(self.image, cv2.COLOR_RGB2BGR), self, 'RGB')
+        return Frame(pool_cvt_color(self.image, Frame.YUV_CVT.get((shapef[1], 'RGB'), cv2.COLOR_RGB2BGR)), self, 'RGB')
 
     @property
     def rw_bgr(self):
@@ -433,9 +579,9 @@ class Frame:
         if (shapef := self.__shapef) is None:
             return self
         if shapef[1] == 'BGR':
-            return self if (image := self.image).flags.writeable else Frame(image.copy(), self, 'BGR')
+            return self if (image := self.image).flags.writeable else Frame(pool_copy(image), self, 'BGR')
 
-        return Frame(cv2.cvtColor(self.image, cv2.COLOR_RGB2BGR), self, 'BGR')
+        return Frame(pool_cvt_color(self.image, Frame.YUV_CVT.get((shapef[1], 'BGR'), cv2.COLOR_RGB2BGR)), self, 'BGR')
 
     @property
     def ro_rgb(self):
@@ -449,13 +595,14 @@ class Frame:
             if (image := self.__image) is False or not image.flags.writeable:
                 return self
 
-            new = Frame(new_image := image.copy(), self, 'RGB')
+            new = Frame(new_image := pool_copy(image), self, 'RGB')
 
         elif (new := getattr(self, '_Frame__ro_rgb', None)) is not None:
             return new
 
         else:
-            new           = Frame(new_image := cv2.cvtColor(image := self.image, cv2.COLOR_RGB2BGR), self, 'RGB')
+            new           = Frame(new_image := pool_cvt_color(self.image, Frame.YUV_CVT.get((shapef[1], 'RGB'),
+                cv2.COLOR_RGB2BGR)), self, 'RGB')
             self.__ro_rgb = new
 
         new_image.flags.writeable = False
@@ -474,19 +621,112 @@ class Frame:
             if (image := self.__image) is False or not image.flags.writeable:
                 return self
 
-            new = Frame(new_image := image.copy(), self, 'BGR')
+            new = Frame(new_image := pool_copy(image), self, 'BGR')
 
         elif (new := getattr(self, '_Frame__ro_bgr', None)) is not None:
             return new
 
         else:
-            new           = Frame(new_image := cv2.cvtColor(image := self.image, cv2.COLOR_RGB2BGR), self, 'BGR')
+            new           = Frame(new_image := pool_cvt_color(self.image, Frame.YUV_CVT.get((shapef[1], 'BGR'),
+                cv2.COLOR_RGB2BGR)), self, 'BGR')
             self.__ro_bgr = new
 
         new_image.flags.writeable = False
 
         return new
 
+    def decoded(self, scale: float = 1, gray: bool = False) -> 'Frame':
+        """Return a Frame with the image reduced by `scale` (1, 1/2, 1/4 or 1/8, size rounded up) and / or converted to
+        GRAY, sharing data with self. A jpg-only Frame is decoded straight to this without ever decoding the full image,
+        otherwise the image is resized (INTER_AREA) / converted. Same writability as self, readonly results are cached
+        per variant so the decode only happens once."""
+
+        if (denom := {1: 1, 0.5: 2, 0.25: 4, 0.125: 8}.get(scale)) is None:
+            raise ValueError(f'invalid decode scale {scale!r}, must be one of 1, 1/2, 1/4 or 1/8')
+
+        if (shapef := self.__shapef) is None:
+            return self
+
+        format = shapef[1]
+        gray   = gray or format == 'GRAY'
+        image  = self.__image
+
+        if format in Frame.YUV_FORMATS:
+            return self.gray.decoded(scale) if gray else self if denom == 1 else self.bgr.decoded(scale)
+
+        if denom == 1 and (not gray or format == 'GRAY' or image is not False):  # nothing to gain over .gray
+            return self.gray if gray else self
+
+        if image is not False and image.flags.writeable:
+            cached = None
+
+        else:
+            if (cached := getattr(self, '_Frame__ro_decoded', None)) is None:
+                self.__ro_decoded = cached = {}
+
+            if (new := cached.get(key := (denom, gray))) is not None:
+                return new
+
+        if image is False:  # jpg-only, RGB is decoded as color first because the jpg holds it as if it were BGR
+            image = cv2.imdecode(np.frombuffer(self.__jpg, np.uint8), Frame.DECODE_REDUCED[(denom, gray and format != 'RGB')])
+
+            if image is None:
+                raise ValueError('jpg decode failed')
+            if gray and format == 'RGB':
+                image = pool_cvt_color(image, cv2.COLOR_RGB2GRAY)
+
+        else:
+            if gray and format != 'GRAY':
+                image = pool_cvt_color(image, cv2.COLOR_RGB2GRAY if format == 'RGB' else cv2.COLOR_BGR2GRAY)
+
+            height, width = shapef[0][:2]
+            image         = pool_resize(image, (-(-width // denom), -(-height // denom)), cv2.INTER_AREA)
+
+        new = Frame(image, self, 'GRAY' if gray else format)
+
+        if cached is not None:
+            image.flags.writeable = False
+            cached[key]           = new
+
+        return new
+
+    @property
+    def parent(self):
+        return self.__parent
+
+    @property
+    def box(self):
+        return self.__box
+
+    def crop(self, x: int, y: int, width: int, height: int, data: dict | None = None) -> 'Frame':
+        """Return a NEW readonly Frame of the `width` x `height` region at `x`, `y` of the image with `data` (or empty).
+        The image is a view of this one so nothing is copied, and the crop has this Frame as its `parent` (or the parent
+        of this one if it is itself a crop) and its `box` in that. A writable Frame is made readonly first with a copy,
+        so if cropping more than once then crop from 'frame.ro' (and send that one so MQ can reference it)."""
+
+        if (shapef := self.__shapef) is None:
+            raise ValueError('can not crop a Frame without an image')
+        if shapef[1] in Frame.YUV_FORMATS:
+            raise ValueError(f'can not crop a {shapef[1]} Frame, crop its .bgr or .rgb')
+
+        fheight, fwidth = shapef[0][:2]
+
+        if not (0 <= x and 0 <= y and 0 < width and 0 < height and x + width <= fwidth and y + height <= fheight):
+            raise ValueError(f'invalid crop {(x, y, width, height)} of {fwidth}x{fheight} image')
+
+        if (parent := self.__parent) is None:
+            parent = ro = self.ro
+            px, py = 0, 0
+        else:
+            ro     = self  # crops are always readonly
+            px, py = self.__box[:2]
+
+        new          = Frame(ro.image[y : y + height, x : x + width], data, shapef[1])  # readonly view
+        new.__parent = parent
+        new.__box    = (px + x, py + y, width, height)
+
+        return new
+
     @property
     def fullstr(self):
-        return f'{repr(self)[:-1]}, {self.data})'
+        return f'{repr(self)[:-1]}, {self.ro_data})'
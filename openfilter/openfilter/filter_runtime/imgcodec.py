@@ -0,0 +1,118 @@
+"""Image codecs for images sent between filters. An image goes out encoded by the codec chosen for its output and topic
+(see MQ `outs_codec`) and the name of that codec goes along in the 'img' envelope field so that the receiver knows how
+to decode it.
+
+A codec is given as 'name' or 'name:param', e.g. 'jpg:70'. Built in:
+
+    raw: The pixels as they are, zero copy on send and receive where possible.
+
+    raw+zstd, raw+lz4, raw+zlib: The pixels compressed losslessly by the data compression codecs of zeromq.py ('zstd'
+        and 'lz4' need their optional packages). Fast, for synthetic or mostly flat images. Never decompressed to more
+        than the size of the image the envelope says it is.
+
+    jpg: Param is quality 0-100. Without a param this is whatever Frame.jpg gives, which may have come already encoded
+        from upstream and so costs nothing.
+
+    png: Lossless, param is compression 0-9, default 1 for speed.
+
+    webp: Param is quality 1-100, default 75, above 100 is lossless.
+
+More can be added with register_image_codec(), the receivers need them registered as well.
+"""
+
+from typing import Callable, NamedTuple
+
+import cv2
+import numpy as np
+
+from .zeromq import CODECS
+
+__all__ = ['ImageCodec', 'IMAGE_CODECS', 'register_image_codec', 'parse_image_codec', 'encode_image', 'decode_image']
+
+
+class ImageCodec(NamedTuple):
+    encode: Callable[[np.ndarray, int | None], bytes | bytearray]  # (image, param) -> encoded
+    decode: Callable[[memoryview, tuple[int, ...]], np.ndarray]    # (encoded, shape) -> image of that shape
+
+
+IMAGE_CODECS = {}  # {'name': ImageCodec, ...}
+
+
+def register_image_codec(name: str, encode: Callable[[np.ndarray, int | None], bytes | bytearray],
+        decode: Callable[[memoryview, tuple[int, ...]], np.ndarray]):
+    """Add (or replace) an image codec. `encode(image, param)` gets a (height, width) or (height, width, channels) uint8
+    image and the param of the codec (None if not given) and `decode(encoded, shape)` must give back an image of that
+    shape."""
+
+    if not name or any(c in name for c in ':,!/='):
+        raise ValueError(f'invalid image codec name {name!r}')
+
+    IMAGE_CODECS[name] = ImageCodec(encode, decode)
+
+
+def parse_image_codec(codec: str) -> tuple[str, int | None]:
+    """Parse 'name:param' to ('name', param) or 'name' to ('name', None). Raises ValueError on an unknown codec."""
+
+    name, _, param = codec.strip().partition(':')
+
+    if name not in IMAGE_CODECS:
+        raise ValueError(f'unknown image codec {name!r}, must be one of {list(IMAGE_CODECS)}')
+
+    try:
+        return name, int(param) if param else None
+    except ValueError:
+        raise ValueError(f'invalid image codec param in {codec!r}') from None
+
+
+def encode_image(image: np.ndarray, name: str, param: int | None = None) -> bytes | bytearray:
+    return IMAGE_CODECS[name].encode(image, param)
+
+
+def decode_image(encoded: bytes | bytearray | memoryview, name: str, shape: tuple[int, ...]) -> np.ndarray:
+    if (codec := IMAGE_CODECS.get(name)) is None:
+        raise ValueError(f'unknown image codec {name!r}')
+
+    return codec.decode(encoded, shape)
+
+
+def cv2_codec(ext: str, flag: int | None, default: int | None = None) -> tuple[Callable, Callable]:
+    def encode(image: np.ndarray, param: int | None) -> bytearray:
+        res, buf = cv2.imencode(ext, image, [] if flag is None or (param := default if param is None else param) is None
+            else [flag, param])
+
+        if not res:
+            raise RuntimeError(f'{ext[1:]} encoding failed')
+
+        return bytearray(memoryview(buf))
+
+    def decode(encoded: memoryview, shape: tuple[int, ...]) -> np.ndarray:
+        if (image := cv2.imdecode(np.frombuffer(encoded, np.uint8),
+                cv2.IMREAD_GRAYSCALE if len(shape) == 2 or shape[2] == 1 else cv2.IMREAD_COLOR)) is None:
+            raise ValueError(f'invalid {ext[1:]} image')
+
+        return image.reshape(shape)
+
+    return encode, decode
+
+
+def raw_codec(compress: Callable[[bytes], bytes] | None = None,
+        decompress: Callable[[bytes, int], bytes] | None = None) -> tuple[Callable, Callable]:
+    def encode(image: np.ndarray, param: int | None) -> bytes | bytearray:
+        raw = bytearray(memoryview(np.ascontiguousarray(image)))
+
+        return raw if compress is None else compress(raw)
+
+    def decode(encoded: memoryview, shape: tuple[int, ...]) -> np.ndarray:
+        return np.frombuffer(encoded if decompress is None else decompress(encoded, int(np.prod(shape))),  # never more than the image
+            np.uint8).reshape(shape)
+
+    return encode, decode
+
+
+register_image_codec('raw', *raw_codec())
+register_image_codec('jpg', *cv2_codec('.jpg', cv2.IMWRITE_JPEG_QUALITY))
+register_image_codec('png', *cv2_codec('.png', cv2.IMWRITE_PNG_COMPRESSION, 1))
+register_image_codec('webp', *cv2_codec('.webp', cv2.IMWRITE_WEBP_QUALITY, 75))
+
+for _name, (_compress, _decompress) in CODECS.items():
+    register_image_codec(f'raw+{_name}', *raw_codec(_compress, _decompress))
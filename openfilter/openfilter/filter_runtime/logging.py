@@ -13,10 +13,11 @@ Environment variables:
 
 import logging
 import os
+import threading
 from datetime import datetime
-from time import time
 from typing import Literal
 
+from .metrics import MetricsAggregator
 from .rolllog import RollLog
 from .utils import JSONType, sanitize_filename
 
@@ -48,10 +49,23 @@ LogCategory = Literal['logs'] | Literal['metrics']
 
 
 class LogHandler(logging.Handler):
-    def __init__(self, rlog: RollLog):
+    """Writes the records of the root logger to a RollLog. Handlers of Loggers for filters running as threads of one
+    process own their thread, records of an owned thread only go to its own handler. Records of other threads (helper
+    threads of the filters or the main thread) can not be told apart and go to every handler."""
+
+    owners = {}  # {thread ident: LogHandler, ...} of handlers which own a thread
+
+    def __init__(self, rlog: RollLog, own_thread: bool = False):
         logging.Handler.__init__(self)
 
-        self.rlog = rlog
+        self.rlog  = rlog
+        self.ident = threading.get_ident() if own_thread else None
+
+        if own_thread:
+            LogHandler.owners[self.ident] = self
+
+    def filter(self, record):
+        return LogHandler.owners.get(record.thread) in (None, self) and logging.Handler.filter(self, record)
 
     def emit(self, record):
         self.rlog.write({
@@ -66,6 +80,9 @@ class LogHandler(logging.Handler):
         self.rlog.flush()
 
     def close(self):
+        if self.ident is not None and LogHandler.owners.get(self.ident) is self:
+            del LogHandler.owners[self.ident]
+
         logging.Handler.close(self)
 
 
@@ -76,9 +93,12 @@ class Logger:
         *,
         log_path:         str | Literal[False] | None = None,
         metrics_interval: float | None = None,
+        own_thread:       bool = False,
     ):
+        """Logs and metrics of a filter under `log_path`/`id`. With `own_thread` the logs only get the records of the
+        current thread (and of threads which no other Logger owns), for filters running as threads of one process."""
+
         self.fixed_metrics = {}
-        self.aggregate     = {}  # {'metric': (metric sum, metric count), 'metric_count': metric value}  - first is for averaging, seconcd is last value
 
         if log_path is None:
             log_path = LOG_PATH
@@ -93,13 +113,13 @@ class Logger:
             self.logs_rlog    = RollLog(mode='json',
                 file_size=LOGS_FILE_SIZE, total_size=LOGS_TOTAL_SIZE, utc=utc,
                 **Logger.path_prefix_and_suffix(log_path, id, 'logs'))
-            self.logs_handler = LogHandler(self.logs_rlog)
+            self.logs_handler = LogHandler(self.logs_rlog, own_thread)
             root_logger       = logging.getLogger()
 
             root_logger.addHandler(self.logs_handler)
 
             self.metrics_interval = METRICS_INTERVAL if metrics_interval is None else metrics_interval
-            self.metrics_t        = time() + self.metrics_interval
+            self.metrics_agg      = MetricsAggregator(self.metrics_interval)
             self.metrics_rlog     = RollLog(mode='json',
                 file_size=METRICS_FILE_SIZE, total_size=METRICS_TOTAL_SIZE, utc=utc,
                 **Logger.path_prefix_and_suffix(log_path, id, 'metrics'))
@@ -119,33 +139,11 @@ class Logger:
             self.logs_rlog.close()
 
     def write_metrics(self, metrics: dict[str, JSONType]):
-        td = time() - self.metrics_t
-
-        aggregate = self.aggregate
-
-        for metric, value in metrics.items():  # yes we do 'ts' as well unnecessarily, but it is not used
-            if metric.endswith('_count') or not isinstance(value, (int, float)):
-                aggregate[metric] = value
-            elif (v := aggregate.get(metric)) is None:
-                aggregate[metric] = (value, 1)
-
-            else:
-                sum, num          = v
-                aggregate[metric] = (sum + value, num + 1)
-
-        if td < 0:
+        if (aggregate := self.metrics_agg.add(metrics)) is None:
             return
 
-        ts = metrics['ts']
-
-        for metric, value in aggregate.items():
-            if value.__class__ is tuple:
-                sum, num          = value
-                aggregate[metric] = sum / num
-
-        self.aggregate  = {}
-        self.metrics_t += (td // (mi := METRICS_INTERVAL) + 1) * mi
-        metrics_rlog    = self.metrics_rlog
+        ts           = metrics['ts']
+        metrics_rlog = self.metrics_rlog
 
         metrics_rlog.write({**aggregate, **self.fixed_metrics,
             'ts': datetime.fromtimestamp(ts, metrics_rlog.tz).isoformat()}, ts)
@@ -12,15 +12,16 @@ import logging
 import os
 import subprocess
 from pprint import pformat
-from threading import Event, Thread
+from threading import Event, Lock, Thread
 from time import time
 
 from psutil import Process, cpu_count
 
+from .bufpool import get_buffer_pool
 from .frame import Frame
 from .utils import JSONType, json_getval, sizestr, secstr, timestr
 
-__all__ = ['Metrics']
+__all__ = ['Metrics', 'MetricsAggregator']
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,7 @@ GPU_METRICS_INTERVAL = max(0, float(json_getval(os.getenv('GPU_METRICS_INTERVAL'
 CPU_METRICS_INTERVAL = max(0, float(json_getval(os.getenv('CPU_METRICS_INTERVAL') or 1)))
 
 GPU_METRIC_NAMES     = [(f'gpu{i}', f'gpu{i}_mem') for i in range(8)]
+METRICS_PERCENTILES  = (50, 90, 99)
 
 
 class Metrics:
@@ -43,6 +45,8 @@ class Metrics:
         self.gpu          = {}
         self.frame_count  = 0
         self.megapx_count = 0
+        self.drops        = {}  # {('reason', 'topic' or None): count, ...}
+        self.drops_lock   = Lock()
         self.proc         = Process()
         self.stop_evt     = Event()
 
@@ -140,7 +144,7 @@ class Metrics:
         tss          = []
 
         for frame in frames.values():
-            if isinstance(m := frame.data.get('meta'), dict) and isinstance(ts := m.get('ts'), float):
+            if isinstance(m := frame.ro_data.get('meta'), dict) and isinstance(ts := m.get('ts'), float):
                 tss.append(ts)
 
             if frame.has_image:
@@ -152,6 +156,23 @@ class Metrics:
         self.frame_count  += 1  # because even if there are no images in frames the data may refer to images, or in another way count as a "frame"
         self.megapx_count  = megapx_count
 
+    def incoming_raw(self, topicmsgs: dict[str, list] | None = None):
+        """Same as incoming() for messages still as they came from the network, without latency since that would need the
+        data decoded."""
+
+        if not topicmsgs:
+            return
+
+        self.frame_count  += 1
+        self.megapx_count += sum(img[0] * img[1] for msg in topicmsgs.values()
+            if isinstance(xtra := msg[0], dict) and (img := xtra.get('img'))) / 1_000_000
+
+    def count_drop(self, reason: str, topic: str | None = None, count: int = 1):
+        """Count `count` frames of `topic` (if known) dropped for `reason`. Safe to call from any thread."""
+
+        with self.drops_lock:
+            self.drops[key] = self.drops.get(key := (reason, topic), 0) + count
+
     def outgoing(self, frames: dict[str, Frame] | None = None) -> dict[str, JSONType]:
         td          = (t := time()) - self.fps_t
         self.fps_t  = t
@@ -159,7 +180,7 @@ class Metrics:
         self.fps    = fps = 1 / fps_td
 
         if frames is None or not (tss := [ts for f in frames.values()
-                if isinstance(m := f.data.get('meta'), dict) and isinstance(ts := m.get('ts'), float)]):
+                if isinstance(m := f.ro_data.get('meta'), dict) and isinstance(ts := m.get('ts'), float)]):
             lat_out = self.lat_out
         else:
             self.lat_out = lat_out = 0.95 * self.lat_out + 0.05 * (t - min(tss))
@@ -188,6 +209,19 @@ class Metrics:
         if megapx_count := self.megapx_count:
             metrics['megapx_count'] = megapx_count
 
+        if drops := self.drops:
+            with self.drops_lock:
+                drops = list(drops.items())
+
+            for (reason, topic), count in drops:
+                metrics[f'drop_{reason}_count' if topic is None else f'drop_{topic}_{reason}_count'] = count
+
+            metrics['drop_count'] = sum(count for _, count in drops)
+
+        if (pool := get_buffer_pool()) is not None:
+            metrics['pool_hit_count']  = pool.hit_count
+            metrics['pool_miss_count'] = pool.miss_count
+
         return metrics
 
     @staticmethod
@@ -221,6 +255,9 @@ class Metrics:
                 if (gpu := metrics.get(gpu_n)) is not None:
                     parts.append(f"{gpu_n}: {f'{gpu}% / {sizestr(int(metrics[ngpu_mem_n] * 1_000_000_000))}'}")
 
+            if drop_count := metrics.get('drop_count'):
+                parts.append(f"drop: {drop_count}")
+
             if (up := metrics.get('uptime_count')) is not None:
                 parts.append(f"up: {timestr(up)}s" if (up) < 60 else f"up: {timestr(up)}")
 
@@ -231,7 +268,7 @@ class Metrics:
 
         elif log == 'pretty':
             text = prefix + (f'{" - " if prefix else ""}NO FRAMES' if frames is None else
-                ('\n' if '\n' in (text := pformat({t: (f, f.data) for t, f in frames.items()})) else '') + text)
+                ('\n' if '\n' in (text := pformat({t: (f, f.ro_data) for t, f in frames.items()})) else '') + text)
 
         else:
             if prefix:
@@ -243,7 +280,7 @@ class Metrics:
 
             elif log == 'data':
                 text = prefix + ('NO FRAMES' if frames is None else
-                    f"{{{', '.join(f'{t!r}: {f.data}' for t, f in frames.items())}}}")
+                    f"{{{', '.join(f'{t!r}: {f.ro_data}' for t, f in frames.items())}}}")
 
             elif log == 'all':
                 text = prefix + ('NO FRAMES' if frames is None else
@@ -253,3 +290,62 @@ class Metrics:
                 raise ValueError(f'invalid log {log!r}')
 
         return text
+
+
+class MetricsAggregator:
+    """Aggregates metrics over intervals of `interval` seconds. Numeric metrics are averaged while 'ts', '..._count' and
+    non-numeric ones are just their last value. With `stats` each averaged metric also gets '{metric}_min',
+    '{metric}_max' and a '{metric}_p{N}' for each of the METRICS_PERCENTILES."""
+
+    def __init__(self, interval: float, stats: bool = False):
+        self.interval = interval
+        self.stats    = stats
+        self.t        = time() + interval
+        self.last     = {}  # {'metric': last value, ...}
+        self.sums     = {}  # {'metric': (sum, count), ...} or with stats {'metric': [value, ...], ...}
+
+    def add(self, metrics: dict[str, JSONType]) -> dict[str, JSONType] | None:
+        """Add `metrics` and return the aggregate if they end an interval, otherwise None."""
+
+        last  = self.last
+        sums  = self.sums
+        stats = self.stats
+
+        for metric, value in metrics.items():
+            if metric == 'ts' or metric.endswith('_count') or not isinstance(value, (int, float)):
+                last[metric] = value
+            elif (v := sums.get(metric)) is None:
+                sums[metric] = [value] if stats else (value, 1)
+            elif stats:
+                v.append(value)
+
+            else:
+                sum_, num    = v
+                sums[metric] = (sum_ + value, num + 1)
+
+        if (td := time() - self.t) < 0:
+            return None
+
+        aggregate = {}
+
+        for metric, v in sums.items():
+            if not stats:
+                aggregate[metric] = v[0] / v[1]
+
+            else:
+                v.sort()
+
+                aggregate[metric]          = sum(v) / (num := len(v))
+                aggregate[f'{metric}_min'] = v[0]
+                aggregate[f'{metric}_max'] = v[-1]
+
+                for p in METRICS_PERCENTILES:
+                    aggregate[f'{metric}_p{p}'] = v[min(num - 1, num * p // 100)]
+
+        aggregate.update(last)
+
+        self.t    += (td // interval + 1) * interval if (interval := self.interval) > 0 else td
+        self.last  = {}
+        self.sums  = {}
+
+        return aggregate
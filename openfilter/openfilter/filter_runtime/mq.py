@@ -7,28 +7,120 @@ Environment variables:
     OUTPUTS_METRICS: If true then send metrics as '_metrics' on all zeromq outputs. If false then don't send. If string
         then is address of dedicated sender for metrics (will not be sent on normal senders).
 
+    OUTPUTS_CODEC: Default `outs_codec`, an image codec like 'jpg:70' for all topics which overrides OUTPUTS_JPG, see
+        imgcodec.py.
+
+    OUTPUTS_DELTA: Default `outs_delta`, 'false'ish (default) for whole images every time, 'true'ish for delta encoding
+        with a keyframe every 100 images or a number for a keyframe every that many images.
+
     OUTPUTS_METRICS_PUSH: If 'true'ish then will always send metrics on dedicated metrics output regardless of if
         something is officially connected or not. Default true to support doubly ephemeral '??' listeners which are most
         likely the only things connected. Does not affect metrics on normal output channels.
 
+    OUTPUTS_METRICS_AGG: Default `metrics_agg`, number of seconds to aggregate outgoing metrics over, default 0 for sending
+        them with every frame.
+
     MQ_LOG: Default outputs logging if not explicitly specified, default 'none'.
 
     MQ_MSGID_SYNC: Whether to sync expected message IDs between outgoing and incoming zeromq message queues. Advanced
         thing, don't touch unless u know what u doing.
+
+    MQ_THREADS: Default `mq_threads`, size of the thread pool for encoding and decoding images of multiple topics in
+        parallel, default 0 (none).
+
+    MQ_DELTA_TILE: Size of the square tiles of delta encoding, a multiple of 4, default 32.
+
+    MQ_DELTA_THRESH: How much (0-255) a tile has to differ from the keyframe, in any channel of any 4x4 pixel average,
+        to be sent, default 12. Only for lossy codecs (jpg, webp), with lossless ones (raw, raw+..., png) every changed
+        pixel counts so delta encoding stays lossless.
+
+    MQ_ZERO_COPY: If 'true'ish (default) then raw images are handed to zeromq and received from it without intermediate
+        copies. Readonly images are sent directly from their buffers (writable ones are still copied once because they
+        may be modified after send) and received images are readonly views of the zeromq message buffers.
+
+In-process outputs:
+
+If ALL outputs are 'inproc://' (filters running as threads of one process) then Frames are not converted to messages at
+all, they are passed by reference. The image goes readonly (a writable one is copied once for this) so it is shared by
+all receivers, jpg encoding does not happen (`outs_jpg` does not apply) and the data is snapshotted on send and copied
+again for each receiver so that nobody sees anybody else's changes. With mixed outputs messages are serialized as usual
+(and still not copied on the 'inproc://' ones).
+
+Delta encoding:
+
+With `outs_delta` images go out as periodic keyframes (encoded as usual) and in between only the tiles which changed
+since the last keyframe, for static cameras where most of the image is the same every time. Changed tiles are found
+by comparing 4x4 pixel averages with those of the keyframe and are sent together as one mosaic image, encoded by the
+codec the whole images would be. Changes below MQ_DELTA_THRESH are not sent until the next keyframe, which is lossy on
+top of the lossy codec, so with lossless codecs (raw, raw+..., png) tiles are compared pixel for pixel instead and
+any change goes. The receiver makes the full Frame from the keyframe it holds, so nothing in between has to
+arrive for this to work. Somebody connecting makes the next images keyframes, a receiver without the keyframe (lost)
+drops the topic counting it as 'nokey' until the next one. Costs a copy of the image on receive and a downscale on
+send, worth it on remote 'tcp://' links. Never applies to outputs by reference or to NV12 / I420 images, which go whole.
+
+Crops:
+
+Frame.crop() gives views of a Frame which know their parent Frame and box in it. Receivers which ask for them with the
+'crops' delivery option get crops whose parent goes to them in the same message as just their box in the parent, for
+example dozens of plate crops of a camera frame cost nothing extra. The receiver must also get the parent topics (with
+'*' or listing them), crops without their parent are left out. Crops go as images to everyone else.
+
+YUV:
+
+NV12 and I420 Frames (see frame.py) go out as they are if raw, half the bytes of BGR. With any other codec (jpg etc...)
+or a 'maxsize' which downscales them they are converted and go out as BGR. They also go out as BGR while anything older
+than that is connected to the outputs (see ZMQSender.downstream_current), e.g. receivers of a previous version or outside
+readers.
+
+Delivery options:
+
+A source can be given options which ask the upstream sender for a variant of its messages made just for the receivers
+which asked for it (see ZMQSender.variants()), as a dict per source or '!' options in a Filter sources string like
+'tcp://host;main!noimage':
+
+    noimage: Frames without images, only the data. For sinks which never look at the pixels.
+
+    maxsize: Images downscaled (keeping aspect ratio) to fit in this size, 'WxH' or a single number for both. Images
+        which already fit are sent as they are.
+
+    jpg: True for jpg encoded images, False for raw, regardless of the OUTPUTS_JPG of the sender.
+
+    codec: Images encoded by this codec regardless of the sender, e.g. 'jpg:70' or 'webp:80', see imgcodec.py.
+
+    crops: Crops as references into their parent Frames when those come in the same message, see above.
+
+    where: Only topics whose Frame.data matches, e.g. 'meta.plates' (exists and not empty), 'meta.id?' (exists),
+        'meta.kind=car', 'meta.score>=0.5' (also '<', '<=', '>'), several joined with '&' must all match, see
+        MQ.where_func(). Evaluated by the sender, which does not send non-matching topics to this receiver at all, and
+        whole messages with nothing left are skipped by the receiver (it still gets the heartbeat to stay in step).
+
+The sender makes each variant at most once per message for all receivers which asked for it, and plain messages only if
+anybody asked for those. Not possible on 'router+' sources. With 'inproc://' outputs by reference `jpg` and `codec` don't
+apply.
+
+The same options can be given to an output in `outs_bind` (or a Filter outputs string like 'tcp://*!codec=jpg:70'), then
+everyone subscribing to plain topics there gets that variant instead. So a remote site can get jpg at quality 70 while
+a local 'ipc://' output next to it gets raw.
 """
 
 import logging
 import os
-from json import loads as json_loads, dumps as json_dumps
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty, Full
+from threading import Event, Thread
 from time import time
 from typing import Callable
 
+import cv2
 import numpy as np
 
+from .bufpool import pool_resize
 from .frame import Frame
-from .metrics import Metrics
-from .utils import JSONType, json_getval, rndstr
-from .zeromq import ZMQ_POLL_TIMEOUT as POLL_TIMEOUT_MS, is_zeromq_addr as is_mq_addr, ZMQMessage, ZMQSender, ZMQReceiver
+from .imgcodec import parse_image_codec, encode_image, decode_image
+from .metrics import Metrics, MetricsAggregator
+from .utils import JSONType, json_getval, rndstr, simpledeepcopy, once
+from .zeromq import ZMQ_POLL_TIMEOUT as POLL_TIMEOUT_MS, is_zeromq_addr as is_mq_addr, ZMQMessage, ZMQStateSend, \
+    ZMQSender, ZMQReceiver, ZMQWaker
 
 __all__ = ['is_mq_addr', 'MQ', 'MQSender', 'MQReceiver']
 
@@ -37,50 +129,273 @@ logger = logging.getLogger(__name__)
 OUTPUTS_JPG          = None if (_ := json_getval((os.getenv('OUTPUTS_JPG') or 'true').lower())) is None else bool(_)
 OUTPUTS_METRICS      = _ if isinstance(_ := json_getval((os.getenv('OUTPUTS_METRICS') or 'true').lower()), bool) else str(_)
 OUTPUTS_METRICS_PUSH = bool(json_getval((os.getenv('OUTPUTS_METRICS_PUSH') or 'true').lower()))
+OUTPUTS_METRICS_AGG  = float(os.getenv('OUTPUTS_METRICS_AGG') or 0)
 
 MQ_LOG               = json_getval((os.getenv('MQ_LOG') or 'false').lower())
 MQ_MSGID_SYNC        = bool(json_getval((os.getenv('MQ_MSGID_SYNC') or 'true').lower()))
+MQ_ZERO_COPY         = bool(json_getval((os.getenv('MQ_ZERO_COPY') or 'true').lower()))
+MQ_THREADS           = int(os.getenv('MQ_THREADS') or 0)
+MQ_DELTA_TILE        = max(4, int(os.getenv('MQ_DELTA_TILE') or 32) // 4 * 4)
+MQ_DELTA_THRESH      = int(os.getenv('MQ_DELTA_THRESH') or 12)
+
+OUTPUTS_CODEC        = os.getenv('OUTPUTS_CODEC') or None
+OUTPUTS_DELTA        = json_getval((os.getenv('OUTPUTS_DELTA') or 'false').lower())
+DELTA_INTERVAL       = 100  # default images per keyframe
+DELTA_SCALE          = 4    # tiles are compared by averages of this many pixels squared
+DELTA_LOSSLESS       = ('raw', 'png')  # codecs (and 'raw+...') with which tiles are compared exactly
+
+DELIVERY_OPTIONS     = ('noimage', 'maxsize', 'jpg', 'codec', 'crops', 'where')
+WHERE_OPS            = ('?', '<=', '>=', '==', '=', '<', '>')  # longest first, '?' is a suffix
+WHERE_FUNCS          = {}  # {'where': Callable[[dict], bool], ...} compiled 'where' delivery options
 
 
 class DummyMetrics:
     def __init__(self): self.uptime_t = time()
     def destroy(self): pass
     def incoming(self, frames=None): pass
+    def incoming_raw(self, topicmsgs=None): pass
+    def count_drop(self, reason, topic=None, count=1): pass
     def outgoing(self, frames=None) -> dict[str, JSONType]:
         return {'ts': (t := time()), 'fps': 15.0, 'cpu': 0.0, 'mem': 0.0, 'uptime_count': int(t - self.uptime_t)}
 
 
+def delta_pad(image: np.ndarray, tile: int) -> np.ndarray:
+    """`image` as (height, width, channels) padded with zeros to whole tiles, not copied if it already is."""
+
+    if image.ndim == 2:
+        image = image[..., None]
+
+    if (padh := -image.shape[0] % tile) | (padw := -image.shape[1] % tile):
+        image = np.pad(image, ((0, padh), (0, padw), (0, 0)))
+
+    return image
+
+
+def delta_tiles(image: np.ndarray, tile: int) -> np.ndarray:
+    """Padded `image` as a (rows, cols, tile, tile, channels) view of its tiles."""
+
+    return image.reshape(image.shape[0] // tile, tile, image.shape[1] // tile, tile, -1).swapaxes(1, 2)
+
+
+class DeltaEncoder:
+    """Sending side of delta encoding, holds the downscaled keyframe of each topic, see module docstring."""
+
+    def __init__(self, interval: int = DELTA_INTERVAL, tile: int = MQ_DELTA_TILE, thresh: int = MQ_DELTA_THRESH):
+        self.interval = interval
+        self.tile     = tile
+        self.thresh   = thresh
+        self.keys     = {}  # {'topic': (token, count, (height, width, format, exact), small or exact keyframe), ...}
+        self.connects = 0   # ZMQSender.connects as of our last reset()
+
+    def reset(self, connects: int = 0):
+        """Make the next image of every topic a keyframe, e.g. because somebody new connected."""
+
+        self.keys.clear()
+
+        self.connects = connects
+
+    def msg(self, topic: str, frame: Frame, codec: bool | str | None = None, zero_copy: bool = False) -> ZMQMessage:
+        """Convert a single `frame` with an image to a zeromq message, a keyframe or only the changed tiles."""
+
+        tile       = self.tile
+        enc, param = MQ.image_codec(frame, codec)
+        exact      = enc.split('+', 1)[0] in DELTA_LOSSLESS  # thresholded averages would make a lossless codec lossy
+        scale      = 1 if exact else DELTA_SCALE
+        shape      = (frame.height, frame.width, frame.format, exact)
+        image      = delta_pad(frame.image, tile)
+        rows       = image.shape[0] // tile
+        cols       = image.shape[1] // tile
+        small      = image.reshape(image.shape[0], image.shape[1], -1) if exact else cv2.resize(image,
+            (image.shape[1] // scale, image.shape[0] // scale), interpolation=cv2.INTER_AREA
+            ).reshape(image.shape[0] // scale, image.shape[1] // scale, -1)
+
+        if (key := self.keys.get(topic)) is not None and key[1] < self.interval and key[2] == shape:
+            token, count, _, ksmall = key
+            diff                    = cv2.absdiff(small, ksmall).reshape(rows, (ts := tile // scale), cols, ts, -1)
+            idxs                    = np.flatnonzero(diff.max(axis=(1, 3, 4)) > (0 if exact else self.thresh))
+
+            if len(idxs) * 2 <= rows * cols:  # otherwise a keyframe is cheaper
+                self.keys[topic] = (token, count + 1, shape, ksmall)
+
+                return self.delta_msg(frame, image, idxs, cols, token, enc, param)
+
+        token            = rndstr(8)
+        self.keys[topic] = (token, 1, shape, small.copy() if exact and small.flags.writeable else small)  # may change
+        msg              = MQ.frame2msg(frame, codec, zero_copy)
+        msg[0]           = {**msg[0], 'dlt': [token, tile]}
+
+        return msg
+
+    def delta_msg(self, frame: Frame, image: np.ndarray, idxs: np.ndarray, cols: int, token: str, enc: str,
+            param: int | None) -> ZMQMessage:
+        tile = self.tile
+
+        if not (ntiles := len(idxs)):
+            mcols = 0
+            img   = b''
+
+        else:  # changed tiles go in a mosaic as square as possible so that any codec can take it whatever the size
+            mcols  = int(np.ceil(np.sqrt(ntiles)))
+            mrows  = -(-ntiles // mcols)
+            tiles  = np.zeros((mrows * mcols, tile, tile, image.shape[2]), np.uint8)
+            tiles[:ntiles] = delta_tiles(image, tile)[idxs // cols, idxs % cols]
+            mosaic = tiles.reshape(mrows, mcols, tile, tile, -1).swapaxes(1, 2).reshape(mrows * tile, mcols * tile, -1)
+            img    = encode_image(mosaic, enc, param)
+
+        xtra = {'img': [frame.height, frame.width, frame.format, 'dlt'], 'dlt': [token, enc, mcols, idxs.tolist()]}
+
+        return [xtra, img] if not frame.has_data else [xtra, img, frame.json]
+
+
+class DeltaDecoder:
+    """Receiving side of delta encoding, holds the keyframe of each topic, see module docstring."""
+
+    def __init__(self, on_drop: Callable[[str, str | None, int], None] | None = None):
+        self.on_drop = (lambda r, t, n=1: None) if on_drop is None else on_drop
+        self.keys    = {}  # {'topic': (token, tile, padded keyframe image), ...}
+
+    def keyframe(self, topic: str, frame: Frame, dlt: list):
+        token, tile      = dlt
+        image            = frame.image  # decodes a jpg keyframe
+        self.keys[topic] = (token, tile, delta_pad(image.copy() if image.flags.writeable else image, tile))
+
+    def frame(self, topic: str, img: ZMQMessage, xtra: list, dlt: list, data: dict | None) -> Frame | None:
+        """The full Frame from the changed tiles `img` and the keyframe, None if we don't have that keyframe."""
+
+        token, enc, mcols, idxs = dlt
+
+        if (key := self.keys.get(topic)) is None or key[0] != token:
+            self.on_drop('nokey', topic)
+
+            return None
+
+        _, tile, image = key
+        height, width  = xtra[:2]
+        image          = image.copy()
+
+        if idxs:
+            mosaic = decode_image(img, enc, (-(-len(idxs) // mcols) * tile, mcols * tile, chans := image.shape[2]))
+            tiles  = mosaic.reshape(-1, tile, mcols, tile, chans).swapaxes(1, 2).reshape(-1, tile, tile, chans)
+            idxs   = np.array(idxs)
+            cols   = image.shape[1] // tile
+
+            delta_tiles(image, tile)[idxs // cols, idxs % cols] = tiles[:len(idxs)]
+
+        image = image[:height, :width]
+        image = image[..., 0] if xtra[2] == 'GRAY' else image
+
+        if not image.flags.c_contiguous:
+            image = np.ascontiguousarray(image)
+
+        image.flags.writeable = False  # ours, so no need to copy it again for zero copy or by reference
+
+        return Frame(image, data, xtra[2])
+
+
 class MQ:
     LOG_MAP = {'all': 'all', 'image': 'image', 'data': 'data', 'pretty': 'pretty', 'metrics': 'metrics', 'none': False,
         True: 'all', False: False}
 
     def __init__(self,
-        srcs_n_topics: str | list[str | tuple[str, list[tuple[str, str]] | None]] = None,
+        srcs_n_topics: str | list[str | tuple[str, list[tuple[str, str]] | None] | tuple[str, list[tuple[str, str]] | None, dict]] = None,
         outs_bind:     str | list[str] | None = None,
         mq_id:         str | None = None,
         *,
         srcs_balance:  bool = False,
         srcs_low_lat:  bool | None = None,
+        srcs_window:   int | None = None,
+        srcs_reorder:  int | None = None,
+        srcs_compress: bool | str | list[str] | None = None,
+        srcs_prefetch: int | None = None,
+        srcs_decode:   bool = False,
         outs_balance:  bool = False,
         outs_required: list[str] | None = None,
         outs_jpg:      bool | None = None,
+        outs_codec:    str | dict[str, str] | None = None,
+        outs_delta:    bool | int | None = None,
         outs_metrics:  str | bool | None = None,
+        outs_thread:   bool = False,
         metrics_cb:    Callable[[dict], None] | None = None,
+        metrics_agg:   float | None = None,
         on_exit_msg:   Callable[[str], None] | None = None,
         mq_log:        str | bool | None = None,
         mq_msgid_sync: bool | None = None,
+        mq_zero_copy:  bool | None = None,
+        mq_threads:    int | None = None,
+        stop_evt:      Event | None = None,
     ):
+        """Inter-filter message queue, see ZMQSender and ZMQReceiver for most of the arguments. The rest:
+
+        Args:
+            srcs_n_topics: As for ZMQReceiver except that the optional third element of a source is a dict of delivery
+                options instead of a variant name, see module docstring.
+
+            srcs_prefetch: If nonzero then a background thread receives and converts up to this many messages to Frames
+                ahead of recv(), so that this work overlaps with the caller's processing of the current ones. Message ids
+                are not synchronized with sends in this mode (order is still preserved).
+
+            srcs_decode: Decode jpg images before recv() returns them (in the background thread with `srcs_prefetch`)
+                instead of on first access to Frame.image.
+
+            outs_codec: Image codec like 'jpg:70', 'webp', 'png' or 'raw+lz4' (see imgcodec.py) for all topics or a dict of
+                them per topic, topics not in it go by `outs_jpg`. None for OUTPUTS_CODEC. Outputs can have their own with
+                a 'codec' delivery option in `outs_bind` like ('tcp://*', {'codec': 'jpg:70'}).
+
+            outs_delta: Send images delta encoded, True for a keyframe every 100 images or the number of images per
+                keyframe, see module docstring. None for OUTPUTS_DELTA.
+
+            outs_thread: Hand frames to a background thread for metrics, encoding (jpg) and sending. send() returns as
+                soon as the thread takes them, which is once it has finished sending the previous ones. Callable
+                `frames` passed to send() are called from that thread.
+
+            metrics_agg: If nonzero then outgoing metrics ('_metrics' on outputs or to the dedicated metrics output) are
+                not sent with every frame but once every this many seconds, aggregated over that time as the average of
+                each metric along with its '_min', '_max', '_p50', '_p90' and '_p99'. `metrics_cb` still gets them per
+                frame. None for OUTPUTS_METRICS_AGG.
+
+            mq_threads: Size of a thread pool for encoding (jpg) outgoing topics in parallel and with `srcs_decode`
+                decoding incoming ones, for many topics with images. 0 or 1 for none. None for MQ_THREADS.
+
+            stop_evt: If given then once it is set (from any thread, or process for a multiprocessing Event) any recv()
+                or send() waiting, and all later ones, return immediately as on a timeout. Lets the caller block until
+                there is real work or a real deadline instead of waiting in short slices to check for a stop.
+
+        Notes:
+            * When using the background threads the receiver and sender (and the `on_exit_msg` callback) belong to them
+            until destroy() or send_exit_msg(). Exceptions raised in them (including from `on_exit_msg`) are re-raised
+            in the next call to recv() or send().
+        """
+
         self.mq_id         = mq_id or rndstr(8)
+        self.mq_zero_copy  = zero_copy = MQ_ZERO_COPY if mq_zero_copy is None else mq_zero_copy
+        self.waker         = waker = None if stop_evt is None else ZMQWaker()
         on_exit_msg_       = (lambda m: None) if on_exit_msg is None else (lambda m: on_exit_msg(m[0]))
-        self.sender        = ZMQSender(outs_bind, self.mq_id, on_exit_msg_, outs_balance, outs_required) \
-            if outs_bind else None
-        self.receiver      = ZMQReceiver(srcs_n_topics, self.mq_id, on_exit_msg_, srcs_balance, srcs_low_lat) \
-            if srcs_n_topics else None
-        self.outs_jpg      = OUTPUTS_JPG if outs_jpg is None else outs_jpg
+        srcs_n_topics      = srcs_n_topics if isinstance(srcs_n_topics, (str, type(None))) else [
+            src if isinstance(src, str) or len(src) < 3 else (*src[:2], MQ.delivery_variant(src[2])) for src in srcs_n_topics]
+        outs_bind          = outs_bind if isinstance(outs_bind, (str, type(None))) else [
+            out if isinstance(out, str) else (out[0], MQ.output_variant(out[1])) for out in outs_bind]
+        self.sender        = ZMQSender(outs_bind, self.mq_id, on_exit_msg_, outs_balance, outs_required, zero_copy,
+            waker, self.count_drop) if outs_bind else None
+        self.receiver      = ZMQReceiver(srcs_n_topics, self.mq_id, on_exit_msg_, srcs_balance, srcs_low_lat, zero_copy,
+            srcs_window, srcs_reorder, srcs_compress, waker, self.count_drop) if srcs_n_topics else None
+        self.outs_jpg      = outs_jpg = OUTPUTS_JPG if outs_jpg is None else outs_jpg
+        self.outs_codec    = outs_jpg if not (outs_codec := OUTPUTS_CODEC if outs_codec is None else outs_codec) else \
+            MQ.codec_str(outs_codec) if isinstance(outs_codec, str) else \
+            {'*': outs_jpg, **{topic: MQ.codec_str(codec) for topic, codec in outs_codec.items()}}
         self.outs_metrics  = outs_metrics = OUTPUTS_METRICS if outs_metrics is None else outs_metrics
         self.metrics_cb    = metrics_cb
+        self.metrics_agg   = None if not outs_metrics or \
+            not (metrics_agg := OUTPUTS_METRICS_AGG if metrics_agg is None else metrics_agg) else \
+            MetricsAggregator(float(metrics_agg), True)
         self.mq_log        = MQ.LOG_MAP.get(MQ_LOG if mq_log is None else mq_log, False)
         self.mq_msgid_sync = MQ_MSGID_SYNC if mq_msgid_sync is None else mq_msgid_sync
+        self.outs_by_ref   = self.sender is not None and self.sender.inproc_only
+        self.outs_delta    = None if not (outs_delta := OUTPUTS_DELTA if outs_delta is None else outs_delta) or \
+            self.sender is None or self.outs_by_ref else DeltaEncoder(DELTA_INTERVAL if outs_delta is True else int(outs_delta))
+        self.srcs_delta    = DeltaDecoder(self.count_drop)
+        self.srcs_decode   = srcs_decode and not srcs_prefetch  # with prefetch the background thread decodes
+        self.codec_pool    = None if (threads := MQ_THREADS if mq_threads is None else mq_threads) <= 1 else \
+            ThreadPoolExecutor(threads, 'mq-codec')
         self.send_state    = None
         self.recv_state    = None
 
@@ -92,9 +407,43 @@ class MQ:
         self.metrics_ = Metrics() if outs_metrics or metrics_cb else DummyMetrics()
         self.metrics  = {'ts': time(), 'fps': 15.0, 'cpu': 0.0, 'mem': 0.0, 'uptime_count': 0}  # initial guaranteed-to-be-present metrics, for outside querying, not used here
 
+        self.io_stop    = Event()
+        self.io_exc     = None  # exception raised in a background thread, to be reraised in recv() or send()
+        self.send_dead  = False  # send thread died, nothing put in send_queue will ever go out
+        self.io_threads = []
+        self.recv_queue = Queue(srcs_prefetch) if srcs_prefetch and self.receiver else None
+        self.send_queue = Queue(1) if outs_thread else None
+
+        if self.recv_queue is not None:
+            self.io_threads.append(Thread(target=self.recv_thread_func, args=(srcs_decode,), daemon=True))
+
+        if self.send_queue is not None:
+            self.io_threads.append(Thread(target=self.send_thread_func, daemon=True))
+
+        for thread in self.io_threads:
+            thread.start()
+
+        self.stop_done   = Event()  # set by destroy() to end the stop thread, can't set stop_evt as it isn't ours
+        self.stop_thread = None if waker is None else Thread(target=self.stop_thread_func, args=(stop_evt,), daemon=True)
+
+        if self.stop_thread is not None:
+            self.stop_thread.start()
+
     def destroy(self):
+        self.io_join()
+
+        if self.stop_thread is not None:
+            self.stop_done.set()
+            self.stop_thread.join()
+
+            self.stop_thread = None
+
         self.metrics_.destroy()
 
+        if self.codec_pool:
+            self.codec_pool.shutdown()
+            self.codec_pool = None
+
         if self.receiver:
             self.receiver.destroy()
             self.receiver = None
@@ -107,7 +456,131 @@ class MQ:
             self.metrics_sender.destroy()
             self.metrics_sender = None
 
+        if self.waker:
+            self.waker.close()
+            self.waker = None
+
+    def io_join(self):
+        """Stop background threads if any are running and take back ownership of the receiver and sender."""
+
+        if threads := self.io_threads:
+            self.io_stop.set()
+
+            for thread in threads:
+                thread.join()
+
+            self.io_threads = []
+            self.recv_queue = self.send_queue = None
+
+    def io_raise(self):
+        if (exc := self.io_exc) is not None:
+            self.io_exc = None
+
+            raise exc
+
+    def stop_thread_func(self, stop_evt: Event):
+        while not stop_evt.wait(POLL_TIMEOUT_MS / 1000):  # can only wait on one Event, which may be multiprocessing
+            if self.stop_done.is_set():
+                return
+
+        if (waker := self.waker) is not None:
+            waker.wake()  # receiver and sender waits return from now on
+
+        try:
+            self.recv_queue.put_nowait(None)  # wake up recv() if waiting, if the queue is full then it doesn't wait
+        except (AttributeError, Full):
+            pass
+
+        try:
+            self.send_queue.get_nowait()  # wake up send() if waiting, the frames would not go out anyway
+        except (AttributeError, Empty):
+            pass
+
+    def recv_thread_func(self, decode: bool):
+        io_stop    = self.io_stop
+        recv_queue = self.recv_queue
+        waker      = self.waker
+
+        try:
+            while not io_stop.is_set():
+                if (res := self.receiver.recv(None, POLL_TIMEOUT_MS)) is None:
+                    if waker is not None and waker.is_set:  # stopped, nothing more will be received
+                        return
+
+                    continue
+
+                topicmsgs, send_state = res
+                frames                = MQ.topicmsgs2frames(topicmsgs, self.srcs_delta)
+
+                if decode:
+                    MQ.decode_frames(frames, self.codec_pool)
+
+                while True:
+                    try:
+                        recv_queue.put((frames, send_state), timeout=POLL_TIMEOUT_MS / 1000)
+                    except Full:
+                        if io_stop.is_set():
+                            return
+                    else:
+                        break
+
+        except BaseException as exc:  # yes, BaseException, because on_exit_msg may raise SystemExit to exit the filter
+            self.io_exc = exc
+
+            try:
+                recv_queue.put_nowait(None)  # wake up recv() if waiting
+            except Full:
+                pass
+
+    def send_thread_func(self):
+        io_stop    = self.io_stop
+        send_queue = self.send_queue
+        waker      = self.waker
+
+        try:
+            while not io_stop.is_set():
+                try:
+                    frames, send_state = send_queue.get(timeout=POLL_TIMEOUT_MS / 1000)
+                except Empty:
+                    continue
+
+                while not self.send_sync(frames, POLL_TIMEOUT_MS, send_state):
+                    if io_stop.is_set() or (waker is not None and waker.is_set):
+                        return
+
+        except BaseException as exc:
+            self.io_exc    = exc
+            self.send_dead = True
+
+            try:
+                send_queue.get_nowait()  # wake up send() if waiting, it checks send_dead after
+            except Empty:
+                pass
+
+    def count_drop(self, reason: str, topic: str | None = None, count: int = 1):
+        """Count frames dropped anywhere in the filter, they go out with the metrics as 'drop_{topic}_{reason}_count'
+        (or 'drop_{reason}_count' if no topic) and a total 'drop_count'. Safe to call from any thread."""
+
+        self.metrics_.count_drop(reason, topic, count)
+
+    @property
+    def subscribed_topics(self) -> set[str] | None:
+        """Output topics somebody downstream is subscribed to as of the last send, None if all of them (or unknown).
+        Topics not in here are not sent at all so there is no need to produce them."""
+
+        return None if (sender := self.sender) is None else sender.sub_topics
+
+    def link_metrics(self) -> dict[str, float]:
+        """Transport statistics of each source ('in_{server_id}_...') and output client ('out_{client_id}_...') link:
+        '_bytes_count' total bytes, '_bw' MB/s, '_wait' ms each message waited on that peer and '_rtt' ms from request
+        to message (sources only)."""
+
+        return {**({} if (receiver := self.receiver) is None else receiver.link_metrics()),
+            **({} if (sender := self.sender) is None else sender.link_metrics())}
+
     def send_exit_msg(self, reason: str = ''):
+        self.io_join()
+
         reason = [reason]
 
         if self.receiver is not None:
@@ -120,25 +593,71 @@ class MQ:
             self.metrics_sender.send_oob(reason)
 
     def send(self, frames: dict[str, Frame] | Callable[[], dict[str, Frame] | None] | None, timeout: int | None = None) -> bool:
+        if (send_queue := self.send_queue) is None:
+            if res := self.send_sync(frames, timeout, self.send_state):
+                self.send_state = None  # in case we get another send() without a matching recv(), will increment msg_id otherwise message would be discarded
+
+            return res
+
+        self.io_raise()
+
+        waker = self.waker
+
+        if self.send_dead or waker is not None and waker.is_set:  # the thread is not sending anymore
+            return False
+
+        try:
+            send_queue.put((frames, self.send_state), timeout=None if timeout is None else timeout / 1000)
+        except Full:
+            return False
+
+        self.io_raise()  # we may have been woken up by the thread dying or stopping, in which case this won't go out
+
+        if self.send_dead or waker is not None and waker.is_set:
+            return False
+
+        self.send_state = None
+
+        return True
+
+    def send_raw(self, topicmsgs: dict[str, ZMQMessage] | None, timeout: int | None = None) -> bool:
+        """Send messages exactly as they came from recv_raw(), never converting them to Frames. Our own metrics are
+        still sent (without latency) and logged (only metrics). Not possible with `outs_thread`."""
+
+        if self.send_queue is not None:
+            raise RuntimeError('raw send is not possible with outs_thread')
+
+        if res := self.send_sync(topicmsgs, timeout, self.send_state, raw=True):
+            self.send_state = None
+
+        return res
+
+    def send_sync(self,
+        frames:     dict[str, Frame] | Callable[[], dict[str, Frame] | None] | None,
+        timeout:    int | None = None,
+        send_state: ZMQStateSend | None = None,
+        raw:        bool = False,
+    ) -> bool:
         def outgoing():
-            nonlocal frames, metrics
+            nonlocal frames, metrics, metrics_out
 
             if callable(frames):
                 frames = frames()
 
-            metrics = self.metrics_.outgoing(frames)
+            metrics = {**self.metrics_.outgoing(None if raw else frames), **self.link_metrics()}
 
-            if log_text := Metrics.log_text(self.mq_log, frames, metrics):
+            if log_text := Metrics.log_text('metrics' if raw and self.mq_log else self.mq_log, None if raw else frames, metrics):
                 logger.info(f'{self.mq_id} - {log_text}')
 
-            if frames is not None and (frames_metrics := frames.get('_metrics')) is not None:
+            if not raw and frames is not None and (frames_metrics := frames.get('_metrics')) is not None:
                 metrics = {**frames_metrics.data, **metrics}
 
             self.metrics = metrics  # store for outside querying
+            metrics_out  = metrics if (agg := self.metrics_agg) is None else agg.add(metrics)  # None if nothing to send yet
 
         def outgone():
-            if self.metrics_sender is not None:  # send metrics to dedicated output
-                self.metrics_sender.send(MQ.frames2topicmsgs({'_metrics': Frame(metrics)}), timeout=0, push=OUTPUTS_METRICS_PUSH)
+            if self.metrics_sender is not None and metrics_out is not None:  # send metrics to dedicated output
+                self.metrics_sender.send(MQ.frames2topicmsgs({'_metrics': Frame(metrics_out)}), timeout=0, push=OUTPUTS_METRICS_PUSH)
 
             if self.metrics_cb:
                 self.metrics_cb(metrics)
@@ -151,12 +670,34 @@ class MQ:
             if frames is None:  # callback could have returned None
                 return None
 
-            if self.outs_metrics is True:
-                frames = {**frames, '_metrics': Frame(metrics)}
+            if raw:
+                planar = self.sender.downstream_current
+
+                if not self.outs_by_ref and (refs := {t: f for t, msg in frames.items() if isinstance(f := msg[-1], Frame)}):
+                    frames = {**frames, **MQ.frames2topicmsgs(refs, self.outs_codec, self.mq_zero_copy, planar=planar)}  # came in by reference
+
+                if not planar and (ymsgs := {t: msg for t, msg in frames.items()  # NV12 / I420 from upstream, not for everyone here
+                        if isinstance(xtra := msg[0], dict) and (img := xtra.get('img')) and img[2] in Frame.YUV_FORMATS}):
+                    frames = {**frames, **MQ.frames2topicmsgs(MQ.topicmsgs2frames(ymsgs), self.outs_codec, self.mq_zero_copy, planar=False)}
+
+                if vmsgs := {t: msg for t, msg in frames.items() if self.sender.variants(t)}:  # only these get converted
+                    frames = {**frames, **MQ.frames2topicmsgs(MQ.topicmsgs2frames(vmsgs, self.srcs_delta), self.outs_codec, self.mq_zero_copy,
+                        self.outs_by_ref, lambda t: False, self.sender.variants, None, self.codec_pool, planar)}
+
+                return frames if self.outs_metrics is not True or metrics_out is None else \
+                    {**frames, **MQ.frames2topicmsgs({'_metrics': Frame(metrics_out)}, by_ref=self.outs_by_ref)}
 
-            return MQ.frames2topicmsgs(frames, self.outs_jpg)
+            if self.outs_metrics is True and metrics_out is not None:
+                frames = {**frames, '_metrics': Frame(metrics_out)}
 
-        metrics = None
+            if (delta := self.outs_delta) is not None and delta.connects != (connects := self.sender.connects):
+                delta.reset(connects)  # newcomers need keyframes
+
+            return MQ.frames2topicmsgs(frames, self.outs_codec, self.mq_zero_copy, self.outs_by_ref, self.sender.subscribed,
+                self.sender.variants, delta, self.codec_pool, self.sender.downstream_current)
+
+        metrics     = None
+        metrics_out = None
 
         if frames is None or self.sender is None:
             outgoing()
@@ -164,11 +705,10 @@ class MQ:
 
             return True
 
-        if (recv_state := self.sender.send(callback, self.send_state if self.mq_msgid_sync else None, timeout)) is None:
+        if (recv_state := self.sender.send(callback, send_state if self.mq_msgid_sync else None, timeout)) is None:
             return False
 
         self.recv_state = recv_state if frames is not None else None  # callback might haver returned None in which case send returns same state as previously, we don't want this because it will set recv wrong and cause a newer message warning
-        self.send_state = None  # in case we get another send() without a matching recv(), will increment msg_id otherwise message would be discarded
 
         if metrics is not None:  # could be None because nothing sent (NOT due to timeout but maybe msg_id invalidated as outdated by downstream) so callback not called and metrics not set
             outgone()  # we do this after sender.send() to give that data priority
@@ -179,58 +719,434 @@ class MQ:
         if self.receiver is None:
             return {}
 
+        if (recv_queue := self.recv_queue) is not None:
+            self.io_raise()
+
+            if (waker := self.waker) is not None and waker.is_set:  # stopped, the thread is not receiving anymore
+                timeout = 0
+
+            try:
+                if (res := recv_queue.get(timeout=None if timeout is None else timeout / 1000)) is None:
+                    self.io_raise()
+
+                    return None
+
+            except Empty:
+                return None
+
+            frames, self.send_state = res
+
+        else:
+            if (res := self.receiver.recv(self.recv_state if self.mq_msgid_sync else None, timeout)) is None:
+                return None
+
+            topicmsgs, self.send_state = res
+            frames                     = MQ.topicmsgs2frames(topicmsgs, self.srcs_delta)
+
+            if self.srcs_decode:
+                MQ.decode_frames(frames, self.codec_pool)
+
+        self.recv_state = None  # we already used up this recv_state so set to None to increment automatically next time in case send() is not called to get new state
+
+        self.metrics_.incoming(frames)
+
+        return frames
+
+    def recv_raw(self, timeout: int | None = None) -> dict[str, ZMQMessage] | None:
+        """Receive messages as they came in from the network without converting them to Frames, for passing them on
+        untouched with send_raw(). Not possible with `srcs_prefetch`."""
+
+        if self.receiver is None:
+            return {}
+
+        if self.recv_queue is not None:
+            raise RuntimeError('raw receive is not possible with srcs_prefetch')
+
         if (res := self.receiver.recv(self.recv_state if self.mq_msgid_sync else None, timeout)) is None:
             return None
 
         topicmsgs, self.send_state = res
-        self.recv_state            = None  # we already used up this recv_state so set to None to increment automatically next time in case send() is not called to get new state
+        self.recv_state            = None
 
-        self.metrics_.incoming(frames := MQ.topicmsgs2frames(topicmsgs))
+        self.metrics_.incoming_raw(topicmsgs)
 
-        return frames
+        return topicmsgs
 
     @staticmethod
-    def frames2topicmsgs(frames: dict[str, Frame], outs_jpg: bool | None = None) -> dict[str, ZMQMessage]:
-        topicmsgs = {}
+    def delivery_variant(options: dict[str, JSONType] | None) -> str | None:
+        """The name of the delivery variant asked for by source `options` (see module docstring), None if they don't ask
+        for anything different from the plain messages."""
 
-        for topic, frame in frames.items():
-            data = json_dumps(frame.data, separators=(',', ':')).encode() if frame.data else None
+        if unknown := [opt for opt in options or () if opt not in DELIVERY_OPTIONS]:
+            raise ValueError(f'invalid source option(s) {unknown}, must be from {list(DELIVERY_OPTIONS)}')
+
+        if not options:
+            return None
+
+        if noimage := bool(options.get('noimage')):
+            variant = ['noimage']  # nothing else about images matters without an image
+
+        else:
+            variant = []
+
+            if (maxsize := options.get('maxsize')) not in (None, False):
+                variant.append('maxsize={}x{}'.format(*MQ.parse_maxsize(maxsize)))
+
+            if (codec := options.get('codec')) is not None:
+                if options.get('jpg') is not None:
+                    raise ValueError("can not have both 'jpg' and 'codec'")
+
+                variant.append(f'codec={MQ.codec_str(codec)}')
+
+            elif (jpg := options.get('jpg')) is not None:
+                variant.append('jpg' if jpg else 'raw')
+
+            if options.get('crops'):
+                variant.append('crops')
+
+        if (where := options.get('where')) is not None:
+            if not isinstance(where, str) or any(c in where for c in ',!/'):
+                raise ValueError(f"invalid where {where!r}, must be a string without ',', '!' or '/'")
+
+            MQ.where_func(where := '&'.join(cond.strip() for cond in where.split('&')))  # validate
+            variant.insert(0, f'where={where}')  # first so that we don't process images we will not send
+
+        return ','.join(variant) or None
+
+    @staticmethod
+    def output_variant(options: dict[str, JSONType] | None) -> str | None:
+        """Like delivery_variant() but for the options of an output, which can not have a 'where' because its plain
+        subscribers would not know to expect topics to be left out."""
+
+        if options and options.get('where') is not None:
+            raise ValueError("outputs can not have a 'where' option")
 
-            if not frame.has_image:
-                msg = [None] if data is None else [None, data]
+        return MQ.delivery_variant(options)
+
+    @staticmethod
+    def where_func(where: str) -> Callable[[dict], bool]:
+        """Compile a 'where' delivery option like 'meta.plates & meta.score>=0.5 & meta.kind=car & meta.id?' to a
+        predicate over Frame.data. All the '&' conditions must hold, each is a '.' separated path into the data (list
+        indices are numbers) followed by '?' (exists), '=' (equals, the value is parsed as JSON), '<', '<=', '>' or '>='
+        (numeric compare) or nothing, which means exists and is not empty (None, '', [] or {})."""
+
+        if (func := WHERE_FUNCS.get(where)) is not None:
+            return func
+
+        def get(data, path):
+            for key in path:
+                if isinstance(data, dict) and key in data:
+                    data = data[key]
+                elif isinstance(data, list) and key.isdigit() and int(key) < len(data):
+                    data = data[int(key)]
+                else:
+                    return missing
+
+            return data
+
+        def number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        missing = object()
+        conds   = []  # [(['key', ...], op, value), ...]
+
+        for cond in where.split('&'):
+            if not (cond := cond.strip()):
+                raise ValueError(f'empty condition in where {where!r}')
+
+            if cond.endswith('?'):
+                path, op, value = cond[:-1], '?', None
+
+            elif op := next((op for op in WHERE_OPS[1:] if op in cond), None):
+                path, value = [s.strip() for s in cond.split(op, 1)]
+                value       = json_getval(value)
+
+                if op != '=' and op != '==' and not number(value):
+                    raise ValueError(f'can only compare to a number in where {where!r}')
 
             else:
-                enc  = 'jpg' if (do_jpg := frame.has_jpg if outs_jpg is None else outs_jpg) else 'raw'  # preferentially send jpg if is already encoded
-                xtra = {'img': [frame.height, frame.width, frame.format, enc]}
-                img  = frame.jpg if do_jpg else bytearray(memoryview(frame.image))
-                msg  = [xtra, img] if data is None else [xtra, img, data]
+                path, value = cond, None
+
+            if not all(path := path.strip().split('.')):
+                raise ValueError(f'invalid path in where {where!r}')
+
+            conds.append((path, op, value))
+
+        def func(data: dict) -> bool:
+            for path, op, value in conds:
+                if (v := get(data, path)) is missing:
+                    return False
+                elif op is None:
+                    if v is None or v == '' or v == [] or v == {}:
+                        return False
+                elif op == '?':
+                    pass
+                elif op in ('=', '=='):
+                    if v != value or isinstance(v, bool) != isinstance(value, bool):
+                        return False
+                elif not number(v) or not (v < value if op == '<' else v <= value if op == '<=' else
+                        v > value if op == '>' else v >= value):
+                    return False
+
+            return True
 
-            topicmsgs[topic] = msg
+        WHERE_FUNCS[where] = func
 
-        return topicmsgs
+        return func
 
     @staticmethod
-    def topicmsgs2frames(topicmsgs: dict[str, ZMQMessage]) -> dict[str, Frame]:
+    def parse_maxsize(maxsize: str | int | list[int]) -> tuple[int, int]:
+        """Parse 'WxH', a single number for both or [W, H] to (W, H)."""
+
+        try:
+            if isinstance(maxsize, bool):
+                raise ValueError
+
+            sizes         = [maxsize] if isinstance(maxsize, int) else maxsize.lower().split('x') \
+                if isinstance(maxsize, str) else list(maxsize)
+            width, height = [int(size) for size in (sizes * 2 if len(sizes) == 1 else sizes)]
+
+            if width <= 0 or height <= 0:
+                raise ValueError
+
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError(f"invalid maxsize {maxsize!r}, must be 'WxH' or a single positive number") from None
+
+        return width, height
+
+    @staticmethod
+    def variant_frame(frame: Frame, variant: str) -> tuple[Frame, bool | str | None] | None:
+        """The delivery `variant` of `frame` and the codec to encode it with (None for whatever the sender does), or
+        None if the frame does not match its 'where'. Raises ValueError on a `variant` we do not know."""
+
+        codec = None
+
+        for opt in variant.split(','):
+            if opt == 'noimage':
+                frame = Frame(None, frame) if frame.has_image else frame
+
+            elif opt in ('jpg', 'raw'):
+                codec = opt == 'jpg'
+
+            elif opt.startswith('codec='):
+                codec = MQ.codec_str(opt[6:])
+
+            elif opt == 'crops':  # frames2topicmsgs() does these
+                pass
+
+            elif opt.startswith('where='):
+                if not MQ.where_func(opt[6:])(frame.ro_data):
+                    return None
+
+            elif opt.startswith('maxsize='):
+                width, height = MQ.parse_maxsize(opt[8:])
+
+                if frame.has_image and ((fwidth := frame.width) > width) | ((fheight := frame.height) > height):
+                    frame                 = frame.bgr if frame.is_yuv else frame  # can't resize planar directly
+                    scale                 = min(width / fwidth, height / fheight)
+                    image                 = pool_resize(frame.image, (max(1, round(fwidth * scale)),
+                        max(1, round(fheight * scale))), cv2.INTER_AREA)
+                    image.flags.writeable = False  # ours, so no need to copy it again for zero copy or by reference
+                    frame                 = Frame(image, frame, frame.format)
+
+            else:
+                raise ValueError(f'unknown delivery variant option {opt!r}')
+
+        return frame, codec
+
+    @staticmethod
+    def codec_str(codec: str) -> str:
+        """Validate and normalize an image `codec` like 'jpg : 70' to 'jpg:70', see imgcodec.py."""
+
+        if not isinstance(codec, str):
+            raise ValueError(f'invalid image codec {codec!r}')
+
+        name, param = parse_image_codec(codec)
+
+        return name if param is None else f'{name}:{param}'
+
+    @staticmethod
+    def image_codec(frame: Frame, codec: bool | str | None) -> tuple[str, int | None]:
+        """The (name, param) of the image codec to send `frame` with given a `codec` from `outs_codec` or `outs_jpg`,
+        None sends it as jpg if it already is one (so costs nothing) or else raw."""
+
+        if codec is None:
+            return ('jpg' if frame.has_jpg else 'raw'), None
+
+        return (('jpg' if codec else 'raw'), None) if isinstance(codec, bool) else parse_image_codec(codec)
+
+    @staticmethod
+    def frame2msg(frame: Frame, codec: bool | str | None = None, zero_copy: bool = False, by_ref: bool = False) -> ZMQMessage:
+        """Convert a single `frame` to a zeromq message, see frames2topicmsgs()."""
+
+        if by_ref:
+            return [None, Frame(frame.ro, simpledeepcopy(frame.ro_data))]
+
+        data = frame.json if frame.has_data else None  # original JSON as received if data was not modified
+
+        if not frame.has_image:
+            return [None] if data is None else [None, data]
+
+        enc, param = MQ.image_codec(frame, codec)  # preferentially send jpg if is already encoded
+        frame      = frame.bgr if enc != 'raw' and frame.is_yuv else frame  # YUV only goes raw, encoded goes as BGR
+        xtra       = {'img': [frame.height, frame.width, frame.format, enc]}
+        img        = (
+            frame.jpg  # maybe cached or from upstream
+            if enc == 'jpg' and param is None else
+            encode_image(frame.image, enc, param)
+            if enc != 'raw' else
+            memoryview(image).cast('B')
+            if zero_copy and not (image := frame.image).flags.writeable and image.flags.c_contiguous else
+            bytearray(memoryview(np.ascontiguousarray(frame.image)))  # crops are not contiguous
+        )
+
+        return [xtra, img] if data is None else [xtra, img, data]
+
+    @staticmethod
+    def box2msg(frame: Frame, parent_topic: str) -> ZMQMessage:
+        """Convert a crop `frame` to a zeromq message which references its box in the Frame sent as `parent_topic` of the
+        same message instead of carrying an image."""
+
+        data = frame.json if frame.has_data else None  # original JSON as received if data was not modified
+        x, y = frame.box[:2]
+        xtra = {'img': [frame.height, frame.width, frame.format, 'box'], 'box': [parent_topic, x, y]}
+
+        return [xtra, b''] if data is None else [xtra, b'', data]
+
+    @staticmethod
+    def frames2topicmsgs(frames: dict[str, Frame], codec: bool | str | dict[str, bool | str | None] | None = None,
+            zero_copy: bool = False,
+            by_ref: bool = False, subscribed: Callable[[str], bool] | None = None,
+            variants: Callable[[str], list[str]] | None = None, delta: DeltaEncoder | None = None,
+            pool: ThreadPoolExecutor | None = None, planar: bool = True) -> dict[str, ZMQMessage]:
+        """Convert `frames` to zeromq messages with images encoded by `codec` (see image_codec()), or a dict of
+        codecs per topic with '*' for the rest. If `zero_copy` then raw readonly images are not copied but passed as
+        memoryviews of their own buffers, which is safe because readonly images are never modified. If `by_ref` then
+        the messages carry readonly Frames themselves for 'inproc://' outputs, see module docstring. Topics for which
+        `subscribed(topic)` is false are left out without encoding anything. Each of the delivery `variants(topic)` is
+        added as topic '!variant!topic', made once here for however many receivers asked for it. Images are delta
+        encoded by `delta` if given (not by reference). With a `pool` the topics are encoded in parallel in it. Crops
+        go as references into their parent Frame for variants with 'crops' if it goes to them in the same message.
+        NV12 / I420 images go as BGR if not `planar`, for receivers which may not understand those."""
+
+        def frame2msg(topic, frame, codec, parent_topic=None):
+            if not planar and not by_ref and frame.is_yuv:
+                frame = frame.bgr
+            if parent_topic is not None:
+                return MQ.box2msg(frame, parent_topic)
+            if delta is None or by_ref or not frame.has_image or frame.is_yuv:  # planar YUV doesn't tile, goes whole
+                return MQ.frame2msg(frame, codec, zero_copy, by_ref)
+
+            return delta.msg(topic, frame, codec, zero_copy)
+
+        jobs = []  # [(topic, frame, codec), ...] in the order the messages go out
+
+        for topic, frame in frames.items():
+            tcodec = codec.get(topic, codec.get('*')) if isinstance(codec, dict) else codec
+
+            if subscribed is None or subscribed(topic):
+                jobs.append((topic, frame, tcodec))
+
+            for variant in () if variants is None else variants(topic):
+                try:
+                    if (vframe_n_codec := MQ.variant_frame(frame, variant)) is None:  # 'where' doesn't match
+                        continue
+                except ValueError as exc:  # some other version downstream, they just don't get this topic
+                    once(logger.warning, f'can not send {topic!r}: {exc}', t=60*60)
+
+                    continue
+
+                vframe, vcodec = vframe_n_codec
+
+                jobs.append((f'!{variant}!{topic}', vframe, tcodec if vcodec is None else vcodec))
+
+        if not by_ref and any(f.parent is not None for _, f, _ in jobs):
+            vtopics = [(None, t) if not t.startswith('!') else (t[1 : (i := t.index('!', 1))], t[i + 1:]) for t, _, _ in jobs]
+            parents = {(v, id(f)): t for (v, t), (_, f, _) in zip(vtopics, jobs)}  # what goes out to who in this message
+
+            for i, ((v, _), (t, f, c)) in enumerate(zip(vtopics, jobs)):
+                if (parent := f.parent) is not None and v is not None and 'crops' in v.split(',') and \
+                        (ptopic := parents.get((v, id(parent)))) is not None:
+                    jobs[i] = (t, f, c, ptopic)
+
+        return dict(zip((job[0] for job in jobs), MQ.codec_map(frame2msg, jobs, pool)))
+
+    @staticmethod
+    def codec_map(func: Callable, jobs: list[tuple], pool: ThreadPoolExecutor | None = None) -> list:
+        """[func(*job) for job in jobs], in parallel in `pool` if given and there is more than one. Meant for image
+        encoding and decoding which let go of the GIL."""
+
+        if pool is None or len(jobs) < 2:
+            return [func(*job) for job in jobs]
+
+        return list(pool.map(lambda job: func(*job), jobs))
+
+    @staticmethod
+    def decode_frames(frames: dict[str, Frame], pool: ThreadPoolExecutor | None = None):
+        """Decode jpg-only images of `frames` now (they cache it), in parallel in `pool` if given."""
+
+        MQ.codec_map(lambda frame: frame.image, [(f,) for f in frames.values() if f.has_image and not f.has_raw], pool)
+
+    @staticmethod
+    def topicmsgs2frames(topicmsgs: dict[str, ZMQMessage], delta: DeltaDecoder | None = None) -> dict[str, Frame]:
+        """Convert zeromq messages back to Frames. Delta encoded images need the `delta` which has seen their keyframe,
+        topics for which it hasn't (or without one) are left out. Crops sent as boxes become crops of their parent
+        Frames, those whose parent topic was not received are left out."""
+
         frames = {}
+        boxes  = []  # [(topic, [parent topic, x, y], [height, width, ...], data), ...] resolved once all frames are in
 
         for topic, msg in topicmsgs.items():
-            xtra    = xtra['img'] if (xtra := msg[0]) else None
+            if isinstance(frame := msg[-1], Frame):  # by reference, image is readonly, the data is ours to modify
+                frames[topic] = Frame(frame, simpledeepcopy(frame.ro_data))
+
+                continue
+
+            dlt     = (xtra := msg[0]) and xtra.get('dlt')
+            xtra    = xtra['img'] if xtra else None
             dataidx = 2 if xtra else 1
 
             if (lmsg := len(msg)) > dataidx + 1:
                 raise RuntimeError(f'incorrect number of messages: {lmsg}')
 
-            data  = json_loads(msg[dataidx].decode()) if lmsg > dataidx else None
+            data  = bytes(msg[dataidx]) if lmsg > dataidx else None  # JSON, parsed by the Frame only if needed
+
+            if data is not None and not Frame.json_is_object(data):  # fail here and not in some filter downstream
+                raise ValueError(f'invalid data JSON in topic {topic!r}: {data[:50]!r}')
+
+            if dlt and xtra[3] == 'dlt':
+                if delta is not None and (frame := delta.frame(topic, msg[1], xtra, dlt, data)) is not None:
+                    frames[topic] = frame
+
+                continue
+
+            if xtra and xtra[3] == 'box':
+                boxes.append((topic, msg[0]['box'], xtra, data))
+
+                continue
+
             frame = (
-                Frame(data)
+                Frame(None, data)
                 if xtra is None else
-                Frame(np.frombuffer(msg[1], np.uint8).reshape(xtra[:2] if xtra[2] == 'GRAY' else (xtra[0], xtra[1], 3)), data, xtra[2])
+                Frame(np.frombuffer(msg[1], np.uint8).reshape(Frame.image_shape(*xtra[:3])), data, xtra[2])
                 if xtra[3] == 'raw' else
                 Frame.from_jpg(msg[1], data, xtra[0], xtra[1], xtra[2])
+                if xtra[3] == 'jpg' else
+                Frame(decode_image(msg[1], xtra[3], Frame.image_shape(*xtra[:3])), data, xtra[2])
             )
 
+            if dlt and delta is not None:
+                delta.keyframe(topic, frame, dlt)
+
             frames[topic] = frame
 
+        for topic, (ptopic, x, y), (height, width, *_), data in boxes:
+            if (parent := frames.get(ptopic)) is not None and parent.has_image:
+                frames[topic] = parent.crop(x, y, width, height, data)
+            else:
+                once(logger.warning, f'crop {topic!r} left out because its parent {ptopic!r} was not received, '
+                    f'subscribe to that as well', t=60*60)
+
         return frames
 
 
@@ -244,10 +1160,15 @@ class MQSender(MQ):
         outs_balance:  bool = False,
         outs_required: list[str] | None = None,
         outs_jpg:      bool | None = None,
+        outs_codec:    str | dict[str, str] | None = None,
+        outs_delta:    bool | int | None = None,
         outs_metrics:  str | bool | None = False,
         metrics_cb:    Callable[[dict], None] | None = None,
+        metrics_agg:   float | None = None,
         on_exit_msg:   Callable[[str], None] | None = None,
         mq_log:        str | bool | None = None,
+        mq_zero_copy:  bool | None = None,
+        mq_threads:    int | None = None,
     ):
         super().__init__(
             srcs_n_topics = None,
@@ -256,10 +1177,15 @@ class MQSender(MQ):
             outs_balance  = outs_balance,
             outs_required = outs_required,
             outs_jpg      = outs_jpg,
+            outs_codec    = outs_codec,
+            outs_delta    = outs_delta,
             outs_metrics  = outs_metrics,
             metrics_cb    = metrics_cb,
+            metrics_agg   = metrics_agg,
             on_exit_msg   = on_exit_msg,
             mq_log        = mq_log,
+            mq_zero_copy  = mq_zero_copy,
+            mq_threads    = mq_threads,
         )
 
 
@@ -272,7 +1198,13 @@ class MQReceiver(MQ):
         *,
         srcs_balance:  bool = False,
         srcs_low_lat:  bool | None = None,
+        srcs_window:   int | None = None,
+        srcs_reorder:  int | None = None,
+        srcs_compress: bool | str | list[str] | None = None,
+        srcs_decode:   bool = False,
         on_exit_msg:   Callable[[str], None] | None = None,
+        mq_zero_copy:  bool | None = None,
+        mq_threads:    int | None = None,
     ):
         super().__init__(
             srcs_n_topics = srcs_n_topics,
@@ -280,5 +1212,11 @@ class MQReceiver(MQ):
             mq_id         = mq_id,
             srcs_balance  = srcs_balance,
             srcs_low_lat  = srcs_low_lat,
+            srcs_window   = srcs_window,
+            srcs_reorder  = srcs_reorder,
+            srcs_compress = srcs_compress,
+            srcs_decode   = srcs_decode,
             on_exit_msg   = on_exit_msg,
+            mq_zero_copy  = mq_zero_copy,
+            mq_threads    = mq_threads,
         )
@@ -33,6 +33,107 @@ Example:
     FilterF: sources=['tcp://FilterC', 'tcp://FilterE?']
     FilterG: sources=['tcp://FilterF']
 
+Shared memory channels:
+
+A sender can bind to 'shm://name' instead of 'ipc://name'. The sockets are the same as for 'ipc://' (and receivers can
+connect with either scheme) but large binary message parts (images) are written into a ring of shared memory slots
+(files in ZMQ_SHM_PATH) and only a small reference is sent in the envelope. Receivers wrap the slot readonly without
+copying. A slot is not reused until every client the message was sent to has released it (the receiver reports released
+slots in its requests once the received buffers are garbage collected), or has disconnected or timed out. Receivers which
+are not tracked by the sender (doubly ephemeral '??' listeners or connections which have not received anything yet) get
+a copy of the slot which is validated against concurrent reuse and discarded if it was overwritten. If no slot is free
+then the part is sent inline as for 'ipc://'. The slot files are named after the path of the bind, so whatever a sender
+which was killed or crashed left behind is deleted when that bind is next started.
+
+In-process channels:
+
+A sender can bind to 'inproc://name' for receivers in other threads of the same process (zeromq 'inproc' transport on
+the shared process context, the request socket is at 'inproc://name.req'). Message parts are never put on the socket,
+the message itself is kept in a process-global store and only its key is sent in the envelope as 'obj'. The receiver
+gets the very same parts objects, nothing is copied, serialized or compressed, so the sender must not modify anything it
+sent. This also means parts do not have to be bytes, a sender with only 'inproc://' binds may send any objects (MQ uses
+this to pass Frames by reference). Each sender keeps its last ZMQ_INPROC_SLOTS messages alive, a receiver which falls
+further behind than that (an ephemeral one) finds them gone and drops them as 'inproc_gone'.
+
+Router channels:
+
+A sender can bind to 'router+tcp://...', 'router+ipc://...', 'router+shm://...' or 'router+inproc://...' and receivers
+then connect to the same address with the same prefix. Instead of a PUB and a PULL socket pair there is a single ROUTER
+socket (DEALER on the receivers) and each message is sent to only ONE of the connected clients, the one with credit
+which has the fewest messages in flight. This balances load across any number of identical workers on a single address.
+Since requests and messages travel over the same connection there is no connect race and no HELLO handshake is needed.
+The messages are marked as balanced so the workers' outputs can be joined again downstream by a balanced receiver. Topic
+subscriptions are filtered on the receiving side as all topics of a message are sent to the chosen client. Doubly
+ephemeral '??' listeners are not possible on these as they never request anything.
+
+Message envelope:
+
+The envelope (second part of each message) is JSON by default. Receivers advertise support for a compact binary envelope
+in their requests and a sender uses it on a bind address once every receiver it tracks there has done so, receivers then
+switch to binary requests as well. The binary form is a fixed struct header (version, flags, msg_id, balance index and
+image dimensions / format / encoding if present) followed by the '\0' joined server_id and topics and an optional JSON
+extension blob for anything else. A JSON envelope always starts with '{' so the two are told apart by the first byte.
+Receivers also subscribe to a marker prefix unique to them which never matches a topic and the sender counts the
+connections on each PUB socket, so if anything else is subscribed there (outside readers which never send requests or
+receivers older than the binary envelope) then that bind stays on JSON envelopes. Whether everything downstream is marked
+like this is also available as `downstream_current` for anything else older receivers would not understand.
+
+Data compression:
+
+A receiver can ask its 'tcp://' senders (never 'ipc://' or 'shm://', local links have bandwidth to spare) to compress the
+data part of messages (the JSON of Frame.data, the last part after the image if there is one) by listing the codecs it
+understands in its requests ('zstd' and 'lz4' if their optional packages are installed, 'zlib' always). A sender
+compresses on a 'tcp://' bind with the first of its own codecs that every receiver it tracks there asked for, and only
+data parts of at least ZMQ_COMPRESS_MIN bytes which actually get smaller. The codec is given in the envelope of each
+compressed message. Doubly ephemeral '??' listeners do not ask but still decompress if they have the codec. Data parts
+which would decompress to more than ZMQ_DECOMPRESS_MAX bytes (or are corrupt) are dropped as 'decompress'.
+
+Link statistics:
+
+Senders keep statistics per downstream client_id and receivers per upstream server_id: total bytes of the messages sent
+or received, bandwidth over the last ZMQ_STATS_INTERVAL, how long each message waited on that peer (for a sender the
+time from send() until the client's request came in if it hadn't requested yet, for a receiver the time from recv()
+until that source's message arrived) and on receivers the round trip from sending a request until the requested message
+arrives (only measured when recv() is waiting for it, messages which were already waiting could have arrived any time).
+The slowest neighbour is the one with the longest wait. Get them as flat metrics with link_metrics().
+
+Dropped messages:
+
+Messages which are not delivered are reported to the `on_drop(reason, topic, count)` callback of the sender or receiver
+with one of the reasons: 'outdated' (sender discarded a message older than downstream already asked for), 'older'
+(receiver discarded a message older than expected), 'lost' (receiver got a newer message id than expected or gave up
+waiting for one in the reorder buffer, the skipped ones never arrived, most likely dropped at the PUB high water mark of
+the sender), 'shm_reused' (shared memory slot reused before it could be read), 'inproc_gone' ('inproc://' message
+evicted before it could be looked up) and 'decompress' (compressed data part too big or corrupt). Topic is None if not known.
+
+Subscribed topics:
+
+The PUB sockets of a sender are XPUBs so the sender sees the topic subscriptions of every receiver connected to them,
+including doubly ephemeral '??' listeners which never send a request. These are taken in on each send() and are
+available as `sub_topics` (None if anyone subscribed to all topics or there is a 'router+' bind where receivers filter
+for themselves) and per topic with subscribed(), so that work and encoding for topics nobody wants can be skipped. A
+skipped topic is simply not in the message, receivers never wait for topics they did not subscribe to. The unsubscribe of
+a receiver which went away may only show up some send()s later.
+
+Delivery variants:
+
+A receiver can subscribe to a named variant of the topics of a source instead of the topics themselves, the sender then
+sees it in variants(topic) and publishes the variant message for topic 'main' as topic '!variant!main' in the same
+send() (the caller makes the variant messages, each at most once no matter how many receivers want it). On the wire the
+topic key just gets a '!variant!' prefix so plain subscribers never see the variants and variant subscribers never see
+the plain messages or other variants, receivers which subscribed to '*' everything skip variants which are not theirs.
+The envelope 'topics' always lists the plain topics. Not possible on 'router+' sources as those clients filter topics
+themselves.
+
+A bind can have a variant of its own (see ZMQSender `addrs_bind`), then its plain subscribers count as subscribed to
+that variant and get the variant messages under the plain topic keys, falling back to the plain messages for topics
+without one. Receivers don't know the difference, e.g. a remote bind can send lower quality jpgs than a local one.
+
+A variant does not have to be sent for every message (e.g. a content filter which didn't match). The heartbeat which
+ends every message still goes to everyone, so a variant receiver takes whatever it didn't get by then as left out, and a
+message which was left out entirely is acknowledged and skipped without being returned. Message ids stay in step for
+everyone this way, nothing is counted as lost.
+
 Environment variables:
     DEBUG_ZEROMQ: If 'true'ish and logging is set to 'debug' then will log each message sent and received (not the
         full contents, just basic info).
@@ -46,7 +147,7 @@ Environment variables:
         the last messages even with LINGER set high.
 
     ZMQ_POLL_TIMEOUT: Length to wait in milliseconds each poll for a message to come in in milliseconds. Requests for
-        more frames are sent at this interval as well.
+        more frames are sent at this interval as well. Waits end early on a ZMQWaker regardless of this.
 
     ZMQ_CONN_TIMEOUT: Length of time in milliseconds without receiving anything from a downstream connection in order to
         consider that client timed out and no longer require a request from it to allow publish of frames.
@@ -65,20 +166,70 @@ Environment variables:
     ZMQ_LOW_LATENCY: If 'true'ish then favor lower latency over higher throughput. Will only help in some cases with
         the right properties. Really on things immediately downstream of VideoIn.
 
+    ZMQ_WINDOW: Default credit window of receivers, number of messages a synchronized sender may publish ahead of
+        requests. Set on downstream side, default 1. Large windows of large messages may need a higher ZMQ_PUB_HWM.
+
+    ZMQ_BALANCE_ALPHA: Weight of each new sample in the moving average of the service time of balanced clients.
+
+    ZMQ_BALANCE_SLACK: Milliseconds of difference in expected completion time under which balanced outputs / router
+        clients are considered equally loaded and are served round-robin (as is anything within 50% of the least).
+
+    ZMQ_REORDER_TIMEOUT: Milliseconds a balanced receiver holds completed messages waiting for a missing earlier one.
+
     ZMQ_WARN_NEWER: Warn on newer messages than expected.
     ZMQ_WARN_OLDER: Warn on older messages than expected.
+
+    ZMQ_SHM_PATH: Directory for 'shm://' shared memory slot files, default '/dev/shm' if present, otherwise tmp dir.
+    ZMQ_SHM_SLOTS: Number of shared memory slots in the ring of each 'shm://' sender.
+    ZMQ_SHM_MIN_SIZE: Minimum size in bytes of a message part to be sent through shared memory, smaller are inline.
+
+    ZMQ_INPROC_SLOTS: Number of most recent messages each 'inproc://' sender keeps alive for its receivers.
+
+    ZMQ_ENVELOPE: 'binary' (default) to negotiate the compact binary envelope with receivers, 'json' to always use
+        JSON envelopes and requests.
+
+    ZMQ_COMPRESS: Default data compression receivers ask 'tcp://' senders for, 'false' (default), 'true' for any
+        available codec or a comma separated list of codecs like 'zstd,zlib'.
+
+    ZMQ_COMPRESS_MIN: Minimum size in bytes of a data part to be compressed, smaller are sent as is.
+
+    ZMQ_DECOMPRESS_MAX: Maximum size in bytes a received data part may decompress to, bigger ones are dropped.
+
+    ZMQ_STATS_INTERVAL: Milliseconds over which link bandwidth is measured.
 """
 
 import logging
+import mmap
 import os
 import re
+import struct
+import tempfile
+import weakref
+import zlib
+from collections import deque
+from itertools import count
 from json import dumps as json_dumps, loads as json_loads
+from threading import Lock
 from time import time_ns, sleep
 from typing import Callable, NamedTuple
 
+import numpy as np
 import zmq
+from zmq.utils.monitor import recv_monitor_message
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+try:
+    import lz4.frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
 
-from .utils import JSONType, json_getval, rndstr, once
+from .utils import JSONType, json_getval, rndstr, sanitize_filename, split_commas_maybe, once
 
 __all__ = ['is_zeromq_addr', 'ZMQMessage', 'ZMQReceiver', 'ZMQSender']
 
@@ -101,8 +252,21 @@ ZMQ_CONN_HANDSHAKE    = bool(json_getval((os.getenv('ZMQ_CONN_HANDSHAKE') or 'tr
 ZMQ_PUSH_HWM          = int(os.getenv('ZMQ_PUSH_HWM') or max(3, min(100, ZMQ_CONN_TIMEOUT // max(1, ZMQ_POLL_TIMEOUT))))  # will start complaining after this many push sends pending
 ZMQ_PUB_HWM           = int(os.getenv('ZMQ_PUB_HWM') or 4 * 5)        # will start dropping after this many messages are backed up, low because messages are expected to be large and we don't want latency building up, 4 because 4 parts per message (each part message counts as individual message I guess?)
 ZMQ_LOW_LATENCY       = bool(json_getval((os.getenv('ZMQ_LOW_LATENCY') or 'false').lower()))
+ZMQ_WINDOW            = int(os.getenv('ZMQ_WINDOW') or 1)           # messages which may be in flight per synchronized sender
+ZMQ_BALANCE_ALPHA     = float(os.getenv('ZMQ_BALANCE_ALPHA') or 0.2)  # weight of new sample in service time moving average
+ZMQ_BALANCE_SLACK     = float(os.getenv('ZMQ_BALANCE_SLACK') or 10)   # in milliseconds, expected loads closer than this are equal
+ZMQ_REORDER_TIMEOUT   = int(os.getenv('ZMQ_REORDER_TIMEOUT') or 1000) # in milliseconds, max wait for a missing balanced message
 ZMQ_WARN_NEWER        = bool(json_getval((os.getenv('ZMQ_WARN_NEWER') or 'true').lower()))
 ZMQ_WARN_OLDER        = bool(json_getval((os.getenv('ZMQ_WARN_OLDER') or 'true').lower()))
+ZMQ_SHM_PATH          = os.getenv('ZMQ_SHM_PATH') or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+ZMQ_SHM_SLOTS         = int(os.getenv('ZMQ_SHM_SLOTS') or 16)
+ZMQ_SHM_MIN_SIZE      = int(os.getenv('ZMQ_SHM_MIN_SIZE') or 0x10000)  # in bytes, smaller parts are not worth a slot
+ZMQ_INPROC_SLOTS      = int(os.getenv('ZMQ_INPROC_SLOTS') or 16)
+ZMQ_ENVELOPE          = (os.getenv('ZMQ_ENVELOPE') or 'binary').lower()
+ZMQ_COMPRESS          = os.getenv('ZMQ_COMPRESS') or 'false'
+ZMQ_COMPRESS_MIN      = int(os.getenv('ZMQ_COMPRESS_MIN') or 4096)  # in bytes, smaller data parts are not worth compressing
+ZMQ_DECOMPRESS_MAX    = int(os.getenv('ZMQ_DECOMPRESS_MAX') or 0x4000000)  # in bytes, max decompressed data part, protects from corrupt or hostile ones
+ZMQ_STATS_INTERVAL    = int(os.getenv('ZMQ_STATS_INTERVAL') or 1000)  # in milliseconds, link bandwidth measurement window
 
 MSG_ID_INITIAL        = 0
 MSG_ID_INITIAL_PREV   = -1
@@ -116,10 +280,85 @@ TOPIC_DELIM           = '/'
 TOPIC_DELIM_B         = b'/'
 TOPIC_DELIM2          = TOPIC_DELIM * 2
 TOPIC_DELIM_B2        = TOPIC_DELIM_B * 2
+VARIANT_DELIM         = '!'                         # '!variant!' prefix of the topic keys of a delivery variant
+VARIANT_DELIM_B       = b'!'
+
+SHM_HDR               = struct.Struct('<q')  # slot generation, written before (-1) and after (gen) the payload
+SHM_WRITING           = -1
+
+ENV_VERSION           = 1                           # binary envelope version, first byte, can never be '{'
+ENV_HDR               = struct.Struct('<BBqhH')     # version, flags, msg_id, balance index, len(strs)
+ENV_IMG               = struct.Struct('<IIBB')      # height, width, format, encoding
+ENV_REQ               = struct.Struct('<BBqH')      # version, flags, msg_id, len(strs)
+ENV_F_IMG             = 0x01                        # envelope has image info
+ENV_F_TOPICS          = 0x02                        # envelope strs has topics after sid
+ENV_F_NEW             = 0x04                        # request 'new'
+ENV_F_EPH             = 0x18                        # request 'eph' bits (shifted by 3)
+ENV_F_EXT             = 0x80                        # JSON extension blob follows strs
+ENV_FORMATS           = ('BGR', 'RGB', 'GRAY')
+ENV_ENCS              = ('raw', 'jpg')
+ENV_FORMAT2IDX        = {f: i for i, f in enumerate(ENV_FORMATS)}
+ENV_ENC2IDX           = {e: i for i, e in enumerate(ENV_ENCS)}
+ENV_KEYS              = frozenset(('sid', 'mid', 'topics', 'xtra', 'bal'))
+ENV_REQ_KEYS          = frozenset(('cid', 'uid', 'mid', 'eph', 'new', 'env'))
+ENV_SUB               = '#env#'                     # subscription prefix + unique_id of receivers of this envelope version, never matches a topic key
+ENV_SUB_B             = b'#env#'
+
+ROUTER_PREFIX         = 'router+'                   # 'router+tcp://...', single socket per-client delivery instead of PUB + PULL
+
+
+
+def zstd_decompress(buf: bytes, max_size: int) -> bytes:
+    if zstandard.frame_content_size(buf) > max_size:  # otherwise the whole declared size would be allocated up front
+        raise ValueError(f'decompressed data bigger than {max_size} bytes')
+
+    return zstandard.ZstdDecompressor().decompress(buf, max_output_size=max_size)  # for unknown content size
+
+
+def lz4_decompress(buf: bytes, max_size: int) -> bytes:
+    if len(data := (dec := lz4.frame.LZ4FrameDecompressor()).decompress(buf, max_size + 1)) > max_size or not dec.eof:
+        raise ValueError(f'decompressed data bigger than {max_size} bytes or truncated')
+
+    return data
+
+
+def zlib_decompress(buf: bytes, max_size: int) -> bytes:
+    if len(data := (dec := zlib.decompressobj()).decompress(buf, max_size + 1)) > max_size or not dec.eof:
+        raise ValueError(f'decompressed data bigger than {max_size} bytes or truncated')
+
+    return data
 
-is_zeromq_addr        = lambda addr: addr.startswith('tcp://') or addr.startswith('ipc://')
 
-ZMQMessage            = list[JSONType | bytes]  # only the first OBLIGATORY element is arbitrary JSONType, rest (if present) MUST be bytes
+CODECS                = {  # {'name': (compress, decompress(buf, max_size)), ...} available data compression codecs in order of preference
+    **({'zstd': (lambda b: zstandard.compress(b, 3), zstd_decompress)} if HAS_ZSTD else {}),
+    **({'lz4': (lz4.frame.compress, lz4_decompress)} if HAS_LZ4 else {}),
+    'zlib': (lambda b: zlib.compress(b, 1), zlib_decompress),
+}
+
+is_zeromq_addr        = lambda addr: (a := addr.removeprefix(ROUTER_PREFIX)).startswith('tcp://') or a.startswith('ipc://') or \
+    a.startswith('shm://') or a.startswith('inproc://')
+
+
+def topic_key(topic: str) -> bytes:
+    """The key `topic` is published under, '/topic/' or '_topic/' for hidden ones. A delivery variant topic
+    '!variant!topic' goes out as '!variant!' followed by the key of the topic."""
+
+    variant, topic = topic[1:].split(VARIANT_DELIM, 1) if topic.startswith(VARIANT_DELIM) else (None, topic)
+    key            = f'{"" if topic.startswith("_") else TOPIC_DELIM}{topic}{TOPIC_DELIM}'
+
+    return (key if variant is None else f'{VARIANT_DELIM}{variant}{VARIANT_DELIM}{key}').encode()
+
+
+def compress_codecs(compress: bool | str | list[str] | None) -> list[str]:
+    """The available codecs from a ZMQ_COMPRESS style `compress` in our order of preference, true for all of them."""
+
+    if isinstance(compress, str):
+        compress = split_commas_maybe(json_getval(compress.lower()))
+
+    return [codec for codec in CODECS if not isinstance(compress, (list, tuple)) or codec in compress] if compress else []
+
+
+ZMQMessage            = list[JSONType | bytes]  # only the first OBLIGATORY element is arbitrary JSONType, rest (if present) MUST be bytes (any object if 'inproc://' only)
 ZMQState              = tuple                   # for passing info between a Receiver and Sender
 
 
@@ -134,19 +373,403 @@ class ZMQStateRecv(NamedTuple):  # for ZMQReceiver.recv() from ZMQSender.send()
 
 class ZMQContext:
     context = (None, 0)
+    lock    = Lock()  # senders and receivers may come and go in several threads of one process ('inproc://')
 
     @staticmethod
     def get():
-        ZMQContext.context = (ZMQContext.context[0], c + 1) if (c := ZMQContext.context[1]) else (zmq.Context(), 1)
+        with ZMQContext.lock:
+            ZMQContext.context = (ZMQContext.context[0], c + 1) if (c := ZMQContext.context[1]) else (zmq.Context(), 1)
 
-        return ZMQContext.context[0]
+            return ZMQContext.context[0]
 
     @staticmethod
     def free():
-        ZMQContext.context = (ZMQContext.context[0], (c := ZMQContext.context[1] - 1))
+        with ZMQContext.lock:
+            ZMQContext.context = (ZMQContext.context[0], (c := ZMQContext.context[1] - 1))
+
+            if not c:
+                ZMQContext.context[0].destroy()  # linger=0)
+
+
+class ZMQWaker:
+    """Wake up a ZMQSender.send() or ZMQReceiver.recv() blocked in another thread, which then returns None as on a
+    timeout. Stays set (and every wait returns immediately) until clear()ed, so a wake can not be missed between the
+    caller checking its own condition and starting a wait. A pipe whose read end is registered in their pollers."""
+
+    def __init__(self):
+        self.fd, self.fd_wr = os.pipe()
+        self.is_set         = False
+        self.lock           = Lock()
+
+        os.set_blocking(self.fd, False)
+
+    def close(self):
+        with self.lock:
+            if (fd := self.fd) is not None:
+                self.fd = None
+
+                os.close(fd)
+                os.close(self.fd_wr)
+
+    def wake(self):
+        with self.lock:
+            if not self.is_set and self.fd is not None:
+                self.is_set = True
+
+                os.write(self.fd_wr, b'\0')
+
+    def clear(self):
+        with self.lock:
+            if self.is_set and self.fd is not None:
+                self.is_set = False
+
+                try:
+                    os.read(self.fd, 64)
+                except BlockingIOError:
+                    pass
+
+    @staticmethod
+    def poll_func(poller: zmq.Poller, waker: 'ZMQWaker | None') -> Callable[[int | None], list]:
+        """A `poller.poll()` which leaves out the `waker` fd, so a wake just ends the poll with nothing, like a timeout."""
+
+        if waker is None:
+            return poller.poll
 
-        if not c:
-            ZMQContext.context[0].destroy()  # linger=0)
+        fd   = waker.fd
+        poll = poller.poll
+
+        return lambda timeout: [sock for sock in poll(timeout) if sock[0] != fd]
+
+
+class ZMQLinkStats:
+    """Transport statistics of one link, kept by ZMQSender per client_id and by ZMQReceiver per source."""
+
+    def __init__(self):
+        self.nbytes = 0     # total bytes of messages sent / received over the link
+        self.bw     = 0.    # bytes per second over the last full ZMQ_STATS_INTERVAL
+        self.wait   = None  # moving average of ms each message waited on this peer, None until first sample
+        self.rtt    = None  # moving average of ms from request sent to message received (receivers only)
+        self.bw_t   = time_ns()
+        self.bw_n   = 0
+
+    @staticmethod
+    def avg(avg: float | None, sample: float) -> float:
+        return sample if avg is None else 0.95 * avg + 0.05 * sample
+
+    @staticmethod
+    def msg_nbytes(parts: list) -> int:
+        return sum(memoryview(part).nbytes for part in parts)
+
+    def metrics(self, prefix: str) -> dict[str, float]:
+        if (td := (t := time_ns()) - self.bw_t) >= ZMQ_STATS_INTERVAL * 1_000_000:
+            self.bw   = (self.nbytes - self.bw_n) * 1_000_000_000 / td
+            self.bw_t = t
+            self.bw_n = self.nbytes
+
+        metrics = {f'{prefix}_bytes_count': self.nbytes, f'{prefix}_bw': self.bw / 1_000_000}  # MB/s
+
+        if (wait := self.wait) is not None:
+            metrics[f'{prefix}_wait'] = wait
+
+        if (rtt := self.rtt) is not None:
+            metrics[f'{prefix}_rtt'] = rtt
+
+        return metrics
+
+
+class ZMQShmRing:
+    """Sender side ring of shared memory slots. Each slot is a file in ZMQ_SHM_PATH mapped into memory with a small
+    generation header followed by the payload. A slot which is too small for a payload is replaced by a new bigger file
+    with a new name so that receivers which still map the old one are not affected. Slot files are named
+    '{prefix}-{rnd}-{idx}-{gen}' where `prefix` is the same for every ring of a bind, files of previous rings of the
+    same bind (which did not get to destroy() themselves) are deleted on creation."""
+
+    class Slot:
+        def __init__(self, name: str, size: int):
+            self.name    = name
+            self.size    = size
+            self.gen     = 0
+            self.holders = set()  # {'full_id', ...} of clients which have not released this slot yet
+
+            with open(os.path.join(ZMQ_SHM_PATH, name), 'w+b') as f:
+                f.truncate(size)
+
+                self.mmap = mmap.mmap(f.fileno(), size)
+
+        def destroy(self):
+            self.mmap.close()
+
+            try:
+                os.unlink(os.path.join(ZMQ_SHM_PATH, self.name))
+            except Exception:
+                pass
+
+    def __init__(self, prefix: str, nslots: int | None = None):
+        stale = re.compile(re.escape(prefix) + r'-[0-9A-Za-z]{6}-\d+-\d+')
+
+        for name in os.listdir(ZMQ_SHM_PATH):
+            if stale.fullmatch(name):
+                try:
+                    os.unlink(os.path.join(ZMQ_SHM_PATH, name))  # receivers which still map it are not affected
+                except Exception:
+                    pass
+
+        self.prefix  = f'{prefix}-{rndstr(6)}'  # receivers may still have a previous ring of this bind mapped
+        self.slots   = [None] * (ZMQ_SHM_SLOTS if nslots is None else nslots)
+        self.next    = 0
+        self.gen     = 0
+        self.name2sl = {}  # {'name': Slot, ...}
+
+    def destroy(self):
+        for slot in self.slots:
+            if slot is not None:
+                slot.destroy()
+
+        self.slots   = [None] * len(self.slots)
+        self.name2sl = {}
+
+    def put(self, buf, holders: set[str]) -> list | None:
+        """Write `buf` to a free slot held by `holders` and return the reference [name, gen, nbytes] to send, or None if
+        there is no free slot."""
+
+        slots  = self.slots
+        nslots = len(slots)
+
+        for i in range(nslots):
+            if (slot := slots[idx := (self.next + i) % nslots]) is None or not slot.holders:
+                break
+        else:
+            return None
+
+        nbytes    = (mv := memoryview(buf).cast('B')).nbytes
+        size      = SHM_HDR.size + nbytes
+        self.next = (idx + 1) % nslots
+        self.gen  = gen = self.gen + 1
+
+        if slot is None or slot.size < size:
+            if slot is not None:
+                del self.name2sl[slot.name]
+
+                slot.destroy()
+
+            slots[idx] = slot = ZMQShmRing.Slot(f'{self.prefix}-{idx}-{gen}', size)
+            self.name2sl[slot.name] = slot
+
+        slot.gen     = gen
+        slot.holders = set(holders)
+        smm          = slot.mmap
+
+        SHM_HDR.pack_into(smm, 0, SHM_WRITING)
+        smm[SHM_HDR.size : SHM_HDR.size + nbytes] = mv
+        SHM_HDR.pack_into(smm, 0, gen)
+
+        return [slot.name, gen, nbytes]
+
+    def release(self, holder: str, refs: list[list] | None = None):
+        """Release slots held by `holder`, `refs` is a list of [name, gen] or None to release everything it holds."""
+
+        if refs is None:
+            for slot in self.slots:
+                if slot is not None:
+                    slot.holders.discard(holder)
+
+        else:
+            for name, gen in refs:
+                if (slot := self.name2sl.get(name)) is not None and slot.gen == gen:
+                    slot.holders.discard(holder)
+
+
+class ZMQShmReader:
+    """Receiver side access to the shared memory slots of senders. Buffers returned without copy are readonly and report
+    themselves as released (in `released`) when garbage collected."""
+
+    CACHE_SIZE = 64
+
+    def __init__(self):
+        self.mmaps    = {}  # {'name': mmap, ...}
+        self.released = []  # [[name, gen], ...], appended to from finalizers so may be from any thread
+
+    def take_released(self) -> list[list]:
+        released = self.released
+
+        return [released.pop(0) for _ in range(len(released))]  # pop() is atomic so this is safe against finalizers
+
+    def get(self, ref: list, copy: bool) -> np.ndarray | bytes | None:
+        name, gen, nbytes = ref
+
+        if (smm := self.mmaps.get(name)) is None:
+            try:
+                with open(os.path.join(ZMQ_SHM_PATH, name), 'rb') as f:
+                    smm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            except (FileNotFoundError, ValueError):  # sender replaced or destroyed the slot already
+                return None
+
+            if len(mmaps := self.mmaps) >= ZMQShmReader.CACHE_SIZE:
+                del mmaps[next(iter(mmaps))]  # never close(), might still be exported to live Frames, gc will get it
+
+            mmaps[name] = smm
+
+        if SHM_HDR.unpack_from(smm, 0)[0] != gen:
+            return None
+
+        if copy:
+            buf = smm[SHM_HDR.size : SHM_HDR.size + nbytes]
+
+            self.released.append([name, gen])  # in case the sender was tracking us after all
+
+            return buf if SHM_HDR.unpack_from(smm, 0)[0] == gen else None  # overwritten while copying?
+
+        buf = np.frombuffer(smm, np.uint8, nbytes, SHM_HDR.size)
+
+        weakref.finalize(buf, self.released.append, [name, gen])
+
+        return buf
+
+
+class ZMQInprocStore:
+    """Process-global store of messages passed by reference on 'inproc://' binds. Each sender holds its own last
+    `nslots` messages in the store, older ones are evicted (the receivers may still hold them, they just can't look them
+    up anymore)."""
+
+    objs = {}        # {key: ZMQMessage, ...} of all senders in this process
+    keys = count(1)
+    lock = Lock()
+
+    def __init__(self, nslots: int | None = None):
+        self.nslots = ZMQ_INPROC_SLOTS if nslots is None else nslots
+        self.held   = deque()  # [key, ...] of our own messages in the store, oldest first
+
+    def destroy(self):
+        with ZMQInprocStore.lock:
+            for key in self.held:
+                ZMQInprocStore.objs.pop(key, None)
+
+        self.held.clear()
+
+    def put(self, msg: ZMQMessage) -> int:
+        with ZMQInprocStore.lock:
+            ZMQInprocStore.objs[key := next(ZMQInprocStore.keys)] = msg
+
+            (held := self.held).append(key)
+
+            while len(held) > self.nslots:
+                del ZMQInprocStore.objs[held.popleft()]
+
+        return key
+
+    @staticmethod
+    def get(key: int) -> ZMQMessage | None:
+        return ZMQInprocStore.objs.get(key)
+
+
+class ZMQEnvelope:
+    """Compact binary envelope for messages (`dumps()` / `loads()`) and requests (`dumps_req()` / `loads_req()`). The
+    `loads` functions also accept JSON so can be used on anything that comes in. Decoded envelopes are the same dicts
+    that the JSON would have given, except that 'xtra' and 'topics' are not present if they would have been None."""
+
+    def __init__(self, sid: str, topics: list[str] | None = None):
+        """The strings are the same for all topics of a message so are only encoded once here, `dumps()` must then be
+        called with envelopes that have this 'sid' and 'topics'."""
+
+        self.strs  = (sid if topics is None else '\0'.join((sid, *topics))).encode()
+        self.flags = 0 if topics is None else ENV_F_TOPICS
+
+    def dumps(self, env: dict[str, JSONType]) -> bytes:
+        flags = self.flags
+        img   = b''
+        ext   = None
+
+        if (xtra := env.get('xtra')) is not None:
+            if (len(xtra) == 1 and (im := xtra.get('img')) is not None and (fmt := ENV_FORMAT2IDX.get(im[2])) is not None
+                    and (enc := ENV_ENC2IDX.get(im[3])) is not None):
+                flags |= ENV_F_IMG
+                img    = ENV_IMG.pack(im[0], im[1], fmt, enc)
+
+            else:
+                ext = {'xtra': xtra}
+
+        if other := env.keys() - ENV_KEYS:  # something in there besides standard keys (like 'shm')
+            ext = {**(ext or {}), **{k: env[k] for k in other}}
+
+        head = ENV_HDR.pack(ENV_VERSION, flags | ENV_F_EXT if ext else flags, env['mid'], env.get('bal', 0), len(strs := self.strs))
+
+        return b''.join((head, img, strs, json_dumps(ext, separators=(',', ':')).encode())) if ext else head + img + strs
+
+    @staticmethod
+    def loads(buf: bytes, cache: list | None = None) -> dict[str, JSONType]:
+        """Decode binary or JSON envelope. `cache` is an optional [b'strs', 'sid', ['topics', ...] | None] for the
+        previous decoded strings from the same sender, which are almost always the same."""
+
+        if buf[0] != ENV_VERSION:
+            return json_loads(buf)
+
+        _, flags, mid, bal, nstrs = ENV_HDR.unpack_from(buf)
+        env                       = {'mid': mid}
+        off                       = ENV_HDR.size
+
+        if flags & ENV_F_IMG:
+            height, width, fmt, enc = ENV_IMG.unpack_from(buf, off)
+            env['xtra']             = {'img': [height, width, ENV_FORMATS[fmt], ENV_ENCS[enc]]}
+            off                    += ENV_IMG.size
+
+        strs = buf[off : (off := off + nstrs)]
+
+        if cache is not None and cache[0] == strs:
+            sid, topics = cache[1:]
+
+        else:
+            sid, *topics = strs.decode().split('\0')
+            topics       = topics if flags & ENV_F_TOPICS else None
+
+            if cache is not None:
+                cache[:] = (strs, sid, topics)
+
+        env['sid'] = sid
+
+        if topics is not None:
+            env['topics'] = topics
+
+        if bal:
+            env['bal'] = bal
+
+        if flags & ENV_F_EXT:
+            env.update(json_loads(buf[off:]))
+
+        return env
+
+    @staticmethod
+    def dumps_req(req: dict[str, JSONType]) -> bytes:
+        flags = (ENV_F_NEW if req.get('new') else 0) | (req.get('eph', 0) << 3)
+        strs  = f'{req["cid"]}\0{req.get("uid", "")}'.encode()
+        head  = ENV_REQ.pack(ENV_VERSION, flags | ENV_F_EXT if (ext := set(req) - ENV_REQ_KEYS) else flags, req['mid'], len(strs))
+
+        return b''.join((head, strs, json_dumps({k: req[k] for k in ext}, separators=(',', ':')).encode())) if ext else head + strs
+
+    @staticmethod
+    def loads_req(buf: bytes) -> dict[str, JSONType]:
+        """Decode binary or JSON request, binary requests get 'env' set since they imply support."""
+
+        if buf[0] != ENV_VERSION:
+            return json_loads(buf)
+
+        _, flags, mid, nstrs = ENV_REQ.unpack_from(buf)
+        cid, uid             = buf[(off := ENV_REQ.size) : (off := off + nstrs)].decode().split('\0')
+        req                  = {'cid': cid, 'mid': mid, 'env': ENV_VERSION}
+
+        if uid:
+            req['uid'] = uid
+
+        if eph := (flags & ENV_F_EPH) >> 3:
+            req['eph'] = eph
+
+        if flags & ENV_F_NEW:
+            req['new'] = True
+
+        if flags & ENV_F_EXT:
+            req.update(json_loads(buf[off:]))
+
+        return req
 
 
 class ZMQSender:
@@ -154,22 +777,35 @@ class ZMQSender:
         client_id: str
         pull:      zmq.Socket
         t_last:    int
-        requested: bool
+        credit:    int              # number of messages which may still be sent to this client
         ephemeral: int
         prev_id:   int
+        sent:      tuple[tuple[int, int], ...]  # ((msg_id, t_sent), ...) sent to this client after prev_id, not acknowledged yet
+        route:     bytes | None     # ROUTER routing id for clients on 'router+' binds
+        svc:       float = 0        # measured service time per message in ms (moving average), 0 if not known yet
+        t_ack:     int = 0          # time of last request which acknowledged a sent message
+
+        @property
+        def load(self) -> float:  # expected time in ms until a message sent now would be done
+            return self.svc * (len(self.sent) + 1)
 
     def __init__(self,
-        addrs_bind:    str | list[str] | None = None,
+        addrs_bind:    str | list[str | tuple[str, str | None]] | None = None,
         server_id:     str | None = None,
         message_oob:   Callable[[ZMQMessage], None] | None = None,
         balance:       bool = False,
         outs_required: list[str] | None = None,
+        zero_copy:     bool = False,
+        waker:         ZMQWaker | None = None,
+        on_drop:       Callable[[str, str | None, int], None] | None = None,
     ):
         """Publisher of messages (upon request) to possibly multiple clients at multiple bind addresses.
 
         Args:
             addrs_bind: Single or list of strings of bind addresses to listen on, forms can take:
-                "tcp://*", "tcp:127.0.0.1:5552", "ipc://./pipe_in_cwd", "ipc:///abs_path/subdir/pipe"
+                "tcp://*", "tcp:127.0.0.1:5552", "ipc://./pipe_in_cwd", "ipc:///abs_path/subdir/pipe", "inproc://name"
+                Or (address, variant) tuples, everyone subscribing to plain topics on such a bind gets that delivery
+                variant of them instead (not possible on 'router+' binds).
 
             server_id: String ID for this server, if None then will be random string each time.
 
@@ -178,25 +814,78 @@ class ZMQSender:
             message_oob: Optional callback for out-of-band messages.
 
             balance: Whether to send messages round-robin across connections for load balancing or not.
+                Independently of this, each message on a 'router+' bind goes to just one of its clients.
+
+            zero_copy: Hand large message part buffers to zeromq without copying them. The caller must not modify those
+                buffers after send (zeromq may still be reading them), so only pass immutable data in this mode.
+
+            waker: Optional ZMQWaker which makes a waiting send() return None immediately when woken.
+
+            on_drop: Optional callback for messages which are discarded, called with (reason, topic, count).
         """
 
         self.server_id     = server_id or rndstr(8, 64)
         self.message_oob   = (lambda l: None) if message_oob is None else message_oob
         self.balance       = balance
         self.outs_required = outs_required or []
+        self.zero_copy     = zero_copy
+        self.waker         = waker
+        self.on_drop       = (lambda r, t, n: None) if on_drop is None else on_drop
         self.clients       = {}  # {'full_id': Client, ...}
+        self.stats         = {}  # {'client_id': ZMQLinkStats, ...}
+        self.env_clients   = set()  # {'full_id', ...} of clients which negotiated binary envelope
+        self.env_subs      = {}     # {XPUB Socket: number of binary envelope marker subscriptions, ...} as of the last update_subs()
+        self.pub_peers     = pub_peers = {}  # {XPUB Socket: [monitor Socket, number of connections], ...} not 'inproc://' or routers
+        self.cmp_clients   = {}     # {'full_id': ['codec', ...], ...} of clients which asked for data compression
         self.min_send_id   = MSG_ID_INITIAL
         self.pull2addr     = pull2addr = {}  # {PULL Socket: 'addr', ...}
+        self.pub2shm       = pub2shm = {}    # {PUB Socket: ZMQShmRing, ...} for 'shm://' binds
+        self.routers       = routers = set()  # {ROUTER Socket, ...} for 'router+' binds, in both pulls and pubs
+        self.subs          = subs = {}  # {XPUB Socket: {b'prefix', ...}, ...} current downstream subscriptions, not routers
+        self.sub_prefixes  = ()    # (b'prefix', ...) of all the plain subs, as of the last update_subs()
+        self.sub_variants  = {}    # {'variant': (b'prefix', ...), ...} subs to delivery variants, without the variant
+        self.pub_variants  = pub_variants = {}  # {XPUB Socket: 'variant', ...} delivery variant plain subscribers get
+        self.sub_topics    = None  # {'topic', ...} subscribed downstream or None if all topics, as of the last update_subs()
+        self.connects      = 0     # count of client connections (and subscribes) so far, for whoever needs to know about newcomers
+        self.tcp_pubs      = tcp_pubs = set()  # {PUB Socket, ...} for 'tcp://' binds, only these compress
+        self.inproc_pubs   = inproc_pubs = set()  # {PUB Socket, ...} for 'inproc://' binds, messages go by reference
+        self.inproc        = None  # ZMQInprocStore, if there are any 'inproc://' binds
         context            = ZMQContext.get()
         self.pulls         = pulls  = []
         self.pubs          = pubs   = []
         self.poller        = poller = zmq.Poller()
 
         for addr_bind in ('tcp://*',) if addrs_bind is None else (addrs_bind,) if isinstance(addrs_bind, str) else addrs_bind:
-            pulls.append(pull := context.socket(zmq.PULL))
-            pubs.append(pub := context.socket(zmq.PUB))
+            addr_bind, variant = (addr_bind, None) if isinstance(addr_bind, str) else addr_bind
+
+            if variant is not None and (not variant or VARIANT_DELIM in variant or TOPIC_DELIM in variant):
+                raise ValueError(f'invalid delivery variant {variant!r}')
+
+            if routed := addr_bind.startswith(ROUTER_PREFIX):
+                if variant is not None:
+                    raise ValueError(f'router binds can not have a delivery variant like {addr_bind!r}')
+
+                pull = pub = context.socket(zmq.ROUTER)  # one socket for requests and messages
+
+                routers.add(pub)
+                pub.setsockopt(zmq.ROUTER_HANDOVER, 1)  # reconnecting client takes over its routing id
+
+            else:
+                pull = context.socket(zmq.PULL)
+                pub  = context.socket(zmq.XPUB)  # we read the subscriptions, see subscribed()
+
+                pub.setsockopt(zmq.XPUB_VERBOSE, 1)  # every subscribe, so that we see '??' listeners connect, see update_subs()
+
+                subs[pub] = set()
+
+                if variant is not None:
+                    pub_variants[pub] = variant
+
+            pulls.append(pull)
+            pubs.append(pub)
 
             pull2addr[pull] = addr_bind
+            addr_bind       = addr_bind.removeprefix(ROUTER_PREFIX)
 
             if addr_bind.startswith('tcp://'):
                 host, port = TCP_RE_ADDR.match(addr_bind).groups()
@@ -204,10 +893,24 @@ class ZMQSender:
                 pull_addr  = f'{host}:{port + 1}'
                 pub_addr   = f'{host}:{port}'
 
+                tcp_pubs.add(pub)
+
             elif addr_bind.startswith('ipc://'):
                 pull_addr = f'{addr_bind}{IPC_REQREP_SUFFIX}'
                 pub_addr  = f'{addr_bind}{IPC_PUBSUB_SUFFIX}'
 
+            elif addr_bind.startswith('shm://'):
+                pull_addr    = f'ipc://{addr_bind[6:]}{IPC_REQREP_SUFFIX}'
+                pub_addr     = f'ipc://{addr_bind[6:]}{IPC_PUBSUB_SUFFIX}'
+                pub2shm[pub] = ZMQShmRing(f'openfilter-{sanitize_filename(os.path.abspath(addr_bind[6:]))}')
+
+            elif addr_bind.startswith('inproc://'):
+                pull_addr   = f'{addr_bind}{IPC_REQREP_SUFFIX}'
+                pub_addr    = f'{addr_bind}{IPC_PUBSUB_SUFFIX}'
+                self.inproc = self.inproc or ZMQInprocStore()
+
+                inproc_pubs.add(pub)
+
             else:
                 raise ValueError(f'invalid bind address {addr_bind!r}')
 
@@ -217,28 +920,124 @@ class ZMQSender:
             pub.setsockopt(zmq.RECONNECT_IVL_MAX, ZMQ_RECONNECT_IVL_MAX)
             pub.bind(pub_addr)
 
-            # pull.setsockopt(zmq.LINGER, 0)
-            pull.setsockopt(zmq.RECONNECT_IVL, ZMQ_RECONNECT_IVL)
-            pull.setsockopt(zmq.RECONNECT_IVL_MAX, ZMQ_RECONNECT_IVL_MAX)
-            pull.bind(pull_addr)
+            if not routed and pub not in inproc_pubs:  # count connections to know if there is anyone not subscribed to ENV_SUB
+                pub_peers[pub] = [pub.get_monitor_socket(zmq.EVENT_ACCEPTED | zmq.EVENT_DISCONNECTED), 0]
+
+            if not routed:
+                # pull.setsockopt(zmq.LINGER, 0)
+                pull.setsockopt(zmq.RECONNECT_IVL, ZMQ_RECONNECT_IVL)
+                pull.setsockopt(zmq.RECONNECT_IVL_MAX, ZMQ_RECONNECT_IVL_MAX)
+                pull.bind(pull_addr)
 
             poller.register(pull, zmq.POLLIN)
 
-            logger.info(f'sender {server_id}: publishing on {pub_addr}, listening on {pull_addr}')
+            logger.info(f'sender {server_id}: ' + (f'routing on {pub_addr}' if routed else
+                f'publishing on {pub_addr}, listening on {pull_addr}'))
+
+        if waker is not None:
+            poller.register(waker.fd, zmq.POLLIN)
+
+    def update_subs(self):
+        """Take in the subscription changes which came in on our XPUBs. We get every subscribe (XPUB_VERBOSE) but only
+        the last unsubscribe of each prefix. A subscribe counts as a connect because doubly ephemeral '??' listeners
+        never request anything so this is the only way to know about them (e.g. to send them a delta keyframe). The
+        ENV_SUB marker subscriptions and the connection counts are taken in here as well, see env_binary()."""
+
+        for mon_peers in self.pub_peers.values():
+            while True:
+                try:
+                    event = recv_monitor_message(mon_peers[0], zmq.NOBLOCK)['event']
+                except zmq.Again:
+                    break
+
+                mon_peers[1] += 1 if event == zmq.EVENT_ACCEPTED else -1
+
+        for pub, prefixes in self.subs.items():
+            while True:
+                try:
+                    sub = pub.recv(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+
+                if sub[:1] == b'\x01':
+                    prefixes.add(sub[1:])
+
+                    self.connects += 1
+                elif sub[:1] == b'\x00':
+                    prefixes.discard(sub[1:])
+
+        plain    = set()
+        variants = {}  # {'variant': {b'prefix', ...}, ...}
+        env_subs = self.env_subs
+
+        for pub, pprefixes in self.subs.items():
+            env_subs[pub] = 0
+
+            for prefix in pprefixes:
+                if prefix.startswith(ENV_SUB_B):
+                    env_subs[pub] += 1
+                elif not prefix.startswith(VARIANT_DELIM_B):
+                    if (variant := self.pub_variants.get(pub)) is None:
+                        plain.add(prefix)
+                    else:  # plain subscribers here get the variant of the bind
+                        variants.setdefault(variant, set()).add(prefix)
+                elif (end := prefix.find(VARIANT_DELIM_B, 1)) != -1:  # otherwise some partial prefix we can not send to
+                    variants.setdefault(prefix[1 : end].decode(), set()).add(prefix[end + 1:])
+
+        prefixes          = [*plain, *(prefix for vprefixes in variants.values() for prefix in vprefixes)]
+        self.sub_prefixes = tuple(plain)
+        self.sub_variants = {variant: tuple(vprefixes) for variant, vprefixes in variants.items()}
+        self.sub_topics   = None if self.routers or b'' in prefixes or TOPIC_DELIM_B in prefixes else \
+            {p[p.startswith(TOPIC_DELIM_B) : -1].decode() for p in prefixes if p != TOPIC_DELIM_B2}
+
+    def subscribed(self, topic: str) -> bool:
+        """Whether anyone downstream is subscribed to `topic`, as of the last send(). Clients of 'router+' binds are
+        always subscribed to everything."""
+
+        return bool(self.routers) or topic_key(topic).startswith(self.sub_prefixes)
+
+    def variants(self, topic: str) -> list[str]:
+        """The delivery variants of `topic` somebody downstream is subscribed to, as of the last send(). These go out as
+        topics '!variant!topic' alongside (or instead of) plain `topic`."""
+
+        key = topic_key(topic)
+
+        return [variant for variant, prefixes in self.sub_variants.items() if key.startswith(prefixes)]
+
+    @property
+    def downstream_current(self) -> bool:
+        """Whether every connection downstream is a receiver of this envelope version (subscribed to an ENV_SUB marker),
+        as of the last update_subs(). Clients of 'router+' and 'inproc://' binds always are."""
+
+        return all(mon_peers[1] <= self.env_subs.get(pub, 0) for pub, mon_peers in self.pub_peers.items())
+
+    @property
+    def inproc_only(self) -> bool:
+        """Whether all binds are 'inproc://', in which case message parts may be any objects, not just bytes."""
+
+        return len(self.inproc_pubs) == len(self.pubs)
+
+    def link_metrics(self) -> dict[str, float]:
+        """Link statistics of each downstream client_id as flat metrics 'out_{client_id}_...', see ZMQLinkStats."""
+
+        return {n: v for client_id, stats in list(self.stats.items()) for n, v in stats.metrics(f'out_{client_id}').items()}
 
     def destroy(self):
         msg_close = [TOPIC_DELIM_B2, json_dumps({'sid': self.server_id, 'mid': MSG_ID_CLOSE}, separators=(',', ':')).encode()]  # courtesy inform connection close
 
-        for pub in self.pubs:
-            pub.send_multipart(msg_close)
+        self.publish(msg_close)
 
         sleep(ZMQ_EXPLICIT_LINGER / 1000)
 
         for pull, pub in zip(self.pulls, self.pubs):
+            if (mon_peers := self.pub_peers.get(pub)) is not None:
+                pub.disable_monitor()
+                mon_peers[0].close()
+
             pub.close()
             pull.close()
 
-            if (addr_bind := self.pull2addr[pull]).startswith('ipc://'):
+            if (addr_bind := self.pull2addr[pull].removeprefix(ROUTER_PREFIX)).startswith('ipc://') or addr_bind.startswith('shm://'):
                 fnm = addr_bind[6:]
 
                 try:
@@ -251,6 +1050,12 @@ class ZMQSender:
                 except Exception:
                     pass
 
+        for ring in self.pub2shm.values():
+            ring.destroy()
+
+        if self.inproc is not None:
+            self.inproc.destroy()
+
         ZMQContext.free()
 
     def send_oob(self, msg: ZMQMessage):
@@ -260,8 +1065,7 @@ class ZMQSender:
         if DEBUG_ZEROMQ:
             logger.debug(f'send msg OOB to {", ".join(c.client_id for c in self.clients.values())}: {str(msg[0])[:50]}')
 
-        for pub in self.pubs:
-            pub.send_multipart(msg_)
+        self.publish(msg_)
 
     def send(self,
         topicmsgs: dict[str, ZMQMessage] | Callable[[], dict[str, ZMQMessage]],
@@ -290,7 +1094,8 @@ class ZMQSender:
                 with a message id number in the `state` for the next message that can be sent successfully.
 
             timeout:
-                Timeout in milliseconds or None if no timeout. If the send times out then None is returned.
+                Timeout in milliseconds or None if no timeout. If the send times out (or our `waker` is woken while
+                waiting) then None is returned.
 
             push: If True then will publish message regardless of connections or synchronization. Needless to say this
                 breaks the synchronization mechanism and is only meant for channels where receivers only listen, like
@@ -307,6 +1112,8 @@ class ZMQSender:
 
         else:
             if (msg_id := state.msg_id) < self.min_send_id:
+                self.drop_outdated(topicmsgs)
+
                 return ZMQStateRecv(self.min_send_id)  # ZMQState for ZMQReceiver
 
             balanced = state.balanced
@@ -314,18 +1121,21 @@ class ZMQSender:
         server_id = self.server_id
         balance   = self.balance
         clients   = self.clients
-        poller    = self.poller
+        waker     = self.waker
+        poll      = ZMQWaker.poll_func(self.poller, waker)
         do_send   = False
         do_hello  = False
         outputs   = None
+        t_call    = 0      # when send() started waiting, after taking in requests which were already waiting
+        credited0 = set()  # {'full_id', ...} clients which had credit at t_call, so did not make us wait
 
         def poll_recv(poll_timeout: int | None) -> bool | None:
-            nonlocal do_send, do_hello, outputs
+            nonlocal do_hello
 
             ret = False
 
             while True:  # this loop only exists to potentially soak up all pending NEW connection requests so that only one HELLO message is queued, otherwise any other received message returns
-                if not (socks := poller.poll(poll_timeout)):
+                if not (socks := poll(poll_timeout)):  # when woken this returns nothing immediately, like a timeout
                     return ret
 
                 pull, flags = socks[0]
@@ -333,15 +1143,29 @@ class ZMQSender:
                 if flags != zmq.POLLIN:
                     raise RuntimeError(f'unexpected poll flags {flags}')
 
-                msg = pull.recv_multipart()
+                msg   = pull.recv_multipart()
+                route = msg.pop(0) if pull in self.routers else None  # ROUTER prepends routing id of client
 
-                env       = json_loads(msg[0].decode())
+                env       = ZMQEnvelope.loads_req(msg[0])
                 client_id = env['cid']
                 full_id   = client_id + env.get('uid', '')
                 prev_id   = env['mid']
                 ephemeral = env.get('eph', 0)
                 t         = time_ns() // 1_000_000  # ns -> ms
 
+                if (rel := env.get('rel')) and (ring := self.pub2shm.get(self.pubs[self.pulls.index(pull)])):
+                    ring.release(full_id, rel)
+
+                if env.get('env') == ENV_VERSION and ZMQ_ENVELOPE == 'binary':
+                    self.env_clients.add(full_id)
+                else:
+                    self.env_clients.discard(full_id)
+
+                if cmp := env.get('cmp'):
+                    self.cmp_clients[full_id] = cmp
+                else:
+                    self.cmp_clients.pop(full_id, None)
+
                 if prev_id <= MSG_ID_SPECIAL:
                     if prev_id == MSG_ID_OOB:  # out-of-band message
                         if DEBUG_ZEROMQ:
@@ -353,14 +1177,14 @@ class ZMQSender:
                         logger.debug(f'recv msg CLOSE from {client_id}')
 
                         if full_id in clients:
-                            del clients[full_id]
+                            self.forget_client(full_id)
 
                             logger.info(f'disconnected output: {client_id}  @ {self.pull2addr.get(pull, "???")}  (close)')
 
                     return True
 
                 if full_id not in clients:  # this is because we use two sockets, the request socket may connect before the subscribe socket and a message may be sent before the client is ready, give the subscribe socket some extra time to complete the connection
-                    if ZMQ_CONN_HANDSHAKE and env.get('new'):  # client hasn't received a message from us yet so we can not be sure that the PUB/SUB connection has been established yet
+                    if ZMQ_CONN_HANDSHAKE and env.get('new') and route is None:  # client hasn't received a message from us yet so we can not be sure that the PUB/SUB connection has been established yet, single ROUTER connection doesn't have this problem
                         if DEBUG_ZEROMQ:
                             logger.debug(f'recv msg new conn req from {client_id}')  # DEBUG!
 
@@ -372,9 +1196,26 @@ class ZMQSender:
 
                     logger.info(f'connected output: {client_id}  @ {self.pull2addr.get(pull, "???")}')
 
+                    self.connects += 1
+
                 break
 
-            clients[full_id] = ZMQSender.Client(client_id, pull, t, True, ephemeral, prev_id)
+            if (client := clients.get(full_id)) is None:
+                sent, svc, t_ack = (), 0, 0
+
+            else:
+                sent, svc, t_ack = client.sent, client.svc, client.t_ack
+
+                if acked := [t_sent for i, t_sent in sent if i <= prev_id]:  # service time is from when it could start (sent or previous done) to done
+                    sample = (t - max(acked[0], t_ack)) / len(acked)
+                    svc    = sample if not svc else svc + (sample - svc) * ZMQ_BALANCE_ALPHA
+                    t_ack  = t
+                    sent   = tuple(st for st in sent if st[0] > prev_id)
+
+            floor  = 1 if 'win' not in env or env.get('rty') else 0  # legacy request or retry always gets at least one in case messages were lost
+            credit = 1 if ephemeral else max(floor, env.get('win', 1) - len(sent))
+
+            clients[full_id] = ZMQSender.Client(client_id, pull, t, credit, ephemeral, prev_id, sent, route, svc, t_ack)
 
             if prev_id >= msg_id and not ephemeral:  # if requesting higher frame number than we are sending then discard and return
                 self.min_send_id = min_send_id = prev_id + 1
@@ -384,40 +1225,58 @@ class ZMQSender:
 
                 return None  # this will cause outer function to exit as if message was sent
 
-            t_min      = t - ZMQ_CONN_TIMEOUT
+            return True
+
+        def check_send():  # determine do_send and outputs from current state of clients, they may still have credit from earlier requests
+            nonlocal do_send, outputs
+
+            t_min      = time_ns() // 1_000_000 - ZMQ_CONN_TIMEOUT
             client_ids = set(client.client_id for client in clients.values())
             do_send    = all(client_id in client_ids for client_id in self.outs_required)  # True if there are no required outputsset()
-            outputs    = {}  # {pull: (output specific do_send, # requested, max prev_id), ...}
+            outputs    = {}  # {pull: (output specific do_send, # requested, max prev_id, max load), ...}
+            credited   = False  # at least one client has credit, otherwise only ephemeral clients would send without end
+            routed     = {}     # {ROUTER Socket: any client has credit, ...}
+
+            for full_id, client in list(clients.items()):
+                client_id, pull, t_last, credit, ephemeral, prev_id, _, route, _, _ = client
 
-            for full_id, (client_id, pull, t_last, requested, ephemeral, prev_id) in list(clients.items()):
                 if t_last < t_min:  # if connection timed out then remove it from further consideration
-                    del clients[full_id]
+                    self.forget_client(full_id)
 
                     logger.info(f'disconnected output: {client_id}  @ {self.pull2addr.get(pull, "???")}  (timeout)')
 
-                elif balance:  # if doing this then only one bound output endpoint needs to have all clients requested in order to send to that endpoint only
-                    out_do_send, out_nrequested, out_prev_id = \
-                        (True, 0, MSG_ID_INITIAL_PREV) if (output := outputs.get(pull)) is None else output
+                    continue
+
+                credited = credited or credit > 0
+
+                if balance:  # if doing this then only one bound output endpoint needs to have all clients requested in order to send to that endpoint only
+                    out_do_send, out_nrequested, out_prev_id, out_load = \
+                        (True, 0, MSG_ID_INITIAL_PREV, 0) if (output := outputs.get(pull)) is None else output
 
                     outputs[pull] = (
-                        out_do_send and (requested or ephemeral),
-                        out_nrequested + requested,
+                        out_do_send and (credit > 0 or ephemeral or route is not None),
+                        out_nrequested + (credit > 0),
                         max(out_prev_id, prev_id),
+                        out_load if ephemeral else max(out_load, client.load),
                     )
 
-                elif not requested and not ephemeral:  # if at least one non-ephemeral connection hasn't requested yet then we don't send
+                elif route is not None:  # 'router+' bind only needs one of its clients to have requested
+                    routed[pull] = routed.get(pull, False) or credit > 0
+
+                elif credit <= 0 and not ephemeral:  # if at least one non-ephemeral connection hasn't requested yet then we don't send
                     do_send = False
 
-            if balance and all(not (out_do_send and out_nrequested) for out_do_send, out_nrequested, _ in outputs.values()):
+            if not credited or not all(routed.values()) or (balance and all(not (out_do_send and out_nrequested) for out_do_send, out_nrequested, _, _ in outputs.values())):
                 do_send = False
 
-            return True
-
         def send_maybe() -> bool:
             nonlocal do_hello, topicmsgs
 
             ret = None
 
+            self.update_subs()
+            check_send()
+
             if (not do_send or not clients) and not push:
                 ret = False
 
@@ -434,54 +1293,137 @@ class ZMQSender:
 
                     msg_hello = [TOPIC_DELIM_B2, json_dumps({'sid': self.server_id, 'mid': MSG_ID_HELLO}, separators=(',', ':')).encode()]
 
-                    for pub in self.pubs:
-                        pub.send_multipart(msg_hello)
+                    self.publish(msg_hello, [pub for pub in self.pubs if pub not in self.routers])  # routers don't need it
 
             if ret is not None:
                 return ret
 
             if balance:
-                _, out_pull = min([(out_prev_id, out_pull)  # get the output with the oldest max prev_id across its clients
-                        for out_pull, (out_do_send, out_nrequested, out_prev_id) in outputs.items()
-                        if out_do_send and out_nrequested
-                    ], key=lambda o: o[0]
-                )
+                out_pull = ZMQSender.least_loaded([(out_load, out_prev_id, out_pull)  # get the output which would be done soonest, or the oldest max prev_id across its clients if about the same
+                    for out_pull, (out_do_send, out_nrequested, out_prev_id, out_load) in outputs.items()
+                    if out_do_send and out_nrequested
+                ])
 
                 pubs        = [self.pubs[self.pulls.index(out_pull)]]
-                pub_clients = [(full_id, (client_id, pull, t_last, _, ephemeral, prev_id))
-                    for full_id, (client_id, pull, t_last, _, ephemeral, prev_id) in clients.items()
-                    if pull is out_pull
-                ]
+                pub_clients = [(full_id, client) for full_id, client in clients.items() if client.pull is out_pull]
 
             else:
                 pubs        = self.pubs
                 pub_clients = list(clients.items())
 
-            for full_id, (client_id, pull, t_last, _, ephemeral, prev_id) in pub_clients:  # mark all as sent so they don't trigger another send until requested again
-                clients[full_id] = ZMQSender.Client(client_id, pull, t_last, False, ephemeral, prev_id)
+            routes = {}  # {ROUTER Socket: [routing id, ...], ...} the one client each router sends to (all if push)
+
+            if routers := self.routers.intersection(pubs):
+                pub_clients = [(full_id, client) for full_id, client in pub_clients if client.route is None] + \
+                    [route_client for router in routers for route_client in self.route_clients(router, push)]
+
+                for full_id, client in pub_clients:
+                    if client.route is not None:
+                        routes.setdefault(client.pull, []).append(client.route)
+
+                pubs = [pub for pub in pubs if pub not in routers or pub in routes]
+
+            t_send = time_ns() // 1_000_000
+
+            for full_id, client in pub_clients:  # use up credit so they don't trigger another send until requested again
+                clients[full_id] = client._replace(credit=client.credit - 1,
+                    sent=client.sent if client.ephemeral else (*client.sent, (msg_id, t_send)))
 
             if DEBUG_ZEROMQ:
                 logger.debug(f'send msg {msg_id} to ({", ".join(clt[0] for _, clt in pub_clients)}): ({", ".join(topicmsgs)}){"  - push" if push else ""}')
 
-            env = {'sid': server_id, 'mid': msg_id, 'topics': list(topicmsgs)}
+            env = {'sid': server_id, 'mid': msg_id, 'topics': ZMQSender.plain_topics(topicmsgs)}
 
             if balance or balanced:
                 env['bal'] = balance or balanced + 1  # increment balanced index if that is coming from upstream
 
-            msg_topics = [TOPIC_DELIM_B2, json_dumps(env, separators=(',', ':')).encode()]
+            env_rtr     = {**env, 'bal': env.get('bal', balanced + 1)} if routes else None  # routers always balance
+            shm_pubs    = {}  # {PUB Socket: (ZMQShmRing, {'full_id', ...} clients which will hold the slots), ...}
+            bin_pubs    = {pub: self.env_binary(pub) for pub in pubs}  # {PUB Socket: bool use binary envelope, ...}
+            env_bin     = ZMQEnvelope(server_id, env['topics']) if any(bin_pubs.values()) else None
+            cmp_pubs    = {pub: self.pub_codec(pub) for pub in pubs}  # {PUB Socket: 'codec' or None, ...}
+            dumps       = lambda env, binary: env_bin.dumps(env) if binary else json_dumps(env, separators=(',', ':')).encode()
+            copy        = not self.zero_copy  # pyzmq still copies small parts regardless, below zmq.COPY_THRESHOLD
+            pub_nbytes  = dict.fromkeys(pubs, 0)  # {PUB Socket: bytes published for each client, ...}
+            inproc_pubs = self.inproc_pubs
+            pvariants   = self.pub_variants
+            nbytes      = ZMQLinkStats.msg_nbytes
+
+            for pub in pubs:
+                if (ring := self.pub2shm.get(pub)) is not None:
+                    pub_pull      = self.pulls[self.pubs.index(pub)]
+                    shm_pubs[pub] = (ring, {full_id for full_id, clt in pub_clients if clt[1] is pub_pull})
 
             for topic, msg in topicmsgs.items():
                 env['xtra'] = msg[0]
-                topic       = f'{"" if topic.startswith("_") else TOPIC_DELIM}{topic}{TOPIC_DELIM}'.encode()
-                msg         = [topic, json_dumps(env, separators=(',', ':')).encode(), *msg[1:]]
+                tkey        = topic_key(topic)
+                envs        = {}  # {(binary, routed, codec): b'envelope', ...}, each kind is encoded at most once for all pubs
+                cmps        = {}  # {'codec': compressed msg or None, ...}, likewise compressed at most once
+                obj         = None  # key of msg in the ZMQInprocStore, stored at most once for all 'inproc://' pubs
+
+                if env_rtr is not None:
+                    env_rtr['xtra'] = msg[0]
 
                 for pub in pubs:
-                    pub.send_multipart(msg)
+                    binary = bin_pubs[pub]
+                    penv   = env if (rts := routes.get(pub)) is None else env_rtr
+                    pmsg   = msg
+                    pkey   = tkey
+
+                    if (pvariant := pvariants.get(pub)) is not None:  # plain subscribers here get the variant instead
+                        if not topic.startswith(VARIANT_DELIM):
+                            if f'{VARIANT_DELIM}{pvariant}{VARIANT_DELIM}{topic}' in topicmsgs:
+                                continue
+                        elif topic.startswith(pvprefix := f'{VARIANT_DELIM}{pvariant}{VARIANT_DELIM}'):
+                            pkey = tkey[len(pvprefix.encode()):]
+
+                    if (codec := cmp_pubs[pub]) is not None:
+                        if (cmsg := cmps.get(codec, False)) is False:
+                            cmsg = cmps[codec] = ZMQSender.compress_msg(msg, codec)
+
+                        if cmsg is None:
+                            codec = None
+                        else:
+                            pmsg = cmsg
+                            penv = {**penv, 'cmp': codec}
+
+                    if pub in inproc_pubs:  # by reference, only the key goes on the socket
+                        if obj is None:
+                            obj = self.inproc.put(msg)
+
+                        ZMQSender.pub_send(pub, rts, parts := [pkey, dumps({**penv, 'obj': obj}, binary)])
+
+                    elif (shm_pub := shm_pubs.get(pub)) is None or (shm := ZMQSender.shm_msg(msg, *shm_pub)) is None:
+                        if (env_ := envs.get(key := (binary, rts is not None, codec))) is None:
+                            env_ = envs[key] = dumps(penv, binary)
+
+                        ZMQSender.pub_send(pub, rts, parts := [pkey, env_, *pmsg[1:]], copy)
+
+                    else:
+                        ZMQSender.pub_send(pub, rts, parts := [pkey, dumps({**penv, 'shm': shm[0]}, binary), *shm[1]])
+
+                    pub_nbytes[pub] += nbytes(parts)
+
+            env.pop('xtra', None)
+
+            if env_rtr is not None:
+                env_rtr.pop('xtra', None)
 
             for pub in pubs:  # publish heartbeat / topics informative message
-                pub.send_multipart(msg_topics)
+                ZMQSender.pub_send(pub, rts := routes.get(pub), [TOPIC_DELIM_B2, dumps(env if rts is None else env_rtr, bin_pubs[pub])])
 
             self.min_send_id = msg_id + 1
+            stats            = self.stats
+
+            for full_id, client in pub_clients:
+                if (client_stats := stats.get(client_id := client.client_id)) is None:
+                    client_stats = stats[client_id] = ZMQLinkStats()
+
+                client_stats.nbytes += pub_nbytes.get(self.pubs[self.pulls.index(client.pull)], 0)
+
+                if not push and not client.ephemeral:
+                    client_stats.wait = ZMQLinkStats.avg(client_stats.wait,
+                        0 if full_id in credited0 else max(0, client.t_last - t_call))
 
             return True
 
@@ -489,55 +1431,240 @@ class ZMQSender:
             pass
 
         if res is None:  # someone requested larger message id than currently sending, discard and return
+            self.drop_outdated(topicmsgs)
+
             return ZMQStateRecv(self.min_send_id)
 
+        t_call    = time_ns() // 1_000_000
+        credited0 = {full_id for full_id, client in clients.items() if client.credit > 0}
+
         if timeout is None:
             while not send_maybe():  # only after eating up all requests do we check and send if all downstreams requested
+                if waker is not None and waker.is_set:
+                    return None
+
                 if poll_recv(None) is None:
+                    self.drop_outdated(topicmsgs)
+
                     break
 
         else:  # there is a timeout
             t_timeout = time_ns() + timeout * 1_000_000
 
             while not send_maybe():
-                if not (timeout := max(0, t_timeout - time_ns())):
+                if not (timeout := max(0, t_timeout - time_ns())) or (waker is not None and waker.is_set):
                     return None
 
                 if poll_recv(timeout // 1_000_000) is None:
+                    self.drop_outdated(topicmsgs)
+
                     break
 
         return ZMQStateRecv(self.min_send_id)  # ZMQState for ZMQReceiver
 
+    def drop_outdated(self, topicmsgs: dict[str, ZMQMessage] | Callable):
+        if isinstance(topicmsgs, dict):  # a callable was never called so nothing was dropped
+            for topic in ZMQSender.plain_topics(topicmsgs):
+                self.on_drop('outdated', topic, 1)
+
+    @staticmethod
+    def plain_topics(topicmsgs: dict[str, ZMQMessage]) -> list[str]:
+        """The topics of `topicmsgs` with delivery variants '!variant!topic' counting as their plain topic."""
+
+        return list(dict.fromkeys(topic.rsplit(VARIANT_DELIM, 1)[-1] for topic in topicmsgs))
+
+    def publish(self, msg: list, pubs: list[zmq.Socket] | None = None):
+        """Send `msg` to everyone on `pubs` (default all), on routers that is each of their clients."""
+
+        for pub in self.pubs if pubs is None else pubs:
+            if pub not in self.routers:
+                pub.send_multipart(msg)
+
+            else:
+                for client in self.clients.values():
+                    if client.pull is pub:
+                        pub.send_multipart([client.route, *msg])
+
+    def route_clients(self, router: zmq.Socket, push: bool = False) -> list[tuple[str, Client]]:
+        """The [(full_id, Client)] a message on `router` goes to, the client with credit which would be done with it
+        soonest, or none if no client has credit. Or all clients if `push`."""
+
+        route_clients = [(full_id, client) for full_id, client in self.clients.items() if client.pull is router]
+
+        if push:
+            return route_clients
+
+        if not (candidates := [(client.load, (len(client.sent), client.prev_id), (full_id, client))
+                for full_id, client in route_clients if client.credit > 0]):
+            return []
+
+        return [ZMQSender.least_loaded(candidates)]
+
+    @staticmethod
+    def least_loaded(candidates: list[tuple[float, object, object]]) -> object:
+        """From [(load, order, thing), ...] return the thing with the least load. Loads within ZMQ_BALANCE_SLACK ms or
+        half again of the least are considered equal and then the lowest order wins, so clients of about the same speed
+        get round-robin and measurement noise doesn't pile work onto one of them."""
+
+        max_load = (min_load := min(load for load, _, _ in candidates)) + max(ZMQ_BALANCE_SLACK, min_load * 0.5)
+
+        return min((c for c in candidates if c[0] <= max_load), key=lambda c: c[1])[2]
+
+    @staticmethod
+    def pub_send(pub: zmq.Socket, routes: list[bytes] | None, msg: list, copy: bool = True):
+        if routes is None:
+            pub.send_multipart(msg, copy=copy)
+
+        else:
+            for route in routes:
+                pub.send_multipart([route, *msg], copy=copy)
+
+    def env_binary(self, pub: zmq.Socket) -> bool:
+        """Whether to use binary envelopes on `pub`, only if there are clients and all of them negotiated it and every
+        connection there is subscribed to an ENV_SUB marker, otherwise there is someone who may only understand JSON."""
+
+        pull        = self.pulls[self.pubs.index(pub)]
+        env_clients = self.env_clients
+        full_ids    = [full_id for full_id, clt in self.clients.items() if clt.pull is pull]
+
+        if not full_ids or not all(full_id in env_clients for full_id in full_ids):
+            return False
+
+        return (mon_peers := self.pub_peers.get(pub)) is None or mon_peers[1] <= self.env_subs.get(pub, 0)
+
+    def pub_codec(self, pub: zmq.Socket) -> str | None:
+        """The codec to compress data with on `pub`, only on 'tcp://' binds and only if there are clients and all of them
+        asked for compression, the first of ours that all of them understand."""
+
+        if pub not in self.tcp_pubs:
+            return None
+
+        pull        = self.pulls[self.pubs.index(pub)]
+        cmp_clients = self.cmp_clients
+        codecs      = None
+
+        for full_id, clt in self.clients.items():
+            if clt.pull is pull:
+                if (clt_codecs := cmp_clients.get(full_id)) is None:
+                    return None
+
+                codecs = set(clt_codecs) if codecs is None else codecs & set(clt_codecs)
+
+        return None if not codecs else next((codec for codec in CODECS if codec in codecs), None)
+
+    @staticmethod
+    def compress_msg(msg: ZMQMessage, codec: str) -> ZMQMessage | None:
+        """Return `msg` with its data part (the last part, after the image if there is one) compressed with `codec`, or
+        None if there is no data part or it is too small or doesn't get smaller."""
+
+        if len(msg) <= 1 + (isinstance(xtra := msg[0], dict) and 'img' in xtra):
+            return None
+
+        if (size := memoryview(data := msg[-1]).nbytes) < ZMQ_COMPRESS_MIN or len(cdata := CODECS[codec][0](data)) >= size:
+            return None
+
+        return [*msg[:-1], cdata]
+
+    def forget_client(self, full_id: str):
+        """Remove a client which closed or timed out and everything kept for it, its link stats once no other
+        connection with the same client_id remains."""
+
+        client_id = self.clients.pop(full_id).client_id
+
+        self.shm_release(full_id)
+        self.env_clients.discard(full_id)
+        self.cmp_clients.pop(full_id, None)
+
+        if all(client.client_id != client_id for client in self.clients.values()):
+            self.stats.pop(client_id, None)
+
+    def shm_release(self, full_id: str):
+        for ring in self.pub2shm.values():
+            ring.release(full_id)
+
+    @staticmethod
+    def shm_msg(msg: ZMQMessage, ring: ZMQShmRing, holders: set[str]) -> tuple[list, list] | None:
+        """Put large parts of `msg` into shared memory slots and return the envelope 'shm' refs and the parts to send
+        after the envelope, or None if nothing was put into shared memory."""
+
+        refs  = []
+        parts = []
+
+        for part in msg[1:]:
+            if memoryview(part).nbytes < ZMQ_SHM_MIN_SIZE or (ref := ring.put(part, holders)) is None:
+                refs.append(None)
+                parts.append(part)
+
+            else:
+                refs.append(ref)
+                parts.append(b'')
+
+        if not any(refs):
+            return None
+
+        return refs, parts
+
 
 class ZMQReceiver:
     class Sender:
-        def __init__(self, context: zmq.Context, addr_connect: str, topics: list[tuple[str, str]] | None, client_id: str):
+        def __init__(self, context: zmq.Context, addr_connect: str, topics: list[tuple[str, str]] | None, client_id: str,
+                codecs: list[str] = (), variant: str | None = None):
             if (ephemeral := addr_connect.endswith('?') + addr_connect.endswith('??')):
                 addr_connect = addr_connect.rstrip('? ')
 
+            if (routed := addr_connect.startswith(ROUTER_PREFIX)) and ephemeral == 2:
+                raise ValueError(f"router sources can not be doubly ephemeral '??' like {addr_connect!r}")
+            if routed and variant is not None:
+                raise ValueError(f"router sources can not ask for a delivery variant like {addr_connect!r}")
+            if variant is not None and (not variant or VARIANT_DELIM in variant or TOPIC_DELIM in variant):
+                raise ValueError(f'invalid delivery variant {variant!r}')
+
             self.ephemeral   = ephemeral
+            self.routed      = routed
             self.addr        = addr_connect
-            self.push        = push = context.socket(zmq.PUSH) if ephemeral < 2 else None
-            self.sub         = sub  = context.socket(zmq.SUB)
+            self.push        = push = context.socket(zmq.DEALER if routed else zmq.PUSH) if ephemeral < 2 else None
+            self.sub         = sub  = push if routed else context.socket(zmq.SUB)  # DEALER does both for routers
+            self.prefixes    = () if routed else None  # (b'topic prefix', ...) subscriptions to filter on ourselves for DEALER
+            self.vkey        = b'' if variant is None else f'{VARIANT_DELIM}{variant}{VARIANT_DELIM}'.encode()  # delivery variant key prefix
             self.conn        = False  # if the server is "connected" or not
             self.server_id   = None
             self.unique_id   = rndstr(12, 64)  # unique id for connection because otherwise upstream has no way to differentiate between clients with same client_id on same requestor socket
-            self.min_recv_id = MSG_ID_INITIAL  # this is only used by ephemeral channels individually, synchronized channels have a shared global value
+            self.min_recv_id = MSG_ID_INITIAL  # this is only used by ephemeral and reordered balanced channels individually, synchronized channels have a shared global value
+            self.ack_id      = MSG_ID_INITIAL_PREV  # last complete msg_id from this sender, for requests of reordered balanced channels
+            self.shm         = None            # ZMQShmReader, created on first shared memory message
+            self.env_bin     = False           # sender has sent us binary envelopes so we send binary requests
+            self.env_cache   = [b'', None, None]  # last decoded binary envelope strings, see ZMQEnvelope.loads()
+            self.codecs      = None            # ['codec', ...] data compression to ask for, only on 'tcp://'
+            self.stats       = ZMQLinkStats()
+            self.t_req       = None  # time of first request not answered by a message yet, for round trip
+            self.t_got       = None  # time last message arrived during current recv(), for wait
+            self.left_out    = False  # a delivery variant (or aggregated metrics) left out some topics of the current message
             self.init_recvd  = lambda msg, topic, topics: {t: msg if t == topic else None for t in topics if not t.startswith('_')}  # subscribed to lowercase all so we don't include '_' prefix hidden topics
 
-            if addr_connect.startswith('tcp://'):
-                host, port = TCP_RE_ADDR.match(addr_connect).groups()
+            if (addr := addr_connect.removeprefix(ROUTER_PREFIX)).startswith('tcp://'):
+                host, port = TCP_RE_ADDR.match(addr).groups()
                 port       = TCP_DEFAULT_PORT if not port else int(port)
                 push_addr  = f'{host}:{port + 1}'
                 sub_addr   = f'{host}:{port}'
 
-            elif addr_connect.startswith('ipc://'):
-                push_addr = f'{addr_connect}{IPC_REQREP_SUFFIX}'
-                sub_addr  = f'{addr_connect}{IPC_PUBSUB_SUFFIX}'
+                self.codecs = list(codecs) or None
+
+            elif addr.startswith('ipc://') or addr.startswith('shm://'):
+                push_addr = f'ipc://{addr[6:]}{IPC_REQREP_SUFFIX}'
+                sub_addr  = f'ipc://{addr[6:]}{IPC_PUBSUB_SUFFIX}'
+
+            elif addr.startswith('inproc://'):
+                push_addr = f'{addr}{IPC_REQREP_SUFFIX}'
+                sub_addr  = f'{addr}{IPC_PUBSUB_SUFFIX}'
 
             else:
                 raise ValueError(f'invalid bind address {addr_connect!r}')
 
+            if routed:  # single connection to the ROUTER at the PUB address, stable routing id across reconnects
+                push.setsockopt(zmq.ROUTING_ID, self.unique_id.encode())
+
+                push_addr = sub_addr
+
             if ephemeral < 2:  # doubly ephemeral doesn't even bother with request socket
                 push.setsockopt(zmq.SNDHWM, ZMQ_PUSH_HWM)
                 push.setsockopt(zmq.LINGER, 0)
@@ -545,18 +1672,25 @@ class ZMQReceiver:
                 push.setsockopt(zmq.RECONNECT_IVL_MAX, ZMQ_RECONNECT_IVL_MAX)
                 push.connect(push_addr)
 
-            # sub.setsockopt(zmq.LINGER, 0)
-            sub.setsockopt(zmq.RECONNECT_IVL, ZMQ_RECONNECT_IVL)
-            sub.setsockopt(zmq.RECONNECT_IVL_MAX, ZMQ_RECONNECT_IVL_MAX)
-            sub.connect(sub_addr)
+            if not routed:
+                # sub.setsockopt(zmq.LINGER, 0)
+                sub.setsockopt(zmq.RECONNECT_IVL, ZMQ_RECONNECT_IVL)
+                sub.setsockopt(zmq.RECONNECT_IVL_MAX, ZMQ_RECONNECT_IVL_MAX)
+                sub.connect(sub_addr)
 
             # from zmq import ssh
             # ssh.tunnel_connection(push, push_addr, "ubuntu@141.148.71.212")  # if want to do automatic ssh tunnel in future
 
-            logger.info(f'receiver {client_id}: subscribed on {sub_addr}{f", requesting on {push_addr}" if ephemeral < 2 else ""}')
+            logger.info(f'receiver {client_id}: ' + (f'routed from {sub_addr}' if routed else
+                f'subscribed on {sub_addr}{f", requesting on {push_addr}" if ephemeral < 2 else ""}'))
+
+            vkey = self.vkey.decode()
 
             if (topic_is_none := topics is None) or topics == [('*', '*')]:
-                sub.setsockopt_string(zmq.SUBSCRIBE, TOPIC_DELIM if topic_is_none else '')  # all messages starting with TOPIC_DELIM if not '*' else EVERYTHING
+                self.subscribe(vkey + (TOPIC_DELIM if topic_is_none else ''))  # all messages starting with TOPIC_DELIM if not '*' else EVERYTHING
+
+                if vkey:
+                    self.subscribe(TOPIC_DELIM2)  # the variant prefix doesn't cover the heartbeats
 
                 self.recvd_new = None
                 self.topic_map = {}
@@ -565,17 +1699,43 @@ class ZMQReceiver:
                     self.init_recvd = lambda msg, topic, topics: {t: msg if t == topic else None for t in topics}  # subscribed to "*" ALL so include EVERYTHING
 
             else:
-                sub.setsockopt_string(zmq.SUBSCRIBE, TOPIC_DELIM2)  # only for getting the published topics and heartbeats for sent empty messages
+                self.subscribe(TOPIC_DELIM2)  # only for getting the published topics and heartbeats for sent empty messages
 
                 for src, dst in topics:
                     if '*' in src or '*' in dst:
                         raise ValueError(f'invalid use of * wildcard in topic map {((src, dst))}')
 
-                    sub.setsockopt_string(zmq.SUBSCRIBE, (src if src.startswith('_') else TOPIC_DELIM + src) + TOPIC_DELIM)
+                    self.subscribe(vkey + (src if src.startswith('_') else TOPIC_DELIM + src) + TOPIC_DELIM)
 
                 self.recvd_new = {src: None for src, _ in topics}
                 self.topic_map = dict(topics)
 
+            if not routed:
+                self.subscribe(ENV_SUB + self.unique_id)  # tells the sender this connection understands ENV_VERSION
+
+        def add_data(self, data: dict[str, ZMQMessage]):
+            """Add received messages to `data` under their mapped topics. A 'box' in the xtra of a message references
+            another topic of the same message by name (see MQ crops) so that is mapped as well, to None if that topic
+            was not subscribed to."""
+
+            topic_map = self.topic_map
+
+            for topic, frame in (recvd.items() if (recvd := self.recvd) is not None else ()):
+                if frame is not None:
+                    if (topic := topic_map.get(topic, topic)) in data:
+                        raise RuntimeError(f'duplicate topic {topic!r} from: {self.server_id}  @ {self.addr}')
+
+                    if topic_map and isinstance(xtra := frame[0], dict) and (box := xtra.get('box')) is not None:
+                        frame = [{**xtra, 'box': [topic_map.get(box[0]), *box[1:]]}, *frame[1:]]  # parts may be shared
+
+                    data[topic] = frame
+
+        def subscribe(self, prefix: str):
+            if self.prefixes is None:
+                self.sub.setsockopt_string(zmq.SUBSCRIBE, prefix)
+            else:
+                self.prefixes = (*self.prefixes, prefix.encode())
+
         @property
         def subscribed_all(self):
             return self.recvd_new is None
@@ -606,19 +1766,62 @@ class ZMQReceiver:
             else:
                 recvd = recvd_new.copy()
 
-            self.recvd = recvd
+            self.recvd    = recvd
+            self.left_out = False
 
             if poller is not None:
                 poller.register(self.sub, zmq.POLLIN)
 
             return recvd
 
+        def shm_recv(self, msg: list, refs: list) -> list | None:
+            """Replace the shared memory parts of a raw received `msg` with their buffers. Untracked receivers get
+            copies. Returns None if any of the slots has already been reused."""
+
+            if (shm := self.shm) is None:
+                shm = self.shm = ZMQShmReader()
+
+            copy = self.ephemeral == 2 or not self.conn
+            new  = msg[:2]
+
+            for ref, part in zip(refs, msg[2:]):
+                if ref is None:
+                    new.append(part)
+                elif (part := shm.get(ref, copy)) is None:
+                    return None
+                else:
+                    new.append(part)
+
+            return new
+
         def send_push(self, msg0: dict[str, JSONType], msg_: list[bytes] = ()):  # WARNING! `msg0` is MUTATED!
             if self.ephemeral < 2:  # do not anything to doubly-ephemeral channels
                 msg0['uid'] = self.unique_id
 
+                if self.t_req is None and msg0['mid'] > MSG_ID_SPECIAL:  # a request, retries don't restart the round trip
+                    self.t_req = time_ns() // 1_000_000
+
+                if (shm := self.shm) is not None and (rel := shm.take_released()):
+                    msg0['rel'] = rel
+                elif 'rel' in msg0:
+                    del msg0['rel']
+
+                if (codecs := self.codecs) is not None:
+                    msg0['cmp'] = codecs
+                elif 'cmp' in msg0:
+                    del msg0['cmp']
+
+                if self.env_bin:
+                    req = ZMQEnvelope.dumps_req(msg0)
+
+                else:
+                    if ZMQ_ENVELOPE == 'binary':
+                        msg0['env'] = ENV_VERSION  # advertise binary envelope support
+
+                    req = json_dumps(msg0, separators=(',', ':')).encode()
+
                 try:
-                    self.push.send_multipart([json_dumps(msg0, separators=(',', ':')).encode(), *msg_], zmq.DONTWAIT)
+                    self.push.send_multipart([req, *msg_], zmq.DONTWAIT)
 
                 except zmq.Again:
                     if self.conn:
@@ -627,18 +1830,26 @@ class ZMQReceiver:
                         logger.info(f'disconnected source: {self.server_id}  @ {self.addr}  (timeout)')
 
     def __init__(self,
-        addrs_n_topics: str | list[str | tuple[str, list[tuple[str, str]] | None]],
+        addrs_n_topics: str | list[str | tuple[str, list[tuple[str, str]] | None] | tuple[str, list[tuple[str, str]] | None, str | None]],
         client_id:      str | None = None,
         message_oob:    Callable[[ZMQMessage], None] | None = None,
         balance:        bool = False,
         low_latency:    bool | None = None,
+        zero_copy:      bool = False,
+        window:         int | None = None,
+        reorder:        int | None = None,
+        compress:       bool | str | list[str] | None = None,
+        waker:          ZMQWaker | None = None,
+        on_drop:        Callable[[str, str | None, int], None] | None = None,
     ):
         """Consumer of published messages (upon request) from possibly multiple publishers at multiple addresses.
 
         Args:
-            addrs_n_topics: Single or list of strings and optionally topics to subscribe to, forms can take:
+            addrs_n_topics: Single or list of strings and optionally topics to subscribe to and a delivery variant to
+                ask for (see module docstring), forms can take:
                 "tcp://127.0.0.1:5552",
                 ["tcp:127.0.0.1:5552", ("ipc://./pipe_in_cwd", [("src1", "dst1"), ("src2", "dst2")])]
+                [("tcp://127.0.0.1:5552", None, "noimage")]
 
             client_id: String ID for this client, if None then will be random string each time.
 
@@ -649,6 +1860,27 @@ class ZMQReceiver:
             low_latency: Low latency mode means that next message is NOT preemptively requested when current message is
                 received, leads to lower latency but also lower throughput.
 
+            zero_copy: Receive without copying, message parts after the envelope are returned as readonly memoryviews
+                of the zeromq buffers instead of bytes.
+
+            window: Credit window, number of messages past the last one received which each synchronized sender may
+                publish ahead of our requests. Default 1 is one message in flight (plus the preemptive request), more
+                hides the round trip on high latency links at the cost of memory and latency. Messages are still
+                returned in order one at a time.
+
+            reorder: With `balance`, the maximum number of complete messages held back while waiting for an earlier
+                missing one so that messages are returned in increasing msg_id order even though they complete out of
+                order on different workers. If a missing message doesn't arrive by the time this many are waiting (or
+                ZMQ_REORDER_TIMEOUT) then it is skipped, if it arrives later it is discarded. Default is four times the
+                number of sources, 0 turns this off and messages are returned as they complete (older ones discarded).
+
+            compress: Ask 'tcp://' senders to compress large data parts. True for any codec we have, a list (or comma
+                separated string) of codecs to choose from or False for no compression. Default ZMQ_COMPRESS.
+
+            waker: Optional ZMQWaker which makes a waiting recv() return None immediately when woken.
+
+            on_drop: Optional callback for messages which are discarded or lost, called with (reason, topic, count).
+
         Notes:
             * An address can have a trailing '?' character which will not be considered part of the address but will
             rather indicate that address to be ephemeral. An ephemeral channel will not hold up a sender for
@@ -666,18 +1898,28 @@ class ZMQReceiver:
         self.message_oob = (lambda m: None) if message_oob is None else message_oob
         self.balance     = balance
         self.low_latency = ZMQ_LOW_LATENCY if low_latency is None else low_latency
+        self.zero_copy   = zero_copy
+        self.waker       = waker
+        self.on_drop     = (lambda r, t, n: None) if on_drop is None else on_drop
+        self.window      = max(1, ZMQ_WINDOW if window is None else window)
         self.prev_id     = MSG_ID_INITIAL_PREV
+        self.prefetch_id = None  # prev_id already requested preemptively on last recv(), not requested again immediately
         self.senders     = senders = {}
         context          = ZMQContext.get()
+        codecs           = compress_codecs(ZMQ_COMPRESS if compress is None else compress)
 
         for addr_n_topics in [addrs_n_topics] if isinstance(addrs_n_topics, str) else addrs_n_topics:
-            addr, topics        = (addr_n_topics, None) if isinstance(addr_n_topics, str) else addr_n_topics
-            sender              = self.Sender(context, addr, topics, client_id)
+            addr, topics, vnt   = (addr_n_topics, None, None) if isinstance(addr_n_topics, str) else (*addr_n_topics, None)[:3]
+            sender              = self.Sender(context, addr, topics, client_id, codecs, vnt)
             senders[sender.sub] = sender
 
             if balance and sender.ephemeral:
                 raise ValueError(f"balanced sources can not be ephemeral '?' like {addr!r}")
 
+        self.routed      = all(sender.routed for sender in senders.values() if not sender.ephemeral)
+        self.reorder     = (4 * len(senders) if reorder is None else reorder) if balance else 0
+        self.reorder_buf = {}  # {msg_id: (data, balanced, t_complete), ...} complete balanced messages waiting to be returned in order
+
         self.new_recv()
 
     def destroy(self):
@@ -696,6 +1938,12 @@ class ZMQReceiver:
 
         ZMQContext.free()
 
+    def link_metrics(self) -> dict[str, float]:
+        """Link statistics of each source as flat metrics 'in_{server_id}_...', see ZMQLinkStats."""
+
+        return {n: v for sender in list(self.senders.values())
+            for n, v in sender.stats.metrics(f'in_{sender.server_id or sender.addr}').items()}
+
     def send_oob(self, msg: ZMQMessage):
         msg0 = {'cid': self.client_id, 'mid': MSG_ID_OOB, 'xtra': msg[0]}
         msg_ = msg[1:]
@@ -712,6 +1960,52 @@ class ZMQReceiver:
         for sender in self.senders.values():
             sender.new_recv(poller=poller)
 
+        if (waker := self.waker) is not None:
+            poller.register(waker.fd, zmq.POLLIN)
+
+    def reorder_push(self, balanced: bool | int) -> list[Sender]:
+        """Move complete messages of balanced senders to the reorder buffer and start new ones, returns those senders."""
+
+        senders = [sender for sender in self.senders.values() if sender.got_all]
+        t       = time_ns()
+
+        for sender in senders:
+            sender.add_data(data := {})
+            sender.new_recv(poller=self.poller)
+
+            sender.ack_id            = msg_id = sender.min_recv_id
+            self.reorder_buf[msg_id] = (data, balanced, t)
+
+        return senders
+
+    def reorder_pop(self, min_recv_id: int) -> tuple[int, dict[str, ZMQMessage], bool | int] | None:
+        """Return (msg_id, data, balanced) of the lowest buffered message if it is the next one expected, if too many are
+        waiting on it or if it has waited too long. Buffered messages older than `min_recv_id` are discarded."""
+
+        reorder_buf = self.reorder_buf
+
+        for msg_id in [msg_id for msg_id in reorder_buf if msg_id < min_recv_id]:
+            for topic in reorder_buf.pop(msg_id)[0]:
+                self.on_drop('older', topic, 1)
+
+            if ZMQ_WARN_OLDER:
+                logger.warning(f'discarded older reordered message id {msg_id} than expected {min_recv_id}')
+
+        if not reorder_buf:
+            return None
+
+        data, balanced, t = reorder_buf[msg_id := min(reorder_buf)]
+
+        if msg_id != min_recv_id and len(reorder_buf) < self.reorder and time_ns() - t < ZMQ_REORDER_TIMEOUT * 1_000_000:
+            return None
+
+        del reorder_buf[msg_id]
+
+        if msg_id > min_recv_id:  # gave up waiting for the ones in between
+            self.on_drop('lost', None, msg_id - min_recv_id)
+
+        return msg_id, data, balanced
+
     def recv(self,
         state:   ZMQStateRecv | None = None,
         timeout: int | None = None,
@@ -744,28 +2038,91 @@ class ZMQReceiver:
         senders     = self.senders
         sendervs    = senders.values()
         poller      = self.poller
+        poll        = ZMQWaker.poll_func(poller, waker := self.waker)
+        zero_copy   = self.zero_copy
+        reorder     = self.reorder
+        reorder_buf = self.reorder_buf
+        on_drop     = self.on_drop
+        recvd       = None
 
         def recv_once(timeout) -> bool:  # got_all
             nonlocal balanced, min_recv_id
 
-            while socks := poller.poll(timeout):
+            while socks := poll(timeout):  # when woken this returns nothing immediately, like a timeout
                 while socks:  # we do like this instead of iterate because socks may need to be zeroed out in the loop
                     sub, flags = socks.pop()
 
                     if flags != zmq.POLLIN:
                         raise RuntimeError(f'unexpected poll flags {flags}')
 
-                    msg = sub.recv_multipart()
+                    if not zero_copy:
+                        msg = sub.recv_multipart()
+                    else:  # topic and envelope as bytes, rest as readonly views of the zeromq buffers
+                        msg = sub.recv_multipart(copy=False)
+                        msg = [msg[0].bytes, msg[1].bytes, *(f.buffer.toreadonly() for f in msg[2:])]
 
                     sender     = senders[sub]
                     sender_eph = sender.ephemeral
-                    topic      = (t := msg[0])[t.startswith(TOPIC_DELIM_B) : -1].decode()  # empty topics indicates ignore actual message (topics count tho for information)
-                    env        = json_loads(msg[1].decode())
+
+                    if (prefixes := sender.prefixes) is not None and not msg[0].startswith(prefixes):  # DEALER gets all topics
+                        continue
+
+                    if (t := msg[0]).startswith(VARIANT_DELIM_B):  # delivery variant, ours or seen because subscribed to '*'
+                        if not (vkey := sender.vkey) or not t.startswith(vkey):
+                            continue
+
+                        t = t[len(vkey):]
+
+                    topic      = t[t.startswith(TOPIC_DELIM_B) : -1].decode()  # empty topics indicates ignore actual message (topics count tho for information)
+                    env        = ZMQEnvelope.loads(msg[1], sender.env_cache)
                     server_id  = sender.server_id = env['sid']
                     msg_id     = env['mid']
                     topics     = env.get('topics')
-                    msg        = [env.get('xtra'), *msg[2:]]
                     t          = time_ns() // 1_000_000  # ns -> ms
+                    stats      = sender.stats
+
+                    stats.nbytes += ZMQLinkStats.msg_nbytes(msg)
+
+                    if not sender.env_bin and msg[1][0] == ENV_VERSION and ZMQ_ENVELOPE == 'binary':
+                        sender.env_bin = True
+
+                    if (shm := env.get('shm')) is not None:
+                        if (msg := sender.shm_recv(msg, shm)) is None:
+                            if DEBUG_ZEROMQ:
+                                logger.debug(f'recv msg {msg_id} from {server_id}: {topic}  - shm slot gone')
+
+                            on_drop('shm_reused', topic or None, 1)
+
+                            continue
+
+                    if (obj := env.get('obj')) is not None:
+                        if (omsg := ZMQInprocStore.get(obj)) is None:
+                            if DEBUG_ZEROMQ:
+                                logger.debug(f'recv msg {msg_id} from {server_id}: {topic}  - inproc message gone')
+
+                            on_drop('inproc_gone', topic or None, 1)
+
+                            continue
+
+                        msg = [*msg[:2], *omsg[1:]]
+
+                    if (codec := env.get('cmp')) is not None:
+                        if (decompress := CODECS.get(codec)) is None:
+                            logger.error(f'can not decompress message {msg_id} from {server_id} with unknown codec {codec!r}')
+
+                            continue
+
+                        try:
+                            msg[-1] = decompress[1](msg[-1], ZMQ_DECOMPRESS_MAX)
+
+                        except Exception as exc:  # too big or corrupt, only this message is lost
+                            once(logger.error, f'can not decompress message {msg_id} from {server_id}: {exc}', t=60)
+
+                            on_drop('decompress', topic or None, 1)
+
+                            continue
+
+                    msg = [env.get('xtra'), *msg[2:]]
 
                     if msg_balanced := not sender_eph and env.get('bal', False):  # ephemeral channels do not transfer balanced message status
                         balanced = msg_balanced  # because we want 'bal' index if balanced pipeline longer than one filter
@@ -800,12 +2157,23 @@ class ZMQReceiver:
 
                         continue
 
+                    if (t_req := sender.t_req) is not None:
+                        if waiting:  # messages already waiting when recv() was called could have arrived any time before
+                            stats.rtt = ZMQLinkStats.avg(stats.rtt, t - t_req)
+
+                        sender.t_req = None
+
+                    sender.t_got = t
+
                     def process_msg(min_recv_id_: int) -> bool:
                         nonlocal recvd
 
                         if msg_id < min_recv_id_:  # discard older messages if we are expecting newer
-                            if topic and ZMQ_WARN_OLDER:
-                                logger.warning(f'received older message id {msg_id} than expected {min_recv_id_} from {server_id}  ({topic})')
+                            if topic:
+                                on_drop('older', topic, 1)
+
+                                if ZMQ_WARN_OLDER:
+                                    logger.warning(f'received older message id {msg_id} than expected {min_recv_id_} from {server_id}  ({topic})')
 
                             return None
 
@@ -829,9 +2197,18 @@ class ZMQReceiver:
 
                         sender.min_recv_id = msg_id
 
+                    elif reorder:  # reordered balanced sender, each one is tracked on its own and complete messages are buffered
+                        if process_msg(max(sender.min_recv_id, min_recv_id)) is None:
+                            continue
+
+                        sender.min_recv_id = msg_id
+
                     else:  # synchronized sender
-                        if msg_id > min_recv_id and not msg_balanced and min_recv_id != MSG_ID_INITIAL and ZMQ_WARN_NEWER:
-                            logger.warning(f'received newer message id {msg_id} than expected {min_recv_id} from {server_id}  ({topic})')
+                        if msg_id > min_recv_id and not msg_balanced and min_recv_id != MSG_ID_INITIAL:
+                            on_drop('lost', None, msg_id - min_recv_id)
+
+                            if ZMQ_WARN_NEWER:
+                                logger.warning(f'received newer message id {msg_id} than expected {min_recv_id} from {server_id}  ({topic})')
 
                         if (res := process_msg(min_recv_id)) is None:
                             continue
@@ -854,9 +2231,17 @@ class ZMQReceiver:
 
                                 socks = None  # force poll again from scratch because there may be other senders that have been polled that have just been removed from checking
 
+                    if not topic and sender.vkey and (left_out := [t for t, m in recvd.items() if m is None]):  # the heartbeat comes last, so whatever a variant didn't send by now is not coming
+                        for t in left_out:
+                            del recvd[t]
+
+                        sender.left_out = True
+
                     if not sender.subscribed_all and (diff := (sr := set(recvd)) - (st := set(topics))) and (not sender_eph or sr & st):
                         for t in diff:
-                            if t != '-':  # special topic name '-' is treated as a topic that will never exist and is subscribed to only to create the connection, so we don't warn on it not being present
+                            if t == '_metrics':  # only in some messages with aggregated metrics, nothing to warn or wake the caller for
+                                sender.left_out = True
+                            elif t != '-':  # special topic name '-' is treated as a topic that will never exist and is subscribed to only to create the connection, so we don't warn on it not being present
                                 once(logger.warning, f'subscribed topic {t!r} not in source topics {topics}', t=60*60)
 
                             del recvd[t]
@@ -872,6 +2257,12 @@ class ZMQReceiver:
                 got_any_complete = False
                 got_any_partial  = False
 
+                if reorder:  # any complete message can go into the reorder buffer
+                    if any(s.got_all for s in sendervs):
+                        return True
+
+                    continue
+
                 for s in sendervs:
                     if (got := s.got) == 'all':
                         got_any_complete = True
@@ -886,15 +2277,24 @@ class ZMQReceiver:
 
                         break
 
-                if got_all_synced and got_any_complete and not got_any_partial and not poller.poll(0):  # if more messages waiting then they are more ephemeral messages, try to get them before returning
+                if got_all_synced and got_any_complete and not got_any_partial and not poll(0):  # if more messages waiting then they are more ephemeral messages, try to get them before returning
                     return True
 
             return False  # should only get here due to timeout with negative return condition
 
-        def request(prev_id):
+        def request(prev_id, retry=False, senders_=sendervs):
             msg_req = {'cid': client_id, 'mid': prev_id}
 
-            for sender in sendervs:
+            if (window := self.window) > 1 or reorder:  # sender assumes window of 1 if not present, and then each request gives credit
+                msg_req['win'] = window
+
+                if retry:
+                    msg_req['rty'] = True
+
+            for sender in senders_:
+                if reorder:  # each sender only gets acknowledged what we have from it (or what is too late anyway)
+                    msg_req['mid'] = max(prev_id, sender.ack_id)
+
                 if sender.ephemeral:
                     msg_req['eph'] = sender.ephemeral
                 elif 'eph' in msg_req:
@@ -907,36 +2307,75 @@ class ZMQReceiver:
 
                 sender.send_push(msg_req)
 
-        got_all = recv_once(0)
+        t_start          = time_ns() // 1_000_000
+        waiting          = False
+        got_all          = recv_once(0)
+        waiting          = True
+        prefetch_id      = req_id = self.prefetch_id
+        self.prefetch_id = None
 
         t_timeout = float('inf') if timeout is None else time_ns() + timeout * 1_000_000
 
         while True:
+            harvested = False
+
+            if reorder:
+                if got_all:  # move complete messages to the reorder buffer and let their senders send more
+                    request(min_recv_id - 1, False, self.reorder_push(balanced))
+
+                    harvested = True
+
+                if got_all := (reordered := self.reorder_pop(min_recv_id)) is not None:
+                    min_recv_id, data, balanced = reordered
+
             if got_all:
-                if not self.low_latency and balanced != 1:  # first receiver after load balancing split never prefetches because that can confuse splitter, TODO: fix that
+                for sender in sendervs:
+                    if (t_got := sender.t_got) is not None:
+                        if not sender.ephemeral:
+                            sender.stats.wait = ZMQLinkStats.avg(sender.stats.wait, max(0, t_got - t_start))
+
+                        sender.t_got = None
+
+                if not self.low_latency and (balanced != 1 or self.routed):  # first receiver after load balancing split never prefetches because that can confuse splitter (except routers which balance per client), TODO: fix that
                     request(min_recv_id)  # preemptively request the next expected frame before returning, sacrifices latency for throughput
 
+                    self.prefetch_id = min_recv_id
+
+                else:
+                    self.prefetch_id = None
+
                 self.prev_id = min_recv_id
-                data         = {}
 
-                for sender in sendervs:
-                    topic_map = sender.topic_map
+                if not reorder:
+                    data     = {}
+                    left_out = any(sender.left_out for sender in sendervs)
 
-                    for topic, frame in (recvd.items() if (recvd := sender.recvd) is not None else ()):
-                        if frame is not None:
-                            if (topic := topic_map.get(topic, topic)) in data:
-                                raise RuntimeError(f'duplicate topic {topic!r} from: {sender.server_id}  @ {sender.addr}')
+                    for sender in sendervs:
+                        sender.add_data(data)
 
-                            data[topic] = frame
+                    self.new_recv()
 
-                self.new_recv()
+                    if not data and left_out:  # delivery variants or '_metrics' left out everything, nothing to wake the caller for
+                        prefetch_id = req_id = self.prefetch_id
+                        min_recv_id = min_recv_id + 1
+                        got_all     = False
+
+                        continue
 
                 if balance and not balanced:
                     once(logger.warning, f'balanced sources receiver received non-balanced message(s)', t=60*60)
 
                 return (data, ZMQStateSend(min_recv_id, balanced))
 
-            request(min_recv_id - 1)
+            if prefetch_id != (prev_id := min_recv_id - 1) and not harvested:  # a duplicate request would let a fast sender run ahead of us and overflow PUB HWM
+                request(prev_id, prev_id == req_id)  # same request again after a timeout is a retry, messages may have been lost
+
+                req_id = prev_id
+
+            prefetch_id = None  # after a timeout request again regardless
+
+            if waker is not None and waker.is_set:
+                return None
 
             if timeout is None:
                 recv_once_timeout = ZMQ_POLL_TIMEOUT
@@ -945,4 +2384,8 @@ class ZMQReceiver:
             else:
                 recv_once_timeout = min(timeout, ZMQ_POLL_TIMEOUT)
 
+            if reorder_buf:  # don't wait longer than until the oldest buffered message is released regardless
+                t_oldest          = reorder_buf[min(reorder_buf)][2]
+                recv_once_timeout = max(0, min(recv_once_timeout, ZMQ_REORDER_TIMEOUT - (time_ns() - t_oldest) // 1_000_000))
+
             got_all = recv_once(recv_once_timeout)
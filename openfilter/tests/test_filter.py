@@ -3,9 +3,12 @@
 import logging
 import multiprocessing as mp
 import os
+import threading
 import unittest
 from multiprocessing import Queue
 from multiprocessing.queues import Empty
+from queue import Queue as ThreadQueue
+from tempfile import TemporaryDirectory
 from time import sleep, time
 
 import numpy as np
@@ -13,6 +16,7 @@ import numpy as np
 from openfilter.filter_runtime import Filter, FilterConfig, Frame
 from openfilter.filter_runtime.test import RunnerContext, FiltersToQueue, QueueToFilters
 from openfilter.filter_runtime.utils import setLogLevelGlobal
+from openfilter.filter_runtime.filters.relay import Relay
 from openfilter.filter_runtime.filters.util import Util
 
 logger = logging.getLogger(__name__)
@@ -114,6 +118,98 @@ class TestFilterOld(unittest.TestCase):
         self.assertEqual({t: f.data for t, f in queue.get(0).items()}, {'main': {'count': 4}, 'other': {'count': 4}})
 
 
+    def test_topo_relay(self):
+        qout = Queue(); [qout.put({'main': {'count': i}, 'other': {'more': i}}) for i in range(5)]; qout.put(None)
+
+        retcodes = Filter.run_multi([
+            (FilterFromQueue, dict(id='src',   outputs='tcp://*', outputs_required='relay', queue=qout, sleep_start=0.5, sleep=0.5)),  # the sleeps because might miss published messages at startup
+            (Relay,           dict(id='relay', sources='tcp://127.0.0.1', outputs='tcp://*:5552', outputs_required='1, 2')),
+            (FilterToQueue,   dict(id='1',     sources='tcp://127.0.0.1:5552', queue=(qin1 := Queue()))),
+            (FilterToQueue,   dict(id='2',     sources='tcp://127.0.0.1:5552;other', queue=(qin2 := Queue()))),
+        ], exit_time=10)
+
+        self.assertEqual(retcodes, [0, 0, 0, 0])
+
+        for i in range(5):
+            self.assertEqual({t: f.data for t, f in qin1.get(0).items()}, {'main': {'count': i}, 'other': {'more': i}})
+            self.assertEqual({t: f.data for t, f in qin2.get(0).items()}, {'other': {'more': i}})
+
+
+    def test_topo_threads(self):
+        image = np.zeros((120, 160, 3), np.uint8)
+
+        image.flags.writeable = False
+
+        qout = ThreadQueue(); [qout.put({'main': Frame(image, {'count': i}, 'BGR')}) for i in range(5)]; qout.put(None)
+
+        class FramesFromQueue(FilterFromQueue):
+            def process(self, frames):
+                if (frames := self.config.queue.get()) is None:
+                    self.exit()
+
+                return frames
+
+        retcodes = Filter.run_multi([
+            (FramesFromQueue, dict(outputs='inproc://src', queue=qout)),
+            (Util,            dict(sources='inproc://src', outputs='inproc://util')),
+            (FilterToQueue,   dict(sources='inproc://util', queue=(qin := ThreadQueue()))),
+        ], exit_time=10, threads=True)
+
+        self.assertEqual(retcodes, [0, 0, 0])
+
+        for i in range(5):
+            self.assertEqual((frame := qin.get(timeout=0)['main']).data, {'count': i})
+            self.assertIs(frame.image, image)  # same readonly image all the way through, never encoded
+
+
+    def test_topo_threads_isolated(self):
+        early_gone = threading.Event()
+        emitters   = {}
+        late_ok    = []
+
+        class EarlyExit(Filter):
+            def process(self, frames):
+                emitters['early'] = self.emitter
+
+                logger.critical('early filter message')
+                self.exit()
+
+            def fini(self):
+                super().fini()
+                early_gone.set()
+
+        class LateExit(Filter):
+            def process(self, frames):
+                emitters['late'] = self.emitter
+
+                early_gone.wait(5)
+                late_ok.append(self.emitter.filter_name == 'LateExit' and not self.emitter._stop_event.is_set())
+                logger.critical('late filter message')
+                self.exit()
+
+        with TemporaryDirectory() as log_path:
+            retcodes = Filter.run_multi([
+                (EarlyExit, dict(id='early', outputs='inproc://early', log_path=log_path)),
+                (LateExit,  dict(id='late',  outputs='inproc://late',  log_path=log_path)),
+            ], exit_time=10, threads=True)
+
+            self.assertEqual(retcodes, [0, 0])
+            self.assertEqual(late_ok, [True])  # early exit did not stop or rename the late filter's lineage
+            self.assertIsNot(emitters['early'], emitters['late'])
+            self.assertIsNot(emitters['early'], Filter.emitter)
+
+            for id, other in (('early', 'late'), ('late', 'early')):
+                logs = ''.join(open(os.path.join(dirpath, fnm)).read()
+                    for dirpath, _, fnms in os.walk(os.path.join(log_path, id, 'logs')) for fnm in fnms)
+
+                self.assertIn(f'{id} filter message', logs)
+                self.assertNotIn(f'{other} filter message', logs)
+
+        with self.assertRaises(ValueError):
+            Filter.Runner([(EarlyExit, dict(outputs='inproc://early', __env_run={'SOME_VAR': '1'}))], threads=True,
+                start=False)
+
+
     def test_topo_ephemeral_simple(self):
         qout = Queue(); [qout.put({'main': {'count': i}}) for i in range(8)]; qout.put(None)
 
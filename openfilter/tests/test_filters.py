@@ -7,6 +7,7 @@ import unittest
 from openfilter.filter_runtime.filter import logger as filter_logger
 from openfilter.filter_runtime.filters.mqtt_out import MQTTOutConfig, MQTTOut
 from openfilter.filter_runtime.filters.recorder import RecorderConfig, Recorder
+from openfilter.filter_runtime.filters.relay import RelayConfig, Relay
 from openfilter.filter_runtime.filters.rest import RESTConfig, REST
 from openfilter.filter_runtime.filters.webvis import WebvisConfig, Webvis
 
@@ -78,6 +79,24 @@ class TestFilters(unittest.TestCase):
         self.assertEqual(ncfg1, ncfg2)
 
 
+    def test_relay_normalize_config(self):
+        scfg  = dict(id='relay', sources='tcp://camera:5550?', outputs='tcp://*:5552, ipc://relay')
+        dcfg  = RelayConfig({'id': 'relay', 'sources': ['tcp://camera:5550?'], 'outputs': ['tcp://*:5552', 'ipc://relay']})
+        ncfg1 = Relay.normalize_config(scfg)
+        ncfg2 = Relay.normalize_config(ncfg1)
+
+        self.assertIsInstance(ncfg1, RelayConfig)
+        self.assertIsInstance(ncfg2, RelayConfig)
+        self.assertEqual(ncfg1, dcfg)
+        self.assertEqual(ncfg1, ncfg2)
+
+        with self.assertRaises(ValueError):
+            Relay.normalize_config(dict(id='relay', outputs='tcp://*:5552'))
+
+        with self.assertRaises(ValueError):
+            Relay.normalize_config(dict(id='relay', sources='tcp://camera:5550'))
+
+
     def test_rest_normalize_config(self):
         scfg  = dict(id='rest', sources='http://*:8000/my_base_path/ ; (put|delete|get) test/{param} > rest/zub ; ', outputs='tcp://*')
         dcfg  = RESTConfig({'id': 'rest', 'outputs': ['tcp://*'], 'host': '*', 'port': 8000, 'base_path': 'my_base_path', 'endpoints': [
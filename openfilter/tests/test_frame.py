@@ -10,6 +10,7 @@ import pickle
 from numpy import array_equal as aeq
 
 from openfilter.filter_runtime import Frame
+from openfilter.filter_runtime.bufpool import set_buffer_pool, get_buffer_pool
 
 
 class TestFrame(unittest.TestCase):
@@ -220,6 +221,185 @@ class TestFrame(unittest.TestCase):
         self.assertTrue((frm_raw_bgr_ro := Frame(image_bgr, {}, 'BGR').ro).ro_rgb is frm_raw_bgr_ro.ro_rgb)
 
 
+    def test_decoded(self):
+        image_bgr = cv2.resize(np.random.randint(0, 256, (9, 16, 3), np.uint8), (160, 90), interpolation=cv2.INTER_NEAREST)
+        image_jpg = cv2.imencode('.jpg', image_bgr)[1]
+        frm_jpg   = Frame.from_jpg(image_jpg, {'a': 1}, 90, 160, 'BGR')
+
+        self.assertTrue((frm_q := frm_jpg.decoded(1/4)) is frm_jpg.decoded(0.25))
+        self.assertEqual(str(frm_q), 'Frame(40x23xBGR-ro)')
+        self.assertIs(frm_q.data, frm_jpg.data)
+        self.assertFalse(frm_jpg.has_raw)  # never decoded full size
+        self.assertTrue((frm_g := frm_jpg.decoded(gray=True)) is frm_jpg.decoded(1, True))
+        self.assertEqual(str(frm_g), 'Frame(160x90xGRAY-ro)')
+        self.assertLess(np.abs(frm_g.image.astype(int) - frm_jpg.gray.image).mean(), 2)
+        self.assertEqual(str(frm_jpg.decoded(1/8, True)), 'Frame(20x12xGRAY-ro)')
+        self.assertEqual(str(Frame.from_jpg(image_jpg, {}, 90, 160, 'RGB').decoded(1/2, True)), 'Frame(80x45xGRAY-ro)')
+        self.assertIs(frm_jpg.decoded(), frm_jpg)
+
+        frm_rw = Frame(image_bgr, {}, 'BGR')
+
+        self.assertEqual(str(frm_half := frm_rw.decoded(1/2)), 'Frame(80x45xBGR)')
+        self.assertTrue(aeq(frm_half.image, cv2.resize(image_bgr, (80, 45), interpolation=cv2.INTER_AREA)))
+        self.assertIsNot(frm_rw.decoded(1/2), frm_half)
+        self.assertTrue((frm_ro := frm_rw.ro).decoded(1/2, True) is frm_ro.decoded(1/2, True))
+        self.assertTrue(aeq(frm_ro.decoded(1/2, True).image, frm_half.gray.image))
+        self.assertIs(frm_ro.decoded(gray=True), frm_ro.gray)
+        self.assertRaises(ValueError, frm_jpg.decoded, 1/3)
+
+
+    def test_crop(self):
+        image = np.random.randint(0, 256, (90, 160, 3), np.uint8)
+        frm   = Frame(image, {'a': 1}, 'BGR').ro
+        crop  = frm.crop(10, 20, 30, 40, {'b': 2})
+
+        self.assertEqual(str(crop), 'Frame(30x40xBGR-ro)')
+        self.assertTrue(aeq(crop.image, image[20:60, 10:40]))
+        self.assertTrue(np.shares_memory(crop.image, frm.image))
+        self.assertEqual((crop.parent, crop.box, crop.data), (frm, (10, 20, 30, 40), {'b': 2}))
+        self.assertIs(crop.parent, frm)
+        self.assertIs(Frame(crop, {}).parent, frm)
+        self.assertIsNone(crop.rw.parent)
+        self.assertIsNone(frm.parent)
+
+        crop2 = crop.crop(5, 5, 10, 10)
+
+        self.assertIs(crop2.parent, frm)
+        self.assertEqual((crop2.box, crop2.data), ((15, 25, 10, 10), {}))
+        self.assertTrue(aeq(crop2.image, image[25:35, 15:25]))
+        self.assertTrue(aeq(cv2.imdecode(np.frombuffer(crop2.jpg, np.uint8), cv2.IMREAD_COLOR).shape, (10, 10, 3)))
+
+        frm_rw = Frame(image, {}, 'BGR')
+
+        self.assertTrue(frm_rw.crop(0, 0, 160, 90).parent.is_ro)
+        self.assertFalse(np.shares_memory(frm_rw.crop(0, 0, 10, 10).image, image))
+        self.assertRaises(ValueError, frm.crop, 150, 0, 20, 10)
+        self.assertRaises(ValueError, frm.crop, 0, 0, 0, 10)
+        self.assertRaises(ValueError, Frame({}).crop, 0, 0, 1, 1)
+
+
+    def test_yuv(self):
+        bgr = np.random.randint(0, 256, (90, 160, 3), np.uint8)
+
+        for format, to_yuv, to_bgr in (('I420', cv2.COLOR_BGR2YUV_I420, cv2.COLOR_YUV2BGR_I420),
+                ('NV12', cv2.COLOR_BGR2YUV_I420, cv2.COLOR_YUV2BGR_NV12)):
+            yuv = cv2.cvtColor(bgr, to_yuv)
+
+            if format == 'NV12':  # I420 -> NV12, interleave U and V
+                uv  = yuv[90:].reshape(2, -1)
+                yuv = np.concatenate((yuv[:90].ravel(), uv.T.ravel())).reshape(135, 160)
+
+            frm = Frame(yuv, {'a': 1}, format)
+
+            self.assertEqual(str(frm), f'Frame(160x90x{format})')
+            self.assertEqual((frm.height, frm.width, frm.channels, frm.shape, frm.is_yuv), (90, 160, 3, (135, 160), True))
+            self.assertEqual(Frame.image_shape(90, 160, format), (135, 160))
+            self.assertTrue(aeq(frm.bgr.image, cv2.cvtColor(yuv, to_bgr)))
+            self.assertTrue(aeq(frm.rgb.image, cv2.cvtColor(yuv, to_bgr)[..., ::-1]))
+            self.assertTrue(aeq(frm.rw_bgr.image, frm.ro_bgr.image))
+            self.assertEqual((frm.bgr.format, frm.rgb.data), ('BGR', {'a': 1}))
+            self.assertTrue(aeq(frm.gray.image, yuv[:90]))
+            self.assertFalse(np.shares_memory(frm.gray.image, yuv))
+            self.assertTrue(np.shares_memory((ro := frm.ro).gray.image, ro.image))
+            self.assertIs(ro.gray, ro.gray)
+            self.assertIs(ro.bgr, ro.bgr)
+            self.assertEqual(frm.decoded(0.5).shape, (45, 80, 3))
+            self.assertEqual(frm.decoded(0.5, True).shape, (45, 80))
+            self.assertEqual(cv2.imdecode(np.frombuffer(frm.jpg, np.uint8), cv2.IMREAD_COLOR).shape, (90, 160, 3))
+            self.assertRaises(ValueError, frm.crop, 0, 0, 10, 10)
+
+        self.assertEqual(str(Frame(np.zeros((90, 160), np.uint8), {}, 'NV12')), 'Frame(160x60xNV12)')
+        self.assertRaises(ValueError, Frame, np.zeros((91, 160), np.uint8), {}, 'NV12')
+        self.assertRaises(ValueError, Frame, np.zeros((90, 161), np.uint8), {}, 'I420')
+        self.assertRaises(ValueError, Frame, np.zeros((90, 160, 3), np.uint8), {}, 'NV12')
+        self.assertRaises(ValueError, Frame, Frame(np.zeros((90, 160, 3), np.uint8), {}, 'BGR'), None, 'NV12')
+        self.assertRaises(ValueError, Frame, Frame(np.zeros((90, 160), np.uint8), {}, 'NV12'), None, 'BGR')
+        self.assertRaises(ValueError, Frame, np.zeros((90, 160, 3), np.uint8), Frame(np.zeros((90, 160), np.uint8), {}, 'I420'))
+        self.assertRaises(ValueError, Frame.from_jpg, Frame(bgr, {}, 'BGR').jpg, None, 90, 160, 'NV12')
+
+
+    def test_data_json(self):
+        js  = b'{"a": 1, "b": [2, 3]}'  # not compact, so we can tell it is the original
+        frm = Frame(None, js)
+
+        self.assertEqual(frm._Frame__data, [None, js])
+        self.assertTrue(frm.has_data)
+        self.assertIs(frm.json, js)
+        self.assertEqual(frm.ro_data, {'a': 1, 'b': [2, 3]})
+        self.assertIs(frm.json, js)  # read only, still the original
+
+        bgr = Frame(np.zeros((4, 4, 3), np.uint8), frm, 'BGR')  # shares the data with frm
+
+        self.assertIs(bgr.ro_data, frm.ro_data)
+
+        bgr.data['c'] = 4
+
+        self.assertEqual(frm.json, b'{"a":1,"b":[2,3],"c":4}')
+        self.assertEqual(frm.data, {'a': 1, 'b': [2, 3], 'c': 4})
+        self.assertFalse(Frame(None, b'{}').has_data)
+        self.assertFalse(Frame(None, b' { \n} ').has_data)
+        self.assertTrue(Frame(None, b'{ "a": {}}').has_data)
+        self.assertTrue(Frame.json_is_object(b' {"a": 1}\n'))
+        self.assertFalse(Frame.json_is_object(b'[1]'))
+        self.assertRaises(ValueError, lambda: Frame(None, b'{"a": ').data)
+        self.assertRaises(ValueError, lambda: Frame(None, b'{"a": }').ro_data)
+        self.assertFalse(Frame({}).has_data)
+        self.assertEqual(Frame({'x': None}).json, b'{"x":null}')
+        self.assertEqual(Frame(None, js), Frame({'a': 1, 'b': [2, 3]}))
+        self.assertEqual(Frame(None, js).copy().data, {'a': 1, 'b': [2, 3]})
+
+
+    def test_buffer_pool(self):
+        image = np.random.randint(0, 256, (90, 160, 3), np.uint8)
+
+        set_buffer_pool(3)
+
+        try:
+            pool = get_buffer_pool()
+            rgbs = [Frame(image, {}, 'BGR').ro_rgb for _ in range(5)]  # each gets a new buffer while alive
+
+            self.assertEqual((pool.hit_count, pool.miss_count), (0, 5))
+            self.assertTrue(all(aeq(rgb.image, image[..., ::-1]) for rgb in rgbs))
+
+            del rgbs
+
+            for _ in range(5):
+                rgb = Frame(image, {}, 'BGR').ro.rgb  # copy for ro and conversion, both from buffers let go of
+
+                self.assertTrue(aeq(rgb.image, image[..., ::-1]))
+                self.assertTrue(rgb.is_ro)
+
+            self.assertEqual((pool.hit_count, pool.miss_count), (10, 5))
+
+            crop = rgb.crop(0, 0, 10, 10)  # view keeps buffer in use
+            data = crop.image.copy()
+
+            del rgb
+
+            for _ in range(3):
+                Frame(image, {}, 'BGR').rw_rgb.image[:] = 0
+
+            self.assertTrue(aeq(crop.image, data))
+            self.assertEqual(str(Frame(image, {}, 'BGR').decoded(1/2)), 'Frame(80x45xBGR)')
+
+        finally:
+            set_buffer_pool(None)
+
+        set_buffer_pool(3, 4)
+
+        try:
+            pool = get_buffer_pool()
+
+            for i in range(1, 50):  # many different sizes, e.g. crops
+                self.assertEqual(Frame(image, {}, 'BGR').ro.crop(0, 0, i, i).rw.shape, (i, i, 3))
+
+            self.assertEqual(len(pool.bufs), 4)
+            self.assertEqual({key[0] for key in pool.bufs}, {(90, 160, 3), (47, 47, 3), (48, 48, 3), (49, 49, 3)})
+
+        finally:
+            set_buffer_pool(None)
+
+
     def test_writability(self):
         image_rgb = np.array([[[1,2,3], [4,5,6]], [[7,8,9],[9,8,7]], [[1,0,0], [2,0,0]]], np.uint8)
         image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
@@ -1689,7 +1869,7 @@ class TestFrame(unittest.TestCase):
         f = Frame(frm_raw_rgb_rw, {'other': True})
 
         self.assertIs(f._Frame__image, frm_raw_rgb_rw._Frame__image)
-        self.assertEqual(f._Frame__data, {'other': True})
+        self.assertEqual(f._Frame__data, [{'other': True}, None])
         self.assertIs(f._Frame__shapef, frm_raw_rgb_rw._Frame__shapef)
         self.assertEqual(f._Frame__jpg, frm_raw_rgb_rw._Frame__jpg)
 
@@ -1725,7 +1905,7 @@ class TestFrame(unittest.TestCase):
         f = Frame(image_rgb, {'other': True}, 'BGR')
 
         self.assertIs(f._Frame__image, frm_raw_rgb_rw._Frame__image)
-        self.assertEqual(f._Frame__data, {'other': True})
+        self.assertEqual(f._Frame__data, [{'other': True}, None])
         self.assertEqual(f.shape, image_rgb.shape)
         self.assertEqual(f.format, 'BGR')
         self.assertEqual(f._Frame__jpg, False)
@@ -1733,7 +1913,7 @@ class TestFrame(unittest.TestCase):
         f = Frame(image_rgb, {'other': True}, frm_raw_rgb_rw)
 
         self.assertIs(f._Frame__image, frm_raw_rgb_rw._Frame__image)
-        self.assertEqual(f._Frame__data, {'other': True})
+        self.assertEqual(f._Frame__data, [{'other': True}, None])
         self.assertEqual(f.shape, image_rgb.shape)
         self.assertEqual(f.format, frm_raw_rgb_rw.format)
         self.assertEqual(f._Frame__jpg, False)
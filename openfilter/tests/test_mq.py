@@ -3,11 +3,17 @@
 import logging
 import os
 import unittest
+from json import loads as json_loads
 from queue import Queue, Empty
-from threading import Event, Thread
+from threading import Event, Thread, Timer
+from time import sleep, time
+
+import numpy as np
+import zmq
 
 from openfilter.filter_runtime import Frame
-from openfilter.filter_runtime.mq import MQ, MQSender, MQReceiver
+from openfilter.filter_runtime.metrics import MetricsAggregator
+from openfilter.filter_runtime.mq import MQ, MQSender, MQReceiver, DeltaEncoder, DeltaDecoder
 from openfilter.filter_runtime.utils import setLogLevelGlobal
 
 logger = logging.getLogger(__name__)
@@ -211,6 +217,653 @@ class TestMQ(unittest.TestCase):
             sender.destroy()
 
 
+    def test_mq_zero_copy(self):
+        image = np.arange(160 * 120 * 3, dtype=np.uint8).reshape(120, 160, 3)  # big enough to not be copied by pyzmq
+
+        image.flags.writeable = False
+
+        for zero_copy in (False, True):
+            sender = ThreadMQSender('ipc://test-send', 'sender', outs_jpg=False, mq_zero_copy=zero_copy)
+
+            try:
+                receiver = MQReceiver('ipc://test-send', 'receiver', mq_zero_copy=zero_copy)
+
+                try:
+                    for i in range(3):
+                        sender.send(frames := {'main': Frame(image, {'count': i}, 'BGR')})
+
+                        self.assertEqual(recvd := receiver.recv(), frames)
+                        self.assertTrue((img := recvd['main'].image).flags.c_contiguous)
+                        self.assertFalse(img.flags.writeable)
+
+                        while isinstance(img, np.ndarray):
+                            img = img.base
+
+                        self.assertIsInstance(img, memoryview if zero_copy else bytes)  # memoryview of zmq.Frame
+
+                    sender.send(frames := {'main': Frame(image.copy(), {'count': 3}, 'BGR')})  # writable gets copied on send
+
+                    self.assertEqual(receiver.recv(), frames)
+
+                finally:
+                    receiver.destroy()
+
+            finally:
+                sender.destroy()
+
+
+    def test_mq_io_threads(self):
+        image = np.arange(160 * 120 * 3, dtype=np.uint8).reshape(120, 160, 3)
+
+        sender = ThreadMQSender('ipc://test-send', 'sender', outs_jpg=False)
+
+        try:
+            receiver = ThreadMQReceiver('ipc://test-mq', 'receiver')
+
+            try:
+                mq = MQ('ipc://test-send', 'ipc://test-mq', 'mq', outs_metrics=False, outs_jpg=False,
+                    srcs_prefetch=2, srcs_decode=True, outs_thread=True)
+
+                try:
+                    self.assertEqual(len(threads := list(mq.io_threads)), 2)
+
+                    for i in range(5):
+                        sender.send(frames := {'main': Frame(image, {'count': i}, 'BGR')})
+
+                        self.assertEqual(recvd := mq.recv(), frames)
+                        self.assertTrue(recvd['main'].has_image)
+                        self.assertTrue(mq.send(recvd))
+                        self.assertEqual(receiver.recv(), frames)
+
+                finally:
+                    mq.destroy()
+
+                self.assertFalse(any(thread.is_alive() for thread in threads))
+
+                mq = MQ(None, 'ipc://test-mq', 'mq', outs_metrics=False, outs_jpg=False, outs_thread=True)
+
+                try:
+                    def send_sync(*args, **kwargs):
+                        raise RuntimeError('send died')
+
+                    mq.send_sync = send_sync
+
+                    self.assertTrue(mq.send({'main': Frame(image, {}, 'BGR')}))  # queued, thread dies on it
+                    mq.io_threads[0].join()
+                    self.assertRaises(RuntimeError, mq.send, {'main': Frame(image, {}, 'BGR')})
+                    self.assertFalse(mq.send({'main': Frame(image, {}, 'BGR')}, 100))  # nothing goes out anymore
+
+                finally:
+                    mq.destroy()
+
+            finally:
+                receiver.destroy()
+
+        finally:
+            sender.destroy()
+
+
+    def test_mq_threads(self):
+        images = {f'cam{i}': np.full((60, 80, 3), i * 50, dtype=np.uint8) for i in range(4)}
+        sender = ThreadMQSender('ipc://test-send', 'sender', outs_jpg=True, mq_threads=3)
+
+        try:
+            mq = MQ('ipc://test-send', None, 'mq', outs_metrics=False, srcs_decode=True, mq_threads=3)
+
+            try:
+                self.assertEqual(MQ.codec_map(lambda a, b: a * b, [(i, 2) for i in range(10)], mq.codec_pool),
+                    [i * 2 for i in range(10)])
+
+                for i in range(3):
+                    sender.send({topic: Frame(image, {'count': i}, 'BGR') for topic, image in images.items()})
+
+                    frames = mq.recv(5000)
+
+                    self.assertEqual(list(frames), list(images))  # topic order is kept
+                    self.assertTrue(all(frame.has_jpg and frame.has_raw for frame in frames.values()))  # decoded already
+                    self.assertTrue(all(frames[t].shape == images[t].shape and frames[t].data == {'count': i} and
+                        np.abs(frames[t].image.astype(int) - images[t]).max() < 4 for t in images))
+
+            finally:
+                mq.destroy()
+
+            self.assertIsNone(mq.codec_pool)
+
+        finally:
+            sender.destroy()
+
+
+    def test_mq_raw(self):
+        image = np.arange(160 * 120 * 3, dtype=np.uint8).reshape(120, 160, 3)
+
+        sender = ThreadMQSender('ipc://test-send', 'sender', outs_jpg=True)
+
+        try:
+            receiver = ThreadMQReceiver('ipc://test-mq', 'receiver')
+
+            try:
+                mq = MQ('ipc://test-send', 'ipc://test-mq', 'mq', outs_metrics=False)
+
+                try:
+                    for i in range(3):
+                        sender.send({'main': Frame(image, {'count': i}, 'BGR')})
+
+                        topicmsgs = mq.recv_raw()
+
+                        self.assertEqual(topicmsgs['main'][0], {'img': [120, 160, 'BGR', 'jpg']})
+                        self.assertEqual(json_loads(bytes(topicmsgs['main'][2])), {'count': i})
+                        self.assertTrue(mq.send_raw(topicmsgs))
+
+                        recvd = receiver.recv()
+
+                        self.assertEqual(recvd['main'].data, {'count': i})
+                        self.assertEqual(bytes(recvd['main'].jpg), bytes(topicmsgs['main'][1]))  # same jpg passed through, not reencoded
+
+                finally:
+                    mq.destroy()
+
+            finally:
+                receiver.destroy()
+
+        finally:
+            sender.destroy()
+
+
+    def test_mq_inproc(self):
+        image = np.arange(160 * 120 * 3, dtype=np.uint8).reshape(120, 160, 3)
+
+        image.flags.writeable = False
+
+        sender = ThreadMQSender('inproc://test-send', 'sender', outs_jpg=True)
+
+        try:
+            receiver = ThreadMQReceiver('ipc://test-mq', 'receiver')
+
+            try:
+                mq = MQ('inproc://test-send', 'ipc://test-mq', 'mq', outs_metrics=False)
+
+                try:
+                    for i in range(3):
+                        sender.send(frames := {'main': Frame(image, {'count': i, 'sub': {}}, 'BGR')})
+
+                        recvd = mq.recv()
+
+                        self.assertIs(recvd['main'].image, image)  # by reference, not encoded or copied
+                        self.assertEqual(recvd, frames)
+
+                        recvd['main'].data['sub']['x'] = 1  # ours to modify
+
+                        self.assertEqual(frames['main'].data, {'count': i, 'sub': {}})
+
+                    sender.send({'main': Frame(image, {'count': 3}, 'BGR')})
+
+                    self.assertIsInstance((topicmsgs := mq.recv_raw())['main'][-1], Frame)
+                    self.assertTrue(mq.send_raw(topicmsgs))  # serialized for the ipc:// output
+
+                    self.assertEqual((recvd := receiver.recv()['main']).data, {'count': 3})
+                    self.assertTrue(recvd.has_jpg)  # outs_jpg applies again
+                    self.assertEqual(recvd.image.shape, image.shape)
+
+                finally:
+                    mq.destroy()
+
+            finally:
+                receiver.destroy()
+
+        finally:
+            sender.destroy()
+
+
+    def test_mq_subscribed_topics(self):
+        receiver = ThreadMQReceiver([('ipc://test-mq', [('main', 'main')])], 'receiver')
+
+        try:
+            mq = MQ(None, 'ipc://test-mq', 'mq', outs_metrics=False)
+
+            try:
+                self.assertIsNone(mq.subscribed_topics)
+
+                for i in range(3):  # 'other' would fail to encode if it was not skipped
+                    self.assertTrue(mq.send({'main': Frame({'count': i}), 'other': Frame({'bad': object()})}, 1000))
+                    self.assertEqual(receiver.recv(1000), {'main': Frame({'count': i})})
+                    self.assertEqual(mq.subscribed_topics, {'main'})
+
+            finally:
+                mq.destroy()
+
+        finally:
+            receiver.destroy()
+
+
+    def test_mq_delivery_variants(self):
+        self.assertEqual(MQ.delivery_variant({'noimage': True, 'maxsize': 10}), 'noimage')
+        self.assertEqual(MQ.delivery_variant({'maxsize': '64x32', 'jpg': False}), 'maxsize=64x32,raw')
+        self.assertEqual(MQ.delivery_variant({'maxsize': 64}), 'maxsize=64x64')
+        self.assertIsNone(MQ.delivery_variant({'noimage': False}))
+        self.assertRaises(ValueError, MQ.delivery_variant, {'bogus': True})
+        self.assertRaises(ValueError, MQ.delivery_variant, {'maxsize': 'x'})
+
+        image    = np.random.randint(0, 256, (90, 160, 3), dtype=np.uint8)
+        plain    = ThreadMQReceiver([('ipc://test-mq', [('main', 'main')])], 'plain')
+        noimage  = ThreadMQReceiver([('ipc://test-mq', [('main', 'main')], {'noimage': True})], 'noimage')
+        noimage2 = ThreadMQReceiver([('ipc://test-mq', None, {'noimage': True})], 'noimage2')
+        small    = ThreadMQReceiver([('ipc://test-mq', [('main', 'main')], {'maxsize': '64x64', 'jpg': False})], 'small')
+
+        try:
+            mq = MQ(None, 'ipc://test-mq', 'mq', outs_jpg=False, outs_metrics=False,
+                outs_required=['plain', 'noimage', 'noimage2', 'small'])
+
+            try:
+                for i in range(3):
+                    self.assertTrue(mq.send({'main': Frame(image, {'count': i}, 'BGR')}, 5000))
+
+                    self.assertEqual(plain.recv(1000), {'main': Frame(image, {'count': i}, 'BGR')})
+                    self.assertEqual(noimage.recv(1000), {'main': Frame({'count': i})})
+                    self.assertEqual(noimage2.recv(1000), {'main': Frame({'count': i})})
+
+                    frame = small.recv(1000)['main']
+
+                    self.assertEqual((frame.shape, frame.has_jpg, frame.data), ((36, 64, 3), False, {'count': i}))
+
+                self.assertEqual(sorted(mq.sender.variants('main')), ['maxsize=64x64,raw', 'noimage'])  # both noimage share
+
+            finally:
+                mq.destroy()
+
+        finally:
+            small.destroy()
+            noimage2.destroy()
+            noimage.destroy()
+            plain.destroy()
+
+
+    def test_mq_delivery_where(self):
+        self.assertEqual(MQ.delivery_variant({'noimage': True, 'where': ' a.b  &c>=1 '}), 'where=a.b&c>=1,noimage')
+        self.assertRaises(ValueError, MQ.delivery_variant, {'where': 'a&'})
+        self.assertRaises(ValueError, MQ.delivery_variant, {'where': 'a<b'})
+        self.assertRaises(ValueError, MQ.delivery_variant, {'where': 'a/b'})
+        self.assertRaises(ValueError, MQ.delivery_variant, {'where': 1})
+
+        where = MQ.where_func('meta.plates & meta.score>=0.5 & meta.kind=car & meta.ids.1?')
+        data  = {'meta': {'plates': ['ABC'], 'score': 0.5, 'kind': 'car', 'ids': [1, None]}}
+
+        self.assertTrue(where(data))
+        self.assertFalse(where({'meta': {**data['meta'], 'plates': []}}))
+        self.assertFalse(where({'meta': {**data['meta'], 'score': 0.4}}))
+        self.assertFalse(where({'meta': {**data['meta'], 'score': True}}))
+        self.assertFalse(where({'meta': {**data['meta'], 'kind': 'bus'}}))
+        self.assertFalse(where({'meta': {**data['meta'], 'ids': [1]}}))
+        self.assertFalse(where({}))
+        self.assertTrue(MQ.where_func('n=1')({'n': 1}))
+        self.assertFalse(MQ.where_func('n=1')({'n': True}))
+        self.assertTrue(MQ.where_func('s="1"')({'s': '1'}))
+
+        plain = ThreadMQReceiver([('ipc://test-mq', [('main', 'main')])], 'plain')
+        where = ThreadMQReceiver([('ipc://test-mq', [('main', 'main')], {'where': 'plates', 'noimage': True})], 'where')
+
+        try:
+            mq = MQ(None, 'ipc://test-mq', 'mq', outs_metrics=False, outs_required=['plain', 'where'])
+
+            try:
+                for i in range(6):
+                    self.assertTrue(mq.send({'main': Frame({'count': i, 'plates': ['ABC'] if i % 3 == 2 else []})}, 5000))
+                    self.assertEqual(plain.recv(1000)['main'].data['count'], i)
+
+                self.assertEqual(where.recv(1000), {'main': Frame({'count': 2, 'plates': ['ABC']})})
+                self.assertEqual(where.recv(1000), {'main': Frame({'count': 5, 'plates': ['ABC']})})
+                self.assertRaises(Empty, where.recv, 100)
+
+            finally:
+                mq.destroy()
+
+        finally:
+            where.destroy()
+            plain.destroy()
+
+
+    def test_mq_codecs(self):
+        image = np.zeros((90, 160, 3), dtype=np.uint8)
+        image[20:60, 40:120] = (50, 100, 200)
+        frame = Frame(image, {'a': 1}, 'BGR')
+        gray  = Frame(image[..., 2].copy(), {'b': 2}, 'GRAY')
+
+        for codec, lossless in [('raw', True), ('raw+zlib', True), ('png', True), ('webp:101', True), ('jpg:70', False),
+                ('webp', False)]:
+            msgs = MQ.frames2topicmsgs({'main': frame, 'gray': gray}, codec)
+
+            self.assertEqual(msgs['main'][0]['img'][3], codec.partition(':')[0])
+
+            frames = MQ.topicmsgs2frames(msgs)
+
+            for topic, f in [('main', frame), ('gray', gray)]:
+                self.assertEqual((frames[topic].shape, frames[topic].format, frames[topic].data), (f.shape, f.format, f.data))
+
+                if lossless:
+                    self.assertTrue(np.array_equal(frames[topic].image, f.image))
+                else:
+                    self.assertLess(np.abs(frames[topic].image.astype(int) - f.image).mean(), 4)
+
+        msgs = MQ.frames2topicmsgs({'main': frame, 'gray': gray}, {'gray': 'png', '*': True})
+
+        self.assertEqual((msgs['main'][0]['img'][3], msgs['gray'][0]['img'][3]), ('jpg', 'png'))
+        self.assertEqual(MQ.delivery_variant({'codec': ' png:3 ', 'maxsize': 64}), 'maxsize=64x64,codec=png:3')
+        self.assertRaises(ValueError, MQ.delivery_variant, {'codec': 'bogus'})
+        self.assertRaises(ValueError, MQ.delivery_variant, {'codec': 'jpg:x'})
+        self.assertRaises(ValueError, MQ.delivery_variant, {'codec': 'png', 'jpg': True})
+        self.assertRaises(ValueError, MQ, None, [('ipc://test-mq', {'where': 'a'})], outs_metrics=False)
+
+        plain = ThreadMQReceiver([('ipc://test-mq-b', [('main', 'main')])], 'plain')
+        png   = ThreadMQReceiver([('ipc://test-mq-a', [('main', 'main')])], 'png')
+        raw   = ThreadMQReceiver([('ipc://test-mq-a', [('main', 'main')], {'codec': 'raw'})], 'raw')
+
+        try:
+            mq = MQ(None, [('ipc://test-mq-a', {'codec': 'png'}), 'ipc://test-mq-b'], 'mq', outs_codec='jpg:90',
+                outs_metrics=False, outs_required=['plain', 'png', 'raw'])
+
+            try:
+                for i in range(3):
+                    self.assertTrue(mq.send({'main': Frame(image, {'i': i}, 'BGR')}, 5000))
+
+                    self.assertTrue(plain.recv(1000)['main'].has_jpg)  # outs_codec
+                    self.assertEqual(png.recv(1000), {'main': Frame(image, {'i': i}, 'BGR')})  # output option
+                    self.assertEqual(raw.recv(1000), {'main': Frame(image, {'i': i}, 'BGR')})  # delivery option
+
+                self.assertEqual(sorted(mq.sender.variants('main')), ['codec=png', 'codec=raw'])
+
+            finally:
+                mq.destroy()
+
+        finally:
+            raw.destroy()
+            png.destroy()
+            plain.destroy()
+
+
+    def test_mq_crops(self):
+        image  = np.random.randint(0, 256, (90, 160, 3), dtype=np.uint8)
+        frame  = Frame(image, {'a': 1}, 'BGR').ro
+        crops  = {f'plate{i}': frame.crop(i * 20, i * 10, 16, 8, {'i': i}) for i in range(3)}
+        frames = {'main': frame, **crops}
+        msgs   = MQ.frames2topicmsgs(frames, False, variants=lambda t: ['crops'])
+
+        self.assertEqual(MQ.delivery_variant({'crops': True, 'jpg': False}), 'raw,crops')
+        self.assertEqual(msgs['plate1'][0]['img'][3], 'raw')  # plain, no parent reference
+        self.assertEqual(msgs['!crops!plate1'][0], {'img': [8, 16, 'BGR', 'box'], 'box': ['main', 20, 10]})
+        self.assertEqual(MQ.topicmsgs2frames({t[7:]: m for t, m in msgs.items() if t.startswith('!crops!')}), frames)
+        self.assertEqual(MQ.topicmsgs2frames({t[7:]: m for t, m in msgs.items() if t.startswith('!crops!plate')}), {})
+        self.assertEqual(MQ.frames2topicmsgs(crops, False, variants=lambda t: ['crops'])['!crops!plate1'][0]['img'][3],
+            'raw')  # parent not in message
+
+        plain = ThreadMQReceiver([('ipc://test-mq', [('plate1', 'plate1')])], 'plain')
+        boxes = ThreadMQReceiver([('ipc://test-mq', [('main', 'cam'), ('plate1', 'plate1')], {'crops': True})], 'boxes')
+
+        try:
+            mq = MQ(None, 'ipc://test-mq', 'mq', outs_jpg=False, outs_metrics=False, outs_required=['plain', 'boxes'])
+
+            try:
+                self.assertTrue(mq.send(frames, 5000))
+                self.assertEqual(plain.recv(1000), {'plate1': crops['plate1']})
+                self.assertEqual(frames := boxes.recv(1000), {'cam': frame, 'plate1': crops['plate1']})
+                self.assertIs(frames['plate1'].parent, frames['cam'])
+
+            finally:
+                mq.destroy()
+
+        finally:
+            boxes.destroy()
+            plain.destroy()
+
+
+    def test_mq_yuv(self):
+        yuv    = np.random.randint(0, 256, (135, 160), dtype=np.uint8)
+        frame  = Frame(yuv, {'a': 1}, 'NV12').ro
+        msgs   = MQ.frames2topicmsgs({'main': frame}, False, variants=lambda t: ['jpg', 'maxsize=80x45'])
+
+        self.assertEqual(msgs['main'][0], {'img': [90, 160, 'NV12', 'raw']})
+        self.assertEqual(len(msgs['main'][1]), 135 * 160)
+        self.assertEqual(MQ.topicmsgs2frames({'main': msgs['main']}), {'main': frame})
+        self.assertEqual(msgs['!jpg!main'][0], {'img': [90, 160, 'BGR', 'jpg']})
+        self.assertEqual(MQ.topicmsgs2frames({'main': msgs['!jpg!main']})['main'].shape, (90, 160, 3))
+        self.assertEqual(msgs['!maxsize=80x45!main'][0], {'img': [45, 80, 'BGR', 'raw']})
+        self.assertEqual(MQ.frames2topicmsgs({'main': frame}, False, delta=DeltaEncoder())['main'][0]['img'][2], 'NV12')
+        self.assertEqual(MQ.frames2topicmsgs({'main': frame}, False, planar=False)['main'][0], {'img': [90, 160, 'BGR', 'raw']})
+
+        recvr = ThreadMQReceiver('ipc://test-mq', 'recvr')
+
+        try:
+            mq = MQ(None, 'ipc://test-mq', 'mq', outs_jpg=False, outs_metrics=False, outs_required=['recvr'])
+
+            try:
+                self.assertTrue(mq.send({'main': frame}, 5000))
+                self.assertEqual((frames := recvr.recv(1000))['main'].format, 'NV12')
+                self.assertEqual(frames, {'main': frame})
+
+                sub = zmq.Context.instance().socket(zmq.SUB)  # an outside reader, or a receiver from before NV12
+
+                try:
+                    sub.connect('ipc://test-mq')
+                    sub.setsockopt(zmq.SUBSCRIBE, b'/main/')
+
+                    sleep(0.1)
+
+                    self.assertTrue(mq.send({'main': frame}, 5000))
+                    self.assertEqual((frames := recvr.recv(1000))['main'].format, 'BGR')
+                    self.assertEqual(json_loads(sub.recv_multipart()[1])['xtra']['img'], [90, 160, 'BGR', 'raw'])
+
+                finally:
+                    sub.close()
+
+            finally:
+                mq.destroy()
+
+        finally:
+            recvr.destroy()
+
+
+    def test_mq_data_json(self):
+        image  = np.random.randint(0, 256, (90, 160, 3), dtype=np.uint8)
+        js     = b'{"meta": {"id": 1}, "dets": [1, 2]}'  # not compact, so we can tell it is the original
+        frames = MQ.topicmsgs2frames({'main': [{'img': [90, 160, 'BGR', 'raw']}, image.tobytes(), js], 'd': [None, js]})
+        msgs   = MQ.frames2topicmsgs(frames, False, variants=lambda t: ['where=meta.id', 'noimage'])
+
+        self.assertEqual(frames['main'].ro_data, {'meta': {'id': 1}, 'dets': [1, 2]})
+        self.assertIs(msgs['main'][2], js)  # passed through as is
+        self.assertIs(msgs['d'][1], js)
+        self.assertIs(msgs['!where=meta.id!main'][2], js)
+        self.assertIs(msgs['!noimage!main'][1], js)
+
+        frames['main'].data['dets'].append(3)
+
+        self.assertEqual(MQ.frames2topicmsgs(frames, False)['main'][2], b'{"meta":{"id":1},"dets":[1,2,3]}')
+        self.assertIs(MQ.frames2topicmsgs(frames, False)['d'][1], js)
+        self.assertRaises(ValueError, MQ.topicmsgs2frames, {'d': [None, b'{"meta": ']})
+
+
+    def test_mq_delta(self):
+        image = np.random.randint(0, 256, (90, 150, 3), dtype=np.uint8)  # not whole tiles
+        enc   = DeltaEncoder(3, 32)
+        drops = []
+        dec   = DeltaDecoder(lambda *args: drops.append(args))
+
+        for i in range(5):
+            image = image.copy()
+            image[i * 10 : i * 10 + 5, 20:30] = 255 - image[i * 10 : i * 10 + 5, 20:30]
+            msgs  = MQ.frames2topicmsgs({'main': Frame(image, {'i': i}, 'BGR')}, False, delta=enc)
+
+            self.assertEqual(msgs['main'][0]['img'][3], 'raw' if i % 3 == 0 else 'dlt')
+            self.assertEqual(MQ.topicmsgs2frames(msgs, dec), {'main': Frame(image, {'i': i}, 'BGR')})
+
+        self.assertLess(len(msgs['main'][1]), image.nbytes // 4)
+        self.assertEqual(MQ.topicmsgs2frames(msgs, DeltaDecoder(lambda *args: drops.append(args))), {})  # no keyframe
+        self.assertEqual(drops, [('nokey', 'main')])
+
+        gray = Frame(image[..., 0].copy(), {}, 'GRAY')
+        msgs = MQ.frames2topicmsgs({'main': gray}, False, delta=enc)  # format changed, so keyframe
+
+        self.assertEqual(MQ.topicmsgs2frames(msgs, dec), {'main': gray})
+        self.assertEqual(MQ.topicmsgs2frames(MQ.frames2topicmsgs({'main': gray}, True, delta=enc), dec)['main'].shape,
+            (90, 150))
+
+        enc   = DeltaEncoder(10, 32)
+        small = image.copy()
+        small[5, 5, 0] ^= 1  # far below MQ_DELTA_THRESH, but raw must stay lossless
+
+        for frame in (Frame(image, {}, 'BGR'), Frame(small, {}, 'BGR')):
+            self.assertEqual(MQ.topicmsgs2frames(MQ.frames2topicmsgs({'main': frame}, False, delta=enc), dec),
+                {'main': frame})
+
+        self.assertEqual(len(enc.keys['main'][3].shape), 3)  # exact keyframe, not averages
+
+        recvr = ThreadMQReceiver([('ipc://test-mq', [('main', 'main')])], 'recvr')
+
+        try:
+            mq = MQ(None, 'ipc://test-mq', 'mq', outs_jpg=False, outs_delta=4, outs_metrics=False,
+                outs_required=['recvr'])
+
+            try:
+                for i in range(6):
+                    image = image.copy()
+                    image[50:60, i * 10 : i * 10 + 10] = i
+
+                    self.assertTrue(mq.send({'main': Frame(image, {'i': i}, 'BGR')}, 5000))
+                    self.assertEqual(recvr.recv(1000), {'main': Frame(image, {'i': i}, 'BGR')})
+
+                listener = ThreadMQReceiver([('ipc://test-mq??', [('main', 'main')])], 'listener')
+
+                try:
+                    sleep(0.2)
+
+                    for i in range(3):  # the '??' listener (not) connecting makes the next image a keyframe
+                        self.assertTrue(mq.send({'main': Frame(image, {'i': i}, 'BGR')}, 5000))
+                        self.assertEqual(recvr.recv(1000), {'main': Frame(image, {'i': i}, 'BGR')})
+
+                    self.assertTrue(np.array_equal(listener.recv(1000)['main'].image, image))
+
+                finally:
+                    listener.destroy()
+
+            finally:
+                mq.destroy()
+
+        finally:
+            recvr.destroy()
+
+
+    def test_mq_metrics_agg(self):
+        agg = MetricsAggregator(0, True)
+
+        self.assertEqual(agg.add({'ts': 1.0, 'fps': 10, 'frame_count': 3, 's': 'a'}), {'ts': 1.0, 'fps': 10.0,
+            'fps_min': 10, 'fps_max': 10, 'fps_p50': 10, 'fps_p90': 10, 'fps_p99': 10, 'frame_count': 3, 's': 'a'})
+
+        agg = MetricsAggregator(3600, True)
+
+        for i in range(100):
+            self.assertIsNone(agg.add({'ts': float(i), 'fps': i, 'frame_count': i}))
+
+        agg.t = 0
+
+        self.assertEqual(agg.add({'ts': 100.0, 'fps': 100, 'frame_count': 100}), {'ts': 100.0, 'fps': 50.0,
+            'fps_min': 0, 'fps_max': 100, 'fps_p50': 50, 'fps_p90': 90, 'fps_p99': 99, 'frame_count': 100})
+        self.assertEqual(MetricsAggregator(0).add({'fps': 1, 'lat_in': 2}), {'fps': 1.0, 'lat_in': 2.0})
+
+        listener = ThreadMQReceiver([('ipc://test-mq-metrics??', [('_metrics', '_metrics')])], 'listener')  # passive
+
+        try:
+            mq = MQ(None, None, 'mq', outs_metrics='ipc://test-mq-metrics', metrics_agg=0.25)
+
+            try:
+                for i in range(60):
+                    self.assertTrue(mq.send({'main': Frame({'i': i})}))
+                    sleep(0.01)
+
+                metrics = []
+
+                while True:
+                    try:
+                        metrics.append(listener.recv(500)['_metrics'].data)
+                    except Empty:
+                        break
+
+                self.assertTrue(1 <= len(metrics) <= 4)
+                self.assertTrue(all(m['fps_min'] <= m['fps_p50'] <= m['fps_max'] for m in metrics))
+
+            finally:
+                mq.destroy()
+
+        finally:
+            listener.destroy()
+
+        recvr = ThreadMQReceiver([('ipc://test-mq', [('_metrics', '_metrics')])], 'recvr')  # only metrics, in band
+
+        try:
+            mq = MQ(None, 'ipc://test-mq', 'mq', outs_metrics=True, metrics_agg=0.25, outs_required=['recvr'])
+
+            try:
+                t = time()
+
+                for i in range(60):
+                    self.assertTrue(mq.send({'main': Frame({'i': i})}, 5000))
+                    sleep(0.01)
+
+                recvd = []
+
+                while True:
+                    try:
+                        recvd.append(list(recvr.recv(500)))
+                    except Empty:
+                        break
+
+                self.assertTrue(1 <= len(recvd) <= (time() - t) / 0.25 + 1)  # once per interval, not per message
+                self.assertTrue(all(topics == ['_metrics'] for topics in recvd))  # never woken for nothing
+
+            finally:
+                mq.destroy()
+
+        finally:
+            recvr.destroy()
+
+
+    def test_mq_count_drop(self):
+        mq = MQ(None, None, 'mq', metrics_cb=lambda metrics: None)
+
+        try:
+            mq.count_drop('busy', 'main', 2)
+            mq.count_drop('lost')
+
+            self.assertTrue(mq.send({'main': Frame({})}))
+            self.assertEqual(mq.metrics['drop_main_busy_count'], 2)
+            self.assertEqual(mq.metrics['drop_lost_count'], 1)
+            self.assertEqual(mq.metrics['drop_count'], 3)
+
+        finally:
+            mq.destroy()
+
+
+    def test_mq_stop_evt(self):
+        for kwargs in ({}, {'srcs_prefetch': 2, 'outs_thread': True}):
+            stop_evt = Event()
+            mq       = MQ('ipc://test-send', 'ipc://test-mq', 'mq', outs_metrics=False, stop_evt=stop_evt, **kwargs)
+
+            try:
+                Timer(0.2, stop_evt.set).start()
+
+                t = time()
+
+                self.assertIsNone(mq.recv())  # nothing upstream, would wait forever
+                self.assertLess(time() - t, 2)
+                self.assertIsNone(mq.recv())
+                self.assertFalse(mq.send({'main': Frame({})}))  # and nothing downstream
+
+            finally:
+                mq.destroy()
+
+        mq          = MQ(None, None, 'mq', outs_metrics=False, stop_evt=Event())  # never stopped, destroy ends its thread
+        stop_thread = mq.stop_thread
+
+        mq.destroy()
+
+        self.assertFalse(stop_thread.is_alive())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,13 +2,22 @@
 
 import logging
 import os
+import subprocess
+import sys
 import unittest
+from json import dumps as json_dumps
 from queue import Queue
 from random import randint
-from threading import Thread
-from time import sleep
+from threading import Thread, Timer
+from time import sleep, time
 
-from openfilter.filter_runtime.zeromq import ZMQStateRecv, ZMQStateSend, ZMQReceiver, ZMQSender, logger as zeromq_logger
+import numpy as np
+import zmq
+
+from openfilter.filter_runtime import zeromq
+from openfilter.filter_runtime.utils import sanitize_filename
+from openfilter.filter_runtime.zeromq import ZMQStateRecv, ZMQStateSend, ZMQEnvelope, ZMQReceiver, ZMQSender, \
+    ZMQWaker, ZMQInprocStore, CODECS, ROUTER_PREFIX, ZMQ_SHM_MIN_SIZE, ZMQ_SHM_PATH, ZMQ_SHM_SLOTS, logger as zeromq_logger
 
 zeromq_logger.setLevel(int(getattr(logging, (os.getenv('LOG_LEVEL') or 'CRITICAL').upper())))
 
@@ -135,6 +144,45 @@ class TestZeroMQOld(unittest.TestCase):
             sendt.join()
 
 
+class TestZeroMQEnvelope(unittest.TestCase):
+    def test_envelope(self):
+        envb = ZMQEnvelope('server', topics := ['main', 'other', '_metrics'])
+        cache = [b'', None, None]
+
+        for env in [
+            {'sid': 'server', 'mid': 0, 'topics': topics},
+            {'sid': 'server', 'mid': 1, 'topics': topics, 'xtra': {'img': [720, 1280, 'BGR', 'jpg']}},
+            {'sid': 'server', 'mid': 2, 'topics': topics, 'xtra': {'img': [1, 2, 'GRAY', 'raw']}, 'bal': 3},
+            {'sid': 'server', 'mid': 3, 'topics': topics, 'xtra': {'img': [1, 2, 'GRAY', 'raw'], 'more': 1}},
+            {'sid': 'server', 'mid': 4, 'topics': topics, 'xtra': 'oob', 'shm': [None, ['name', 1, 100]]},
+        ]:
+            self.assertEqual(ZMQEnvelope.loads(buf := envb.dumps(env), cache), env)
+            self.assertEqual(ZMQEnvelope.loads(buf), env)
+            self.assertEqual(ZMQEnvelope.loads(buf, cache), env)  # from cache
+            self.assertLess(len(buf), len(json_dumps(env, separators=(',', ':'))))
+
+        self.assertEqual(ZMQEnvelope.loads(b'{"sid":"s","mid":-3}'), {'sid': 's', 'mid': -3})
+        self.assertEqual(ZMQEnvelope('server').dumps({'sid': 'server', 'mid': -4}), ZMQEnvelope('server').dumps({'sid': 'server', 'mid': -4}))
+        self.assertEqual(ZMQEnvelope.loads(ZMQEnvelope('server').dumps({'sid': 'server', 'mid': -4})), {'sid': 'server', 'mid': -4})
+
+        for req in [
+            {'cid': 'client', 'mid': -1},
+            {'cid': 'client', 'uid': 'abc', 'mid': 5, 'eph': 2, 'new': True},
+            {'cid': 'client', 'uid': 'abc', 'mid': -2, 'eph': 1, 'xtra': ['exit'], 'rel': [['name', 1]]},
+        ]:
+            self.assertEqual(ZMQEnvelope.loads_req(ZMQEnvelope.dumps_req(req)), {**req, 'env': 1})
+
+        self.assertEqual(ZMQEnvelope.loads_req(b'{"cid":"c","mid":0}'), {'cid': 'c', 'mid': 0})
+
+
+class TestZeroMQBalance(unittest.TestCase):
+    def test_least_loaded(self):
+        self.assertEqual(ZMQSender.least_loaded([(50, 0, 'a'), (20, 1, 'b'), (25, 2, 'c')]), 'b')
+        self.assertEqual(ZMQSender.least_loaded([(20, 3, 'a'), (25, 1, 'b'), (90, 0, 'c')]), 'b')  # about the same load, order decides
+        self.assertEqual(ZMQSender.least_loaded([(0, 2, 'a'), (0, 1, 'b')]), 'b')  # unknown service times
+        self.assertEqual(ZMQSender.least_loaded([(100, 2, 'a'), (140, 1, 'b'), (210, 0, 'c')]), 'b')  # relative slack
+
+
 class TestZeroMQTCP(unittest.TestCase):
     """This test was written before the ZMQ_CONN_HANDSHAKE mechanism was implemented. Which changes the startup, but
     does not invalidate the packet flow expected in these tests. For this reason the test is left as it is still very
@@ -155,6 +203,8 @@ class TestZeroMQTCP(unittest.TestCase):
     CLIENT2 = 'tcp://127.0.0.1:5552'
     CLIENT3 = 'tcp://127.0.0.1:5554'
 
+    LINK_NBYTES = 5000  # minimum bytes on the socket in test_link_stats
+
 
     def test_send_recv(self):
         sendr = ZMQSender(self.SERVER1, 'server')
@@ -180,6 +230,437 @@ class TestZeroMQTCP(unittest.TestCase):
             sendr.destroy()
 
 
+    def test_envelope_negotiation(self):
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr  = ZMQReceiver(self.CLIENT1, 'client')
+            recvr2 = ZMQReceiver(self.CLIENT1 + '??', 'client2')  # passive listener must understand whatever is sent
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+                self.assertEqual(recvl(recvr2, timeout=0), None)
+
+                sleep(0.1)
+
+                for i in range(5):
+                    self.assertEqual(send(sendr, d := {'main': [{'img': [1, 2, 'GRAY', 'raw']}, b'ab', b'data']}, timeout=1000), i + 1)
+                    self.assertEqual(recvl(recvr, timeout=1000), (i, d))
+                    self.assertEqual(recvl(recvr2, timeout=1000), (i, d))
+
+                self.assertEqual(len(sendr.env_clients), 1)
+                self.assertTrue(next(iter(recvr.senders.values())).env_bin)
+                self.assertTrue(next(iter(recvr2.senders.values())).env_bin)  # got binary without asking for it
+
+            finally:
+                recvr2.destroy()
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_envelope_outside_reader(self):
+        if self.SERVER1.startswith('inproc://'):
+            self.skipTest('no connection counts on inproc://')
+
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr = ZMQReceiver(self.CLIENT1, 'client')
+            sub   = zmq.Context.instance().socket(zmq.SUB)  # outside reader which never sends requests
+
+            try:
+                sub.connect(self.CLIENT1.replace('shm://', 'ipc://'))
+                sub.setsockopt(zmq.SUBSCRIBE, b'')
+
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                for i in range(5):
+                    self.assertEqual(send(sendr, d := {'main': [None, b'data']}, timeout=1000), i + 1)
+                    self.assertEqual(recvl(recvr, timeout=1000), (i, d))
+
+                    while sub.poll(100):
+                        self.assertEqual(sub.recv_multipart()[1][:1], b'{')  # always JSON for it
+
+                self.assertFalse(sendr.env_binary(sendr.pubs[0]))
+
+                sub.close()
+
+                sleep(0.1)
+
+                for i in range(5, 8):
+                    self.assertEqual(send(sendr, d := {'main': [None, b'data']}, timeout=1000), i + 1)
+                    self.assertEqual(recvl(recvr, timeout=1000), (i, d))
+
+                self.assertTrue(sendr.env_binary(sendr.pubs[0]))  # only negotiated receivers left
+                self.assertTrue(next(iter(recvr.senders.values())).env_bin)
+
+            finally:
+                sub.close()
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_compress(self):
+        data  = json_dumps([{'label': 'person', 'box': [i, i + 1, i + 10, i + 20]} for i in range(500)]).encode()
+        drops = []
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr  = ZMQReceiver(self.CLIENT1, 'client', compress=True, on_drop=lambda *args: drops.append(args))
+            recvr2 = ZMQReceiver(self.CLIENT1 + '??', 'client2')  # passive listener decompresses without asking
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+                self.assertEqual(recvl(recvr2, timeout=0), None)
+
+                sleep(0.1)
+
+                for i in range(3):
+                    d = {'main': [{'img': [1, 2, 'GRAY', 'raw']}, b'ab', data], 'small': [None, b'{"a":1}'], 'none': [None]}
+
+                    self.assertEqual(send(sendr, d, timeout=1000), i + 1)
+                    self.assertEqual(recvl(recvr, timeout=1000), (i, d))
+                    self.assertEqual(recvl(recvr2, timeout=1000), (i, d))
+
+                self.assertEqual(sendr.pub_codec(sendr.pubs[0]), next(iter(CODECS)) if self.SERVER1.startswith('tcp://') else None)
+
+                if self.SERVER1.startswith('tcp://'):  # too big to decompress is dropped instead of blowing up
+                    zeromq.ZMQ_DECOMPRESS_MAX, decompress_max = len(data) - 1, zeromq.ZMQ_DECOMPRESS_MAX
+
+                    try:
+                        self.assertEqual(send(sendr, d, timeout=1000), 4)
+                        self.assertEqual(recvl(recvr, timeout=100), None)
+
+                    finally:
+                        zeromq.ZMQ_DECOMPRESS_MAX = decompress_max
+
+                    self.assertEqual(send(sendr, d, timeout=1000), 5)
+                    self.assertEqual(recvl(recvr, timeout=1000), (4, d))
+                    self.assertEqual(drops, [('decompress', 'main', 1), ('lost', None, 1)])  # the rest of message 3 never completed
+
+                cmsg = ZMQSender.compress_msg([None, data], 'zlib')
+
+                self.assertLess(len(cmsg[1]), len(data))
+                self.assertEqual(CODECS['zlib'][1](cmsg[1], len(data)), data)
+                self.assertRaises(ValueError, CODECS['zlib'][1], cmsg[1], len(data) - 1)  # bigger than allowed
+                self.assertRaises(ValueError, CODECS['zlib'][1], cmsg[1][:-10], len(data))  # truncated
+                self.assertIsNone(ZMQSender.compress_msg([None, b'{"a":1}'], 'zlib'))  # too small
+                self.assertIsNone(ZMQSender.compress_msg([{'img': [1, 2, 'GRAY', 'raw']}, data], 'zlib'))  # image, no data
+
+            finally:
+                recvr2.destroy()
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_window(self):
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr = ZMQReceiver(self.CLIENT1, 'client', window=4)
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                for j in range(3):
+                    for i in range(j * 4, j * 4 + 4):  # can send up to window without anything being received
+                        self.assertEqual(send(sendr, {'main': [None, str(i).encode()]}, timeout=1000), i + 1)
+
+                    self.assertEqual(send(sendr, {'main': [None, b'x']}, timeout=100), None)  # no more credit
+
+                    for i in range(j * 4, j * 4 + 4):
+                        self.assertEqual(recvl(recvr, timeout=1000), (i, {'main': [None, str(i).encode()]}))
+
+            finally:
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_link_stats(self):
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr = ZMQReceiver(self.CLIENT1, 'client')
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                for i in range(5):  # send after recv() is waiting so there is a round trip to measure
+                    (timer := Timer(0.02, send, (sendr, {'main': [None, b'x' * 1000]}), {'timeout': 1000})).start()
+
+                    self.assertEqual(recvl(recvr, timeout=1000), (i, {'main': [None, b'x' * 1000]}))
+
+                    timer.join()
+
+                out = sendr.link_metrics()
+                in_ = recvr.link_metrics()
+
+                self.assertEqual(set(out), {'out_client_bytes_count', 'out_client_bw', 'out_client_wait'})
+                self.assertEqual(set(in_), {'in_server_bytes_count', 'in_server_bw', 'in_server_wait', 'in_server_rtt'})
+                self.assertGreater(out['out_client_bytes_count'], self.LINK_NBYTES)
+                self.assertGreater(in_['in_server_bytes_count'], self.LINK_NBYTES)
+                self.assertGreaterEqual(out['out_client_wait'], 0)
+                self.assertGreaterEqual(in_['in_server_rtt'], 0)
+
+            finally:
+                recvr.destroy()
+
+            self.assertEqual(send(sendr, {'main': [None, b'x']}, timeout=200), None)  # sees the close
+            self.assertEqual(sendr.link_metrics(), {})  # stats of the gone client dropped
+
+        finally:
+            sendr.destroy()
+
+
+    def test_sub_topics(self):
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr = ZMQReceiver([(self.CLIENT1, [('main', 'main')])], 'client')
+            recv2 = ZMQReceiver([(self.CLIENT1 + '??', [('_metrics', '_metrics')])], 'client2')  # never requests
+
+            try:
+                self.assertIsNone(sendr.sub_topics)  # not known before first send
+
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                self.assertEqual(send(sendr, {'main': [None, b'm'], 'other': [None, b'o']}, timeout=1000), 1)
+                self.assertEqual(sendr.sub_topics, {'main', '_metrics'})
+                self.assertTrue(sendr.subscribed('main'))
+                self.assertTrue(sendr.subscribed('_metrics'))
+                self.assertFalse(sendr.subscribed('other'))
+                self.assertEqual(recvl(recvr, timeout=1000), (0, {'main': [None, b'm']}))
+
+                recv3 = ZMQReceiver(self.CLIENT1 + '??', 'client3')  # all topics
+
+                try:
+                    sleep(0.1)
+
+                    self.assertEqual(send(sendr, {'main': [None, b'm']}, timeout=1000), 2)
+                    self.assertIsNone(sendr.sub_topics)
+                    self.assertTrue(sendr.subscribed('other'))
+                    self.assertFalse(sendr.subscribed('_other'))  # hidden topics need explicit subscription
+                    self.assertEqual(recvl(recvr, timeout=1000), (1, {'main': [None, b'm']}))
+
+                finally:
+                    recv3.destroy()
+
+                sleep(0.1)
+
+                for i in range(2, 52):  # zeromq only notices the gone pipe on some later send
+                    self.assertEqual(send(sendr, {'main': [None, b'm']}, timeout=1000), i + 1)
+
+                    if sendr.sub_topics is not None:
+                        break
+
+                    self.assertEqual(recvl(recvr, timeout=1000), (i, {'main': [None, b'm']}))
+
+                    sleep(0.02)
+
+                self.assertEqual(sendr.sub_topics, {'main', '_metrics'})
+
+            finally:
+                recv2.destroy()
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_variants(self):
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr = ZMQReceiver([(self.CLIENT1, [('main', 'main')])], 'client')
+            recv2 = ZMQReceiver([(self.CLIENT1, None, 'small')], 'client2')
+            recv3 = ZMQReceiver([(self.CLIENT1 + '??', [('*', '*')])], 'client3')  # must not see others' variants
+
+            try:
+                self.assertRaises(ValueError, ZMQReceiver, [(ROUTER_PREFIX + self.CLIENT1, None, 'small')], 'bad')
+
+                self.assertEqual(recvl(recvr, timeout=0), None)
+                self.assertEqual(recvl(recv2, timeout=0), None)
+
+                sleep(0.1)
+
+                made = []
+
+                def topicmsgs():  # like MQ, the variants are made only for the topics which have subscribers for them
+                    made.append(variants := {t: sendr.variants(t) for t in ('main', 'other')})
+
+                    return {'main': [None, b'm'], 'other': [None, b'o'],
+                        **{f'!{v}!{t}': [None, b'v' + t.encode()] for t, vs in variants.items() for v in vs}}
+
+                for i in range(3):
+                    self.assertEqual(send(sendr, topicmsgs, timeout=1000), i + 1)
+                    self.assertEqual(made[-1], {'main': ['small'], 'other': ['small']})
+                    self.assertEqual(recvl(recvr, timeout=1000), (i, {'main': [None, b'm']}))
+                    self.assertEqual(recvl(recv2, timeout=1000), (i, {'main': [None, b'vmain'], 'other': [None, b'vother']}))
+                    self.assertEqual(recvl(recv3, timeout=1000), (i, {'main': [None, b'm'], 'other': [None, b'o']}))
+
+                self.assertEqual(sendr.sub_topics, None)
+                self.assertTrue(sendr.subscribed('main'))
+                self.assertEqual(sendr.variants('_metrics'), [])  # hidden topics need explicit subscription
+
+            finally:
+                recv3.destroy()
+                recv2.destroy()
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_variants_left_out(self):
+        drops = []
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr = ZMQReceiver([(self.CLIENT1, [('main', 'main'), ('other', 'other')], 'some')], 'client',
+                on_drop=lambda *args: drops.append(args))
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                for i, vtopics, res in [
+                    (0, ('main', 'other'), {'main': [None, b'main0'], 'other': [None, b'other0']}),
+                    (1, (), None),  # left out entirely, skipped and acknowledged so the sender can go on
+                    (2, ('other',), {'other': [None, b'other2']}),
+                    (3, (), None),
+                    (4, (), None),
+                    (5, ('main',), {'main': [None, b'main5']}),
+                ]:
+                    self.assertEqual(send(sendr, {'main': [None, b'm'], 'other': [None, b'o'],
+                        **{f'!some!{t}': [None, f'{t}{i}'.encode()] for t in vtopics}}, timeout=1000), i + 1)
+                    self.assertEqual(recvl(recvr, timeout=1000 if res else 100), res and (i, res))
+
+                self.assertEqual(drops, [])  # skipped message ids are not lost
+
+            finally:
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_on_drop(self):
+        drops = []
+        sendr = ZMQSender(self.SERVER1, 'server', on_drop=lambda *args: drops.append(('send', *args)))
+
+        try:
+            recvr = ZMQReceiver(self.CLIENT1, 'client', on_drop=lambda *args: drops.append(('recv', *args)))
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                self.assertEqual(send(sendr, {'main': [None, b'0']}, timeout=1000), 1)
+                self.assertEqual(recvl(recvr, timeout=1000), (0, {'main': [None, b'0']}))
+                self.assertEqual(send(sendr, {'main': [None, b'x']}, sendstate(0), timeout=100), 1)  # already sent
+                self.assertEqual(drops, [('send', 'outdated', 'main', 1)])
+
+                self.assertEqual(send(sendr, {'main': [None, b'5']}, sendstate(5), timeout=1000), 6)
+                self.assertEqual(recvl(recvr, timeout=1000), (5, {'main': [None, b'5']}))
+                self.assertEqual(drops[1:], [('recv', 'lost', None, 4)])  # 1..4 never arrived
+
+            finally:
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_waker(self):
+        waker = ZMQWaker()
+        sendr = ZMQSender(self.SERVER1, 'server', outs_required=['nobody'], waker=waker)  # never sends
+
+        try:
+            recvr = ZMQReceiver(self.CLIENT1, 'client', waker=waker)
+
+            try:
+                for wait in (lambda: send(sendr, {'main': [None, b'0']}), lambda: recvl(recvr)):  # neither can ever finish
+                    Timer(0.2, waker.wake).start()
+
+                    t = time()
+
+                    self.assertEqual(wait(), None)
+                    self.assertLess(time() - t, 2)
+                    self.assertEqual(wait(), None)  # stays set
+
+                    waker.clear()
+
+            finally:
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+            waker.close()
+
+
+    def test_router(self):
+        sendr = ZMQSender(ROUTER_PREFIX + self.SERVER1, 'server')
+
+        try:
+            recvrs = [ZMQReceiver(ROUTER_PREFIX + self.CLIENT1, f'client{i}') for i in range(3)]
+            recvrt = ZMQReceiver([(ROUTER_PREFIX + self.CLIENT1, [('other', 'other')])], 'clientt')  # only gets 'other'
+
+            try:
+                for recvr in recvrs:
+                    self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                for j in range(3):
+                    for i in range(j * 3, j * 3 + 3):  # each client gets a different message
+                        self.assertEqual(send(sendr, {'main': [None, str(i).encode()]}, timeout=1000), i + 1)
+
+                    self.assertEqual(send(sendr, {'main': [None, b'x']}, timeout=100), None)  # all clients busy
+
+                    msgs = sorted(recvl(recvr, timeout=1000) for recvr in recvrs)
+
+                    self.assertEqual(msgs, [(i, {'main': [None, str(i).encode()]}) for i in range(j * 3, j * 3 + 3)])
+
+                self.assertEqual(recvl(recvrt, timeout=0), None)
+
+                for recvr in recvrs:
+                    recvr.destroy()
+
+                recvrs = []
+
+                sleep(0.1)
+
+                self.assertEqual(send(sendr, d := {'main': [None, b'm'], 'other': [None, b'o']}, timeout=1000), 10)
+                self.assertEqual(recvl(recvrt, timeout=1000), (9, {'other': d['other']}))
+
+            finally:
+                recvrt.destroy()
+
+                for recvr in recvrs:
+                    recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
     def test_tee(self):
         sendr = ZMQSender(self.SERVER1, 'server')
 
@@ -918,6 +1399,45 @@ class TestZeroMQTCP(unittest.TestCase):
             sendr1.destroy()
 
 
+    def test_sources_balance_reorder(self):
+        sendr1 = ZMQSender(self.SERVER1, 'server1')
+
+        try:
+            sendr2 = ZMQSender(self.SERVER2, 'server2')
+
+            try:
+                sendr3 = ZMQSender(self.SERVER3, 'server3')
+
+                try:
+                    recvr = ZMQReceiver([self.CLIENT1, self.CLIENT2, self.CLIENT3], 'client', balance=True)
+
+                    try:
+                        self.assertEqual(recvl(recvr, timeout=0), None)
+
+                        sleep(0.1)
+
+                        for i in range(0, 30, 3):  # complete out of order, come out in order
+                            self.assertEqual(send(sendr3, {'main': [None, f'm{i + 2}'.encode()]}, sendstate(i + 2), timeout=100), i + 3)
+                            self.assertEqual(send(sendr2, {'main': [None, f'm{i + 1}'.encode()]}, sendstate(i + 1), timeout=100), i + 2)
+                            self.assertEqual(recvl(recvr, timeout=50), None)  # waiting for i
+                            self.assertEqual(send(sendr1, {'main': [None, f'm{i}'.encode()]}, sendstate(i), timeout=100), i + 1)
+
+                            for j in range(i, i + 3):
+                                self.assertEqual(recvl(recvr, timeout=100), (j, {'main': [None, f'm{j}'.encode()]}))
+
+                    finally:
+                        recvr.destroy()
+
+                finally:
+                    sendr3.destroy()
+
+            finally:
+                sendr2.destroy()
+
+        finally:
+            sendr1.destroy()
+
+
     def test_outputs_balance_doubly_ephemeral_watch(self):
         sendr = ZMQSender([self.SERVER1, self.SERVER2, self.SERVER3], 'server', balance=True)
 
@@ -1261,5 +1781,150 @@ class TestZeroMQIPC(TestZeroMQTCP):
     #         sendr.destroy()
 
 
+class TestZeroMQSHM(TestZeroMQTCP):
+    SERVER1 = 'shm://shm_5550'
+    SERVER2 = 'shm://shm_5552'
+    SERVER3 = 'shm://shm_5554'
+    CLIENT1 = 'shm://shm_5550'
+    CLIENT2 = 'ipc://shm_5552'  # can connect to shm:// as plain ipc://
+    CLIENT3 = 'shm://shm_5554'
+
+
+    def test_shm_slots(self):
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            recvr = ZMQReceiver(self.CLIENT1, 'client')
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                self.assertEqual(send(sendr, {'main': [None, b'0' * ZMQ_SHM_MIN_SIZE]}, timeout=1000), 1)
+                self.assertEqual(recvl(recvr, timeout=1000), (0, {'main': [None, b'0' * ZMQ_SHM_MIN_SIZE]}))  # not connected yet so copy
+
+                held = []
+
+                for i in range(1, ZMQ_SHM_SLOTS + 1):  # hold on to all slots
+                    self.assertEqual(send(sendr, {'main': [None, bytes([i]) * ZMQ_SHM_MIN_SIZE]}, timeout=1000), i + 1)
+                    self.assertEqual((res := recvl(recvr, timeout=1000))[0], i)
+
+                    part = res[1]['main'][1]
+
+                    self.assertIsInstance(part, np.ndarray)
+                    self.assertFalse(part.flags.writeable)
+                    self.assertEqual(bytes(part), bytes([i]) * ZMQ_SHM_MIN_SIZE)
+
+                    held.append(part)
+
+                self.assertEqual(send(sendr, {'main': [None, b'x' * ZMQ_SHM_MIN_SIZE]}, timeout=1000), ZMQ_SHM_SLOTS + 2)
+                self.assertEqual(recvl(recvr, timeout=1000), (ZMQ_SHM_SLOTS + 1, {'main': [None, b'x' * ZMQ_SHM_MIN_SIZE]}))  # no free slot so inline
+
+                del held, part, res
+
+                for i in range(ZMQ_SHM_SLOTS + 2, ZMQ_SHM_SLOTS + 4):  # first one to report release, then back to shm
+                    self.assertEqual(send(sendr, {'main': [None, b'y' * ZMQ_SHM_MIN_SIZE]}, timeout=1000), i + 1)
+                    self.assertEqual((res := recvl(recvr, timeout=1000))[0], i)
+
+                self.assertIsInstance(res[1]['main'][1], np.ndarray)
+                self.assertEqual(bytes(res[1]['main'][1]), b'y' * ZMQ_SHM_MIN_SIZE)
+
+            finally:
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+
+    def test_shm_killed_sender(self):
+        prefix = f'openfilter-{sanitize_filename(os.path.abspath(self.SERVER1[6:]))}-'
+        code   = '\n'.join((
+            'import sys',
+            f'sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.dirname(zeromq.__file__)))!r})',
+            'from openfilter.filter_runtime.zeromq import ZMQSender, ZMQ_SHM_MIN_SIZE',
+            f'sendr = ZMQSender({self.SERVER1!r}, "server")',
+            'for i in range(3):',
+            '    sendr.send({"main": [None, bytes([i]) * ZMQ_SHM_MIN_SIZE]}, push=True)',
+            'print("sent", flush=True)',
+            'sys.stdin.read()',
+        ))
+        proc = subprocess.Popen([sys.executable, '-c', code], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        try:
+            self.assertEqual(proc.stdout.readline(), b'sent\n')
+            self.assertEqual(len([f for f in os.listdir(ZMQ_SHM_PATH) if f.startswith(prefix)]), 3)
+
+        finally:
+            proc.kill()
+            proc.wait()
+
+        self.assertEqual(len([f for f in os.listdir(ZMQ_SHM_PATH) if f.startswith(prefix)]), 3)  # left behind
+
+        sendr = ZMQSender(self.SERVER1, 'server')  # same bind again cleans up
+
+        try:
+            self.assertEqual([f for f in os.listdir(ZMQ_SHM_PATH) if f.startswith(prefix)], [])
+
+        finally:
+            sendr.destroy()
+
+
+class TestZeroMQInproc(TestZeroMQTCP):
+    SERVER1 = 'inproc://inproc_5550'
+    SERVER2 = 'inproc://inproc_5552'
+    SERVER3 = 'inproc://inproc_5554'
+    CLIENT1 = 'inproc://inproc_5550'
+    CLIENT2 = 'inproc://inproc_5552'
+    CLIENT3 = 'inproc://inproc_5554'
+
+    LINK_NBYTES = 100  # only envelopes go on the socket
+
+
+    def test_inproc_by_ref(self):
+        sendr = ZMQSender(self.SERVER1, 'server')
+
+        try:
+            self.assertTrue(sendr.inproc_only)
+
+            recvr = ZMQReceiver(self.CLIENT1, 'client')
+            recv2 = ZMQReceiver(self.CLIENT1 + '??', 'client2')
+
+            try:
+                self.assertEqual(recvl(recvr, timeout=0), None)
+
+                sleep(0.1)
+
+                obj = object()  # not bytes, goes by reference
+
+                self.assertEqual(send(sendr, {'main': [None, obj]}, timeout=1000), 1)
+                self.assertIs(recvl(recvr, timeout=1000)[1]['main'][1], obj)
+                self.assertIs(recvl(recv2, timeout=1000)[1]['main'][1], obj)
+
+            finally:
+                recv2.destroy()
+                recvr.destroy()
+
+        finally:
+            sendr.destroy()
+
+        self.assertFalse(sendr.inproc.held)
+
+
+    def test_inproc_store(self):
+        store = ZMQInprocStore(2)
+        keys  = [store.put([None, i]) for i in range(3)]
+
+        try:
+            self.assertIsNone(ZMQInprocStore.get(keys[0]))  # evicted
+            self.assertEqual(ZMQInprocStore.get(keys[1]), [None, 1])
+            self.assertEqual(ZMQInprocStore.get(keys[2]), [None, 2])
+
+        finally:
+            store.destroy()
+
+        self.assertIsNone(ZMQInprocStore.get(keys[2]))
+
+
 if __name__ == '__main__':
     unittest.main()